@@ -0,0 +1,25 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodically(name: str, interval_seconds: float, job: Callable[[], Awaitable[None]]):
+    """Run job every interval_seconds until cancelled, logging (not raising) failures"""
+    while True:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Background job %s failed", name)
+        await asyncio.sleep(interval_seconds)
+
+
+async def cancel_tasks(tasks):
+    """Cancel background tasks and wait for them to finish"""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
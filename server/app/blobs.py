@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+from .signed_url_cache import signed_url_cache
+
+
+logger = logging.getLogger(__name__)
+
+# An upload's own reference, taken before it decides whether the object is already stored
+RESERVE_BLOB_SQL = """
+    INSERT INTO blobs (file_key, ref_count) VALUES ($1, 1)
+    ON CONFLICT (file_key) DO UPDATE SET ref_count = blobs.ref_count + 1
+"""
+
+# Drops one reference per occurrence of a key in $1
+UNRESERVE_BLOBS_SQL = """
+    UPDATE blobs SET ref_count = blobs.ref_count - held.n
+    FROM (SELECT file_key, COUNT(*) AS n FROM unnest($1::varchar[]) AS file_key GROUP BY file_key) AS held
+    WHERE blobs.file_key = held.file_key
+"""
+
+
+class BlobReservations:
+    """
+    References an upload holds on content-addressed blobs until its asset rows exist
+
+    reserve() runs before upload_stream checks whether the object is already
+    stored. A release that starts afterwards sees ref_count > 0 and keeps the
+    object; one that already holds the row lock finishes deleting first, and
+    the upload then finds the object gone and stores it again. Once the asset
+    rows are inserted, transfer() drops the reservation in the same
+    transaction, leaving the trigger-maintained count. Reservations still
+    held on exit, because an upload or insert failed, are given back and
+    their blobs released.
+    """
+
+    def __init__(self, conn, r2_service):
+        self.conn = conn
+        self.r2_service = r2_service
+        self.held: Counter = Counter()
+        # Batch uploads reserve concurrently over the route's single connection
+        self._lock = asyncio.Lock()
+
+    async def reserve(self, file_key: str) -> None:
+        async with self._lock:
+            await self.conn.execute(RESERVE_BLOB_SQL, file_key)
+        self.held[file_key] += 1
+
+    async def transfer(self, file_keys: Sequence[str]) -> None:
+        """Hand reservations over to asset rows inserted in the current transaction"""
+        keys = [key for key in file_keys if self.held[key] > 0]
+        if keys:
+            await self.conn.execute(UNRESERVE_BLOBS_SQL, keys)
+            self.held.subtract(keys)
+
+    async def __aenter__(self) -> "BlobReservations":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        keys = list(self.held.elements())
+        if not keys:
+            return
+        self.held.clear()
+        try:
+            await self.conn.execute(UNRESERVE_BLOBS_SQL, keys)
+            await release_blobs(self.conn, self.r2_service, keys)
+        except Exception as e:
+            # The objects stay in R2 and are kept referenced, never deleted while in use
+            logger.warning("Could not give back %d blob reservations: %s", len(keys), e)
+
+
+async def release_blobs(
+    conn,
+    r2_service,
+    file_keys: Sequence[str],
+    variant_keys: Optional[Dict[str, List[str]]] = None,
+) -> Dict[str, list]:
+    """
+    Delete the R2 objects of blobs that no asset references any more
+
+    The zero-count blobs rows are locked FOR UPDATE while their objects (and
+    the resized variants listed for them) are deleted, so an upload reserving
+    the same key waits and then stores the object again rather than reusing
+    one that is about to disappear.
+
+    Returns:
+        delete_files' result for the freed originals
+    """
+    keys = list(dict.fromkeys(file_keys))
+    if not keys:
+        return {"deleted": [], "errors": []}
+    async with conn.transaction():
+        rows = await conn.fetch(
+            "SELECT file_key FROM blobs WHERE file_key = ANY($1::varchar[]) AND ref_count <= 0 "
+            "ORDER BY file_key FOR UPDATE",
+            keys
+        )
+        freed = [row["file_key"] for row in rows]
+        if not freed:
+            return {"deleted": [], "errors": []}
+        variants = list(dict.fromkeys(
+            key for file_key in freed for key in (variant_keys or {}).get(file_key, [])
+        ))
+        for key in (*freed, *variants):
+            signed_url_cache.invalidate(key)
+        storage = await r2_service.delete_files(freed)
+        if variants:
+            await r2_service.delete_files(variants)
+        await conn.execute("DELETE FROM blobs WHERE file_key = ANY($1::varchar[])", freed)
+    if storage["errors"]:
+        logger.warning("Left %d unreferenced blobs in R2", len(storage["errors"]))
+    return storage
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import os
+from typing import Dict
+
+import asyncpg
+
+from .database import DATABASE_URL
+from .row_cache import RowCache, product_cache
+
+
+logger = logging.getLogger(__name__)
+
+# Channel the notify_cache_invalidation() trigger publishes on (migration 0003)
+CACHE_INVALIDATION_CHANNEL = "cache_invalidation"
+# Seconds to wait before reconnecting a dropped listener connection
+CACHE_LISTENER_RETRY_INTERVAL = float(os.getenv("CACHE_LISTENER_RETRY_INTERVAL", "5"))
+
+
+class CacheInvalidationListener:
+    """Drops cached rows when any worker's write triggers a NOTIFY for them"""
+
+    def __init__(self, caches: Dict[str, RowCache], database_url: str = DATABASE_URL):
+        self.caches = caches
+        self.database_url = database_url
+        self.connected = False
+        self.notifications = 0
+        self.reconnects = 0
+        self.connect_failures = 0
+
+    def handle(self, connection, pid, channel: str, payload: str):
+        """asyncpg notification callback; payload is '<table>:<primary key>'"""
+        table, _, key = payload.partition(":")
+        cache = self.caches.get(table)
+        if cache is not None:
+            cache.invalidate(key)
+            self.notifications += 1
+
+    def _set_caches_enabled(self, enabled: bool):
+        for cache in self.caches.values():
+            cache.set_enabled(enabled)
+
+    async def run(self):
+        """
+        Hold a dedicated LISTEN connection until cancelled
+
+        Caches are only enabled while LISTENing. Notifications sent while
+        disconnected are lost, so caches are emptied and bypassed until the
+        connection is back.
+        """
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.database_url)
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _: closed.set())
+                await conn.add_listener(CACHE_INVALIDATION_CHANNEL, self.handle)
+                self.connected = True
+                self.connect_failures = 0
+                self._set_caches_enabled(True)
+                await closed.wait()
+                logger.warning("Cache invalidation listener connection closed; reconnecting")
+                self.reconnects += 1
+            except Exception as e:
+                # Connecting or LISTEN setup failed; warn once per outage rather than on every retry
+                log = logger.warning if self.connect_failures == 0 else logger.debug
+                log("Cache invalidation listener could not connect: %s", e)
+                self.connect_failures += 1
+            finally:
+                self.connected = False
+                self._set_caches_enabled(False)
+                if conn is not None:
+                    await self._close(conn)
+            await asyncio.sleep(CACHE_LISTENER_RETRY_INTERVAL)
+
+    async def _close(self, conn):
+        """Close a listener connection, dropping it outright if it is half open"""
+        if conn.is_closed():
+            return
+        try:
+            await conn.close(timeout=CACHE_LISTENER_RETRY_INTERVAL)
+        except Exception:
+            conn.terminate()
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "notifications": self.notifications,
+            "reconnects": self.reconnects,
+        }
+
+
+cache_invalidation_listener = CacheInvalidationListener({"products": product_cache})
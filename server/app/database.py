@@ -1,6 +1,17 @@
+import asyncio
 import asyncpg
+import itertools
+import logging
 import os
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import List, Optional
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
+from fastapi import Request
+
+from .metrics import DB_POOL_ACQUIRE_WAIT, InstrumentedConnection
+from .migrations import latest_version, migrate, schema_version
 
 # Load environment variables from .env file
 load_dotenv()
@@ -8,83 +19,321 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost:5432/shopify_minis")
 
+# Connection pool configuration
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# Seconds an idle connection may stay open before the pool closes it
+DB_POOL_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300"))
+DB_POOL_COMMAND_TIMEOUT = float(os.getenv("DB_POOL_COMMAND_TIMEOUT", "60"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_SEARCH_PATH = os.getenv("DB_SEARCH_PATH", "")
+# Apply pending migrations at startup (turn off when migrations run as a deploy step)
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+# Allow fuzzy=true search (pg_trgm and its index come from migrations 0006-0007)
+ENABLE_TRIGRAM_SEARCH = os.getenv("ENABLE_TRIGRAM_SEARCH", "false").lower() in ("1", "true", "yes")
+
+# Comma-separated read replica DSNs; GET routes read from these when set
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Replicas further behind the primary than this are taken out of rotation
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+# After a client writes, its reads go to the primary for this long (read-your-writes)
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+READ_YOUR_WRITES_COOKIE = "db_primary_until"
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[asyncpg.Pool] = None
+_pool_lock = asyncio.Lock()
+
+# Acquisition counters used for pool saturation stats
+_acquire_count = 0
+_acquire_wait_total = 0.0
+_acquire_wait_max = 0.0
+
+
+async def _create_pool(dsn: str) -> asyncpg.Pool:
+    return await asyncpg.create_pool(
+        dsn,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        max_inactive_connection_lifetime=DB_POOL_MAX_INACTIVE_LIFETIME,
+        command_timeout=DB_POOL_COMMAND_TIMEOUT,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        server_settings={"search_path": DB_SEARCH_PATH} if DB_SEARCH_PATH else None,
+    )
+
+
+async def init_pool() -> asyncpg.Pool:
+    """Create the process-wide connection pool (idempotent)"""
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await _create_pool(DATABASE_URL)
+    return _pool
+
+
+async def close_pool():
+    """Close the process-wide connection pool"""
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+
+
+async def get_pool() -> asyncpg.Pool:
+    """Return the shared pool, creating it lazily if the lifespan did not"""
+    if _pool is None:
+        return await init_pool()
+    return _pool
+
+
+def pool_stats() -> dict:
+    """Pool saturation stats for health checks and monitoring"""
+    if _pool is None:
+        return {"initialized": False}
+
+    size = _pool.get_size()
+    idle = _pool.get_idle_size()
+    max_size = _pool.get_max_size()
+    in_use = size - idle
+    return {
+        "initialized": True,
+        "min_size": _pool.get_min_size(),
+        "max_size": max_size,
+        "size": size,
+        "idle": idle,
+        "in_use": in_use,
+        "saturation": round(in_use / max_size, 3) if max_size else 0.0,
+        "acquired_total": _acquire_count,
+        "acquire_wait_avg_ms": round(_acquire_wait_total / _acquire_count * 1000, 3) if _acquire_count else 0.0,
+        "acquire_wait_max_ms": round(_acquire_wait_max * 1000, 3),
+    }
+
+
+@asynccontextmanager
+async def _pooled_connection(pool: asyncpg.Pool):
+    """Check out a connection, recording the wait; queries are timed for /metrics"""
+    global _acquire_count, _acquire_wait_total, _acquire_wait_max
+    started = time.perf_counter()
+    async with pool.acquire() as conn:
+        waited = time.perf_counter() - started
+        _acquire_count += 1
+        _acquire_wait_total += waited
+        _acquire_wait_max = max(_acquire_wait_max, waited)
+        DB_POOL_ACQUIRE_WAIT.observe(waited)
+        yield InstrumentedConnection(conn)
+
+
+@asynccontextmanager
+async def primary_connection():
+    """Check out a primary connection only where it is needed, e.g. on a cache miss"""
+    async with _pooled_connection(await get_pool()) as conn:
+        yield conn
+
 
 async def get_db():
-    """Database connection dependency"""
-    conn = await asyncpg.connect(DATABASE_URL)
-    try:
+    """Database connection dependency (primary); queries are timed for /metrics"""
+    async with primary_connection() as conn:
         yield conn
-    finally:
-        await conn.close()
 
 
-async def create_tables():
-    """Initialize database tables with foreign key constraints"""
-    conn = await asyncpg.connect(DATABASE_URL)
+class Replica:
+    """A read replica pool and whether it is currently in rotation"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.pool: Optional[asyncpg.Pool] = None
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        """host:port/db without credentials, for logs and /health"""
+        parts = urlsplit(self.url)
+        return f"{parts.hostname}:{parts.port or 5432}{parts.path}"
+
+    def take_out_of_rotation(self, error: str):
+        if self.healthy:
+            logger.warning("Read replica %s taken out of rotation: %s", self.name, error)
+        self.healthy = False
+        self.error = error
+
+    def stats(self) -> dict:
+        return {
+            "replica": self.name,
+            "healthy": self.healthy,
+            "lag_seconds": round(self.lag_seconds, 3) if self.lag_seconds is not None else None,
+            "error": self.error,
+        }
+
+
+_replicas: List[Replica] = [Replica(url) for url in DATABASE_REPLICA_URLS]
+_replica_turn = itertools.count()
+
+# Seconds the replica is behind; 0 when it has replayed everything it received
+# (replay timestamps stand still while the primary is idle) or is not a standby.
+# NULL when the WAL receiver is not streaming: a disconnected standby has also
+# replayed everything it received, but that says nothing about the primary.
+# Its status is only visible to roles with pg_read_all_stats (e.g. pg_monitor).
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END::float8
+"""
+
+
+async def check_replica(replica: Replica):
+    """Create the replica's pool if needed and put it in or out of rotation by lag"""
     try:
-        # Create tables in dependency order
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS requests (
-                request_id VARCHAR(255) PRIMARY KEY,
-                shopify_user_id VARCHAR(255) NOT NULL,
-                query TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS products (
-                product_id VARCHAR(255) PRIMARY KEY,
-                shopify_product_id VARCHAR(255) NOT NULL,
-                shopify_variant_id VARCHAR(255) NOT NULL
-            )
-        """)
-        
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS carts (
-                cart_id VARCHAR(255) PRIMARY KEY,
-                request_id VARCHAR(255) NOT NULL,
-                shopify_user_id VARCHAR(255) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (request_id) REFERENCES requests(request_id) ON DELETE CASCADE
-            )
-        """)
-        
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS carts_products (
-                cart_id VARCHAR(255),
-                product_id VARCHAR(255),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (cart_id, product_id),
-                FOREIGN KEY (cart_id) REFERENCES carts(cart_id) ON DELETE CASCADE,
-                FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
-            )
-        """)
-        
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS request_assets (
-                request_asset_id VARCHAR(255) PRIMARY KEY,
-                request_id VARCHAR(255) NOT NULL,
-                file_key VARCHAR(500) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (request_id) REFERENCES requests(request_id) ON DELETE CASCADE
-            )
-        """)
-        
-        await conn.execute("""
-            CREATE TABLE IF NOT EXISTS request_tags (
-                tag_value VARCHAR(255),
-                request_id VARCHAR(255),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (tag_value, request_id),
-                FOREIGN KEY (request_id) REFERENCES requests(request_id) ON DELETE CASCADE
+        if replica.pool is None:
+            replica.pool = await _create_pool(replica.url)
+        async with replica.pool.acquire(timeout=DB_REPLICA_CHECK_INTERVAL) as conn:
+            lag = await conn.fetchval(REPLICA_LAG_QUERY, timeout=DB_REPLICA_CHECK_INTERVAL)
+    except (asyncpg.PostgresError, asyncpg.InterfaceError, OSError, asyncio.TimeoutError) as e:
+        replica.lag_seconds = None
+        replica.take_out_of_rotation(str(e) or type(e).__name__)
+        return
+
+    replica.lag_seconds = lag
+    if lag is None:
+        replica.take_out_of_rotation("WAL receiver is not streaming from the primary (or the role lacks pg_read_all_stats)")
+    elif lag > DB_REPLICA_MAX_LAG_SECONDS:
+        replica.take_out_of_rotation(f"lagging {lag:.1f}s behind the primary")
+    elif not replica.healthy:
+        logger.info("Read replica %s in rotation (lag %.1fs)", replica.name, lag)
+        replica.healthy = True
+        replica.error = None
+
+
+async def check_replicas():
+    """Health and lag check of every configured replica (run periodically)"""
+    await asyncio.gather(*(check_replica(replica) for replica in _replicas))
+
+
+async def close_replica_pools():
+    for replica in _replicas:
+        if replica.pool is not None:
+            await replica.pool.close()
+            replica.pool = None
+        replica.healthy = False
+
+
+def replica_stats() -> list:
+    return [replica.stats() for replica in _replicas]
+
+
+def _choose_replica() -> Optional[Replica]:
+    """Next healthy replica, round robin"""
+    healthy = [replica for replica in _replicas if replica.healthy and replica.pool is not None]
+    if not healthy:
+        return None
+    return healthy[next(_replica_turn) % len(healthy)]
+
+
+def _wrote_recently(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(READ_YOUR_WRITES_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+
+@asynccontextmanager
+async def read_connection(request: Request):
+    """
+    Check out a connection for reads
+
+    Uses a healthy read replica when any are configured, and the primary when
+    none are in rotation or the client wrote within DB_READ_YOUR_WRITES_SECONDS
+    (so it reads its own writes). A replica that fails to hand out a
+    connection is taken out of rotation and the read falls back to the primary.
+    """
+    replica = None if _wrote_recently(request) else _choose_replica()
+    async with AsyncExitStack() as stack:
+        conn = None
+        if replica is not None:
+            try:
+                conn = await stack.enter_async_context(_pooled_connection(replica.pool))
+            except (asyncpg.PostgresError, asyncpg.InterfaceError, OSError, asyncio.TimeoutError) as e:
+                replica.take_out_of_rotation(str(e) or type(e).__name__)
+        if conn is None:
+            conn = await stack.enter_async_context(_pooled_connection(await get_pool()))
+        yield conn
+
+
+async def get_read_db(request: Request):
+    """Database connection dependency for read-only routes (see read_connection)"""
+    async with read_connection(request) as conn:
+        yield conn
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware pinning a client's reads to the primary after it writes
+
+    Successful (< 400) responses to POST/PUT/PATCH/DELETE set a cookie
+    holding the time until which get_read_db skips the replicas, covering
+    their replication lag. A failed write changed nothing, so it leaves the
+    client on the replicas. Only active when replicas are configured.
+    """
+
+    WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in self.WRITE_METHODS or not _replicas:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = time.time() + DB_READ_YOUR_WRITES_SECONDS
+                cookie = (
+                    f"{READ_YOUR_WRITES_COOKIE}={until:.3f}; Max-Age={int(DB_READ_YOUR_WRITES_SECONDS) + 1}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+async def ensure_schema() -> int:
+    """
+    Startup schema check: one version query when the schema is current
+
+    Pending migrations are applied only when DB_AUTO_MIGRATE is on; otherwise
+    run `python -m app.migrations` as a deploy step. Migrations use their own
+    connection so long index builds are not cut off by the pool's command timeout.
+
+    Returns:
+        The schema version the process starts with
+    """
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        current = await schema_version(conn)
+    latest = latest_version()
+
+    if current < latest:
+        if not DB_AUTO_MIGRATE:
+            logger.warning(
+                "Database schema is at version %d but the code expects %d; run `python -m app.migrations`",
+                current, latest
             )
-        """)
-        
-    finally:
-        await conn.close()
\ No newline at end of file
+        else:
+            conn = await asyncpg.connect(DATABASE_URL)
+            try:
+                await migrate(conn)
+                current = await schema_version(conn)
+            finally:
+                await conn.close()
+
+    return current
+
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def row_etag(updated_at: datetime, variant: Optional[str] = None) -> str:
+    """
+    Strong ETag for a row version: its updated_at in microseconds since the epoch
+
+    variant distinguishes representations of the same row version (e.g. one
+    embedding a re-signed URL); If-Match only looks at the version part.
+    """
+    version = f"{(updated_at - _EPOCH) // timedelta(microseconds=1):x}"
+    return f'"{version}-{variant}"' if variant else f'"{version}"'
+
+
+def if_match_versions(if_match: str) -> List[datetime]:
+    """
+    updated_at values named by an If-Match header
+
+    Weak and unparseable tags can never match a row version under the
+    strong comparison If-Match requires, so they are dropped.
+    """
+    versions = []
+    for tag in if_match.split(","):
+        tag = tag.strip()
+        if len(tag) < 2 or not (tag.startswith('"') and tag.endswith('"')):
+            continue
+        try:
+            version = tag[1:-1].split("-", 1)[0]
+            versions.append(_EPOCH + timedelta(microseconds=int(version, 16)))
+        except (ValueError, OverflowError):
+            continue
+    return versions
+
+
+def matches_if_match(if_match: Optional[str], updated_at: datetime) -> bool:
+    """Evaluate If-Match against a row already in hand"""
+    if if_match is None or if_match.strip() == "*":
+        return True
+    return updated_at in if_match_versions(if_match)
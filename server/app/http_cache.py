@@ -0,0 +1,92 @@
+import hashlib
+from typing import Any, Optional, Sequence
+
+from fastapi import Request, Response
+
+from .pagination import keyset_query
+
+
+# Clients keep a copy but revalidate on every use, which costs one cheap 304 when nothing changed
+REVALIDATE = "private, no-cache"
+
+
+def content_etag(*parts: Any) -> str:
+    """Strong ETag hashed from the values a representation is built from"""
+    digest = hashlib.md5("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    True if If-None-Match names etag
+
+    If-None-Match uses the weak comparison, so W/ prefixes are ignored.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {_strip_weak(tag.strip()) for tag in header.split(",")}
+    return _strip_weak(etag) in candidates
+
+
+def not_modified(request: Request, etag: str, cache_control: str) -> Optional[Response]:
+    """A 304 response if the client's copy is current, else None"""
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=validator_headers(etag, cache_control))
+    return None
+
+
+def validator_headers(etag: str, cache_control: str) -> dict:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def set_validators(response: Response, etag: str, cache_control: str):
+    response.headers.update(validator_headers(etag, cache_control))
+
+
+def _strip_weak(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+async def page_etag(
+    conn,
+    table: str,
+    key_columns: Sequence[str],
+    limit: int,
+    cursor: Optional[str] = None,
+    where: Sequence[str] = (),
+    args: Sequence[Any] = (),
+    version_columns: Sequence[str] = ("updated_at",),
+    variant: Optional[str] = None,
+) -> str:
+    """
+    ETag for one page of a keyset listing, computed by the database
+
+    Aggregates a digest over the sort key and version columns of exactly the
+    rows the page would return (plus the look-ahead row behind next_cursor),
+    so no row is shipped to the application to validate a cached page.
+
+    Args:
+        conn: Database connection
+        table, key_columns, limit, cursor, where, args: As for keyset_query
+        version_columns: Columns that change whenever a row's representation does;
+            "<expression> AS <name>" entries version derived values
+        variant: Suffix for representations that also depend on something else
+
+    Returns:
+        A strong ETag for the page
+    """
+    columns = list(dict.fromkeys([*key_columns, *version_columns]))
+    names = [column.rsplit(" AS ", 1)[-1] for column in columns]
+    inner, query_args = keyset_query(
+        table, key_columns, limit, cursor, where=where, args=args, columns=", ".join(columns)
+    )
+    order = ", ".join(f"{column} DESC" for column in key_columns)
+    digest = await conn.fetchval(
+        f"SELECT md5(string_agg(ROW({', '.join(names)})::text, ';' ORDER BY {order})) FROM ({inner}) AS page",
+        *query_args
+    )
+    digest = digest or "empty"
+    return f'"{digest}-{variant}"' if variant else f'"{digest}"'
@@ -0,0 +1,228 @@
+import asyncio
+import io
+import logging
+import mimetypes
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it assets are only served as uploaded
+    Image = ImageOps = None
+
+from .database import get_pool
+from .signed_url_cache import signed_url_cache
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS_ENABLED = (
+    os.getenv("IMAGE_VARIANTS_ENABLED", "true").lower() in ("1", "true", "yes") and Image is not None
+)
+# Target widths in px; images narrower than a size get no variant for it (no upscaling)
+IMAGE_VARIANT_SIZES = tuple(sorted({
+    int(size) for size in os.getenv("IMAGE_VARIANT_SIZES", "320,640,1280").split(",") if size.strip()
+}))
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", "80"))
+# Worker processes resizing images, so decoding and encoding never block the event loop
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Originals larger than this (in bytes or pixels) are not resized
+IMAGE_VARIANT_MAX_BYTES = int(os.getenv("IMAGE_VARIANT_MAX_BYTES", str(50 * 1024 * 1024)))
+IMAGE_VARIANT_MAX_PIXELS = int(os.getenv("IMAGE_VARIANT_MAX_PIXELS", str(50_000_000)))
+VARIANT_CONTENT_TYPE = "image/webp"
+
+# Smallest variant at least as wide as the size parameter, for selects over request_assets
+VARIANT_FILE_KEY_SQL = """(
+    SELECT v.file_key FROM request_asset_variants AS v
+    WHERE v.request_asset_id = request_assets.request_asset_id AND v.size >= {size_param}
+    ORDER BY v.size LIMIT 1
+)"""
+# Every variant key of the asset, to clean up storage alongside it
+VARIANT_FILE_KEYS_SQL = (
+    "ARRAY(SELECT v.file_key FROM request_asset_variants AS v"
+    " WHERE v.request_asset_id = request_assets.request_asset_id)"
+)
+
+_executor: Optional[ProcessPoolExecutor] = None
+# Variant generation started by start_asset_variants, awaited on shutdown
+_tasks: Set[asyncio.Task] = set()
+
+
+def render_variants(
+    data: bytes, sizes: Tuple[int, ...], quality: int, max_pixels: int
+) -> List[Tuple[int, int, int, bytes]]:
+    """
+    Resize an image to each target width and encode it as WebP (runs in a worker process)
+
+    Returns:
+        (size, width, height, webp bytes) for every size narrower than the original
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    with Image.open(io.BytesIO(data)) as original:
+        # JPEG decoders can downscale while decoding, far cheaper than a full decode
+        original.draft("RGB", (max(sizes), max(sizes)))
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+
+        variants = []
+        for size in sizes:
+            if size >= image.width:
+                continue
+            height = max(1, round(image.height * size / image.width))
+            resized = image.resize((size, height), Image.LANCZOS, reducing_gap=3.0)
+            out = io.BytesIO()
+            resized.save(out, "WEBP", quality=quality, method=4)
+            variants.append((size, size, height, out.getvalue()))
+    return variants
+
+
+def variant_file_key(file_key: str, size: int) -> str:
+    """Sibling key of the original, e.g. request-assets/r1/abc_w640.webp"""
+    root, _ = os.path.splitext(file_key)
+    return f"{root}_w{size}.webp"
+
+
+def is_resizable(file_key: str) -> bool:
+    content_type, _ = mimetypes.guess_type(file_key)
+    return bool(content_type) and content_type.startswith("image/") and content_type != "image/svg+xml"
+
+
+def get_variant_executor() -> ProcessPoolExecutor:
+    """Process pool for resizing, created on first use"""
+    global _executor
+    if _executor is None:
+        # spawn rather than fork: the server process already runs threads (boto3 I/O pool)
+        _executor = ProcessPoolExecutor(
+            max_workers=IMAGE_VARIANT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown_variant_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def _reuse_variants(request_asset_id: str, file_key: str) -> bool:
+    """
+    Record variants another asset already has for the same blob
+
+    Uploads are content-addressed, so a duplicate upload shares the original's
+    file_key and its variant keys; copying the rows skips the download and
+    resize entirely.
+    """
+    now = datetime.utcnow()
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        # FOR SHARE waits out a concurrent file change and re-checks file_key without writing the row
+        copied = await conn.execute("""
+            WITH donors AS (
+                SELECT DISTINCT ON (v.size) v.size, v.width, v.height, v.file_key, v.content_type, v.size_bytes
+                FROM request_asset_variants AS v
+                JOIN request_assets AS a ON a.request_asset_id = v.request_asset_id
+                WHERE a.file_key = $2 AND a.request_asset_id <> $1
+                ORDER BY v.size
+            ), asset AS (
+                SELECT request_asset_id FROM request_assets
+                WHERE request_asset_id = $1 AND file_key = $2 AND EXISTS (SELECT 1 FROM donors)
+                FOR SHARE
+            )
+            INSERT INTO request_asset_variants
+                (request_asset_id, size, width, height, file_key, content_type, size_bytes, created_at)
+            SELECT asset.request_asset_id, d.size, d.width, d.height, d.file_key, d.content_type, d.size_bytes, $3
+            FROM asset CROSS JOIN donors AS d
+            ON CONFLICT (request_asset_id, size) DO NOTHING
+        """, request_asset_id, file_key, now)
+    if copied == "INSERT 0 0":
+        return False
+    logger.info("Reused image variants for request_asset_id=%s", request_asset_id)
+    return True
+
+
+async def generate_asset_variants(request_asset_id: str, file_key: str, r2_service):
+    """
+    Build and store the resized variants of an uploaded image
+
+    Started by start_asset_variants after the asset commits. Variants are recorded
+    without touching the asset's updated_at, so an If-Match taken before they
+    existed still applies; sized reads fold the variant they serve into their
+    ETag instead. Failures are logged; reads then keep serving the original.
+    """
+    if not IMAGE_VARIANTS_ENABLED or not IMAGE_VARIANT_SIZES or not is_resizable(file_key):
+        return
+    try:
+        if await _reuse_variants(request_asset_id, file_key):
+            return
+        data = await r2_service.download_file(file_key, IMAGE_VARIANT_MAX_BYTES)
+        if data is None:
+            return
+        loop = asyncio.get_running_loop()
+        variants = await loop.run_in_executor(
+            get_variant_executor(), render_variants,
+            data, IMAGE_VARIANT_SIZES, IMAGE_VARIANT_QUALITY, IMAGE_VARIANT_MAX_PIXELS
+        )
+        if not variants:
+            return
+
+        stored = await asyncio.gather(*(
+            r2_service.put_file(variant_file_key(file_key, size), body, VARIANT_CONTENT_TYPE)
+            for size, _, _, body in variants
+        ))
+        now = datetime.utcnow()
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                # Share-locks the asset row; a concurrent delete or file change wins and we clean up
+                current = await conn.fetchval(
+                    "SELECT 1 FROM request_assets WHERE request_asset_id = $1 AND file_key = $2 FOR SHARE",
+                    request_asset_id, file_key
+                )
+                if current is None:
+                    # Variant keys follow the blob, so other assets of the same upload may still use them
+                    shared = await conn.fetchval(
+                        "SELECT EXISTS (SELECT 1 FROM request_assets WHERE file_key = $1)", file_key
+                    )
+                    if not shared:
+                        await r2_service.delete_files(stored)
+                    return
+                await conn.executemany("""
+                    INSERT INTO request_asset_variants
+                        (request_asset_id, size, width, height, file_key, content_type, size_bytes, created_at)
+                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                    ON CONFLICT (request_asset_id, size) DO UPDATE SET
+                        width = EXCLUDED.width, height = EXCLUDED.height, file_key = EXCLUDED.file_key,
+                        content_type = EXCLUDED.content_type, size_bytes = EXCLUDED.size_bytes
+                """, [
+                    (request_asset_id, size, width, height, key, VARIANT_CONTENT_TYPE, len(body), now)
+                    for (size, width, height, body), key in zip(variants, stored)
+                ])
+        for key in stored:
+            signed_url_cache.invalidate(key)
+        logger.info("Stored %d image variants for request_asset_id=%s", len(stored), request_asset_id)
+    except Exception:
+        logger.exception("Image variants failed for request_asset_id=%s", request_asset_id)
+
+
+def start_asset_variants(request_asset_id: str, file_key: str, r2_service) -> None:
+    """
+    Start resizing an asset's image in the background
+
+    Routes call this once the asset row is committed, so the task sees it.
+    The task takes pool connections of its own only for its short lookups and
+    inserts, never across the download or resize.
+    """
+    task = asyncio.create_task(generate_asset_variants(request_asset_id, file_key, r2_service))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def wait_for_variant_tasks():
+    """Let variant generation in flight finish before the pool and executor close"""
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
@@ -0,0 +1,277 @@
+import functools
+import os
+import re
+import time
+from typing import Any, Callable, Sequence
+
+from botocore import xform_name
+from fastapi.responses import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+
+from .profiling import record_query
+
+
+# Set (to an empty, writable directory) when running several worker processes
+# so /metrics aggregates every worker instead of whichever one answered
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Latency buckets in seconds, from sub-millisecond queries to slow uploads
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being served",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Database query latency by statement name",
+    ["statement"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_ERRORS = Counter(
+    "db_query_errors_total",
+    "Database queries that raised, by statement name",
+    ["statement"],
+)
+DB_POOL_ACQUIRE_WAIT = Histogram(
+    "db_pool_acquire_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+    buckets=LATENCY_BUCKETS,
+)
+R2_OPERATION_DURATION = Histogram(
+    "r2_operation_duration_seconds",
+    "R2 API call latency by operation",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+R2_OPERATION_ERRORS = Counter(
+    "r2_operation_errors_total",
+    "R2 API calls that failed, by operation and error code",
+    ["operation", "code"],
+)
+
+# Route label for requests that matched no route, so unknown paths cannot explode label cardinality
+UNMATCHED_ROUTE = "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency per route template and in-flight requests
+
+    Routes are labeled by their path template (/requests/{request_id}), which
+    FastAPI stores in the scope once the request is routed. Latency covers the
+    whole response, including streamed bodies.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                method, getattr(route, "path", UNMATCHED_ROUTE), status
+            ).observe(time.perf_counter() - started)
+            in_progress.dec()
+
+
+_DML_VERB = re.compile(r"\b(INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+_STATEMENT_TABLE = {
+    "select": re.compile(r"\bFROM\s+(\w+)", re.IGNORECASE),
+    "insert": re.compile(r"\bINSERT\s+INTO\s+(\w+)", re.IGNORECASE),
+    "update": re.compile(r"\bUPDATE\s+(\w+)", re.IGNORECASE),
+    "delete": re.compile(r"\bDELETE\s+FROM\s+(\w+)", re.IGNORECASE),
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def statement_name(query: str) -> str:
+    """
+    Low-cardinality name for a SQL statement, e.g. "select_requests"
+
+    The verb is the statement's first keyword (for CTEs, the first data-modifying
+    verb inside, else select) and the table is the first one it reads or writes.
+    """
+    words = query.split(None, 1)
+    verb = words[0].lower() if words else ""
+    if verb == "with":
+        dml = _DML_VERB.search(query)
+        verb = dml.group(1).lower() if dml else "select"
+    pattern = _STATEMENT_TABLE.get(verb)
+    if pattern is None:
+        return verb or "unknown"
+    table = pattern.search(query)
+    return f"{verb}_{table.group(1).lower()}" if table else verb
+
+
+class InstrumentedConnection:
+    """
+    Wraps a pooled asyncpg connection, timing queries by statement name
+
+    Every query is also added to the request's query profile and logged if
+    slow (see app.profiling). Server-side cursors (NDJSON exports) are timed
+    over their whole iteration as cursor_<statement>, but not profiled.
+    Anything else (transactions, ...) is passed straight through to the
+    wrapped connection.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.connection, name)
+
+    async def _timed(self, method: Callable, query: str, args: Sequence[Any], kwargs: dict, params=None) -> Any:
+        statement = statement_name(query)
+        started = time.perf_counter()
+        try:
+            return await method(query, *args, **kwargs)
+        except Exception:
+            DB_QUERY_ERRORS.labels(statement).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            DB_QUERY_DURATION.labels(statement).observe(elapsed)
+            record_query(query, args if params is None else params, elapsed)
+
+    async def execute(self, query: str, *args, **kwargs):
+        return await self._timed(self.connection.execute, query, args, kwargs)
+
+    async def executemany(self, query: str, args, **kwargs):
+        # Profiled with the first row's parameters, which is what EXPLAIN needs
+        first = next(iter(args), ()) if isinstance(args, (list, tuple)) else ()
+        return await self._timed(self.connection.executemany, query, (args,), kwargs, params=tuple(first))
+
+    async def fetch(self, query: str, *args, **kwargs):
+        return await self._timed(self.connection.fetch, query, args, kwargs)
+
+    async def fetchrow(self, query: str, *args, **kwargs):
+        return await self._timed(self.connection.fetchrow, query, args, kwargs)
+
+    async def fetchval(self, query: str, *args, **kwargs):
+        return await self._timed(self.connection.fetchval, query, args, kwargs)
+
+    async def cursor(self, query: str, *args, **kwargs):
+        """Iterate a server-side cursor; must run inside a transaction like asyncpg's"""
+        statement = f"cursor_{statement_name(query)}"
+        started = time.perf_counter()
+        try:
+            async for record in self.connection.cursor(query, *args, **kwargs):
+                yield record
+        except Exception:
+            DB_QUERY_ERRORS.labels(statement).inc()
+            raise
+        finally:
+            DB_QUERY_DURATION.labels(statement).observe(time.perf_counter() - started)
+
+
+def _before_r2_call(model, context, **kwargs):
+    context["metrics_operation"] = xform_name(model.name)
+    context["metrics_started"] = time.perf_counter()
+
+
+def _finish_r2_call(context, code=None):
+    operation = context.get("metrics_operation")
+    if operation is None:
+        return
+    R2_OPERATION_DURATION.labels(operation).observe(time.perf_counter() - context["metrics_started"])
+    if code is not None:
+        R2_OPERATION_ERRORS.labels(operation, code).inc()
+
+
+def _after_r2_call(http_response, parsed, context, **kwargs):
+    code = None
+    if http_response.status_code >= 300:
+        code = parsed.get("Error", {}).get("Code") or str(http_response.status_code)
+    _finish_r2_call(context, code)
+
+
+def _after_r2_call_error(exception, context, **kwargs):
+    _finish_r2_call(context, type(exception).__name__)
+
+
+def _timed_presign(operation: str, method: Callable[..., str]) -> Callable[..., str]:
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception as e:
+            R2_OPERATION_ERRORS.labels(operation, type(e).__name__).inc()
+            raise
+        finally:
+            R2_OPERATION_DURATION.labels(operation).observe(time.perf_counter() - started)
+    return wrapper
+
+
+def instrument_r2_service(service):
+    """
+    Record latency and errors for every R2 call the service makes
+
+    Object API calls (put, multipart parts, deletes, heads) are timed through
+    botocore's before-call/after-call events, so retries are included and the
+    wait for an I/O slot is not. Presigning never leaves the process and is
+    timed by wrapping the service's URL methods.
+    """
+    # Test doubles standing in for the boto3 client have no event system
+    events = getattr(getattr(service.s3_client, "meta", None), "events", None)
+    if events is not None:
+        events.register("before-call.s3", _before_r2_call)
+        events.register("after-call.s3", _after_r2_call)
+        events.register("after-call-error.s3", _after_r2_call_error)
+    service.get_signed_url = _timed_presign("presign_get_object", service.get_signed_url)
+    service.get_presigned_upload_url = _timed_presign("presign_put_object", service.get_presigned_upload_url)
+    return service
+
+
+def mark_worker_stopped():
+    """Drop this worker's live gauges from the shared multiprocess metrics"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def metrics_response() -> Response:
+    """Current metrics in the Prometheus text format"""
+    registry = REGISTRY
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
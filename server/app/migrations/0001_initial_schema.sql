@@ -0,0 +1,112 @@
+-- Baseline schema. Statements are idempotent so databases created by the
+-- old boot-time create_tables() adopt this version without changes.
+
+CREATE TABLE IF NOT EXISTS requests (
+    request_id VARCHAR(255) PRIMARY KEY,
+    shopify_user_id VARCHAR(255) NOT NULL,
+    query TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    product_id VARCHAR(255) PRIMARY KEY,
+    shopify_product_id VARCHAR(255) NOT NULL,
+    shopify_variant_id VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS carts (
+    cart_id VARCHAR(255) PRIMARY KEY,
+    request_id VARCHAR(255) NOT NULL,
+    shopify_user_id VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (request_id) REFERENCES requests(request_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS carts_products (
+    cart_id VARCHAR(255),
+    product_id VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (cart_id, product_id),
+    FOREIGN KEY (cart_id) REFERENCES carts(cart_id) ON DELETE CASCADE,
+    FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS request_assets (
+    request_asset_id VARCHAR(255) PRIMARY KEY,
+    request_id VARCHAR(255) NOT NULL,
+    file_key VARCHAR(500) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (request_id) REFERENCES requests(request_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS request_tags (
+    tag_value VARCHAR(255),
+    request_id VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (tag_value, request_id),
+    FOREIGN KEY (request_id) REFERENCES requests(request_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS request_asset_upload_intents (
+    request_asset_id VARCHAR(255) PRIMARY KEY,
+    request_id VARCHAR(255) NOT NULL,
+    file_key VARCHAR(500) NOT NULL,
+    content_type VARCHAR(255) NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (request_id) REFERENCES requests(request_id) ON DELETE CASCADE
+);
+
+-- Full-text search column over the request query. Adding a STORED generated
+-- column rewrites the whole table under an ACCESS EXCLUSIVE lock, blocking
+-- reads and writes of requests until it finishes. That is free for a new
+-- database. A populated requests table adopted from create_tables() is
+-- rewritten once, so apply this version in a maintenance window (or with
+-- DB_AUTO_MIGRATE=false and `python -m app.migrations`) rather than during
+-- a rolling deploy.
+ALTER TABLE requests ADD COLUMN IF NOT EXISTS query_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', query)) STORED;
+
+-- Indexes on these tables are built CONCURRENTLY in 0008_concurrent_indexes.sql
+
+-- Tag popularity counters, maintained incrementally by a trigger on request_tags
+CREATE TABLE IF NOT EXISTS request_tag_counts (
+    tag_value VARCHAR(255) PRIMARY KEY,
+    request_count BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION maintain_request_tag_counts() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE request_tag_counts SET request_count = request_count - 1
+        WHERE tag_value = OLD.tag_value;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO request_tag_counts (tag_value, request_count) VALUES (NEW.tag_value, 1)
+        ON CONFLICT (tag_value) DO UPDATE
+            SET request_count = request_tag_counts.request_count + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create the trigger once, backfilling counters for tags that already exist
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'request_tags_maintain_counts') THEN
+        LOCK TABLE request_tags IN SHARE ROW EXCLUSIVE MODE;
+        CREATE TRIGGER request_tags_maintain_counts
+            AFTER INSERT OR DELETE OR UPDATE OF tag_value ON request_tags
+            FOR EACH ROW EXECUTE FUNCTION maintain_request_tag_counts();
+        INSERT INTO request_tag_counts (tag_value, request_count)
+            SELECT tag_value, count(*) FROM request_tags GROUP BY tag_value
+        ON CONFLICT (tag_value) DO UPDATE SET request_count = EXCLUDED.request_count;
+    END IF;
+END
+$$;
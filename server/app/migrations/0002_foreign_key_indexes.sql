@@ -0,0 +1,17 @@
+-- no-transaction
+-- Indexes on foreign keys that had none. Built CONCURRENTLY so writes keep
+-- flowing on large tables; each statement runs on its own outside a
+-- transaction. request_assets.request_id and request_tags.request_id get
+-- no index here: the request_id-leading keyset indexes built in 0008 cover
+-- them (databases migrated before 0008 got those from 0001).
+
+-- Carts of a request, newest first (GET /requests/{id}/full, ON DELETE CASCADE)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carts_request_id_created_at_id
+    ON carts (request_id, created_at DESC, cart_id DESC);
+
+-- Carts containing a product (product deletes cascade through this key)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carts_products_product_id
+    ON carts_products (product_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_request_asset_upload_intents_request_id
+    ON request_asset_upload_intents (request_id);
@@ -0,0 +1,21 @@
+-- Publish row changes on the cache_invalidation channel so every worker can
+-- drop its in-process copy. The payload is '<table>:<primary key>'; the key
+-- column is passed as the trigger argument.
+
+CREATE OR REPLACE FUNCTION notify_cache_invalidation() RETURNS trigger AS $$
+DECLARE
+    key_column text := TG_ARGV[0];
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM pg_notify('cache_invalidation', TG_TABLE_NAME || ':' || (to_jsonb(OLD) ->> key_column));
+    END IF;
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND (to_jsonb(NEW) ->> key_column) IS DISTINCT FROM (to_jsonb(OLD) ->> key_column)) THEN
+        PERFORM pg_notify('cache_invalidation', TG_TABLE_NAME || ':' || (to_jsonb(NEW) ->> key_column));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_notify_cache_invalidation
+    AFTER INSERT OR UPDATE OR DELETE ON products
+    FOR EACH ROW EXECUTE FUNCTION notify_cache_invalidation('product_id');
@@ -0,0 +1,15 @@
+-- Resized WebP derivatives of uploaded images, stored under sibling keys.
+-- size is the target width the variant was rendered for (e.g. 320, 640, 1280).
+
+CREATE TABLE IF NOT EXISTS request_asset_variants (
+    request_asset_id VARCHAR(255) NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    file_key VARCHAR(500) NOT NULL,
+    content_type VARCHAR(255) NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (request_asset_id, size),
+    FOREIGN KEY (request_asset_id) REFERENCES request_assets(request_asset_id) ON DELETE CASCADE
+);
@@ -0,0 +1,41 @@
+-- Uploads are stored under content-addressed keys, so several assets can point
+-- at one R2 object. blobs counts the request_assets rows referencing each
+-- file_key; the object may only be deleted once ref_count drops to zero.
+
+CREATE TABLE IF NOT EXISTS blobs (
+    file_key VARCHAR(500) PRIMARY KEY,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE OR REPLACE FUNCTION count_blob_refs() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.file_key IS NOT DISTINCT FROM OLD.file_key THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE blobs SET ref_count = ref_count - 1 WHERE file_key = OLD.file_key;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO blobs (file_key, ref_count) VALUES (NEW.file_key, 1)
+        ON CONFLICT (file_key) DO UPDATE SET ref_count = blobs.ref_count + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Block asset writes between creating the trigger and counting existing rows,
+-- so no insert or delete is missed or counted twice
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'request_assets_count_blob_refs') THEN
+        LOCK TABLE request_assets IN SHARE ROW EXCLUSIVE MODE;
+        CREATE TRIGGER request_assets_count_blob_refs
+            AFTER INSERT OR DELETE OR UPDATE OF file_key ON request_assets
+            FOR EACH ROW EXECUTE FUNCTION count_blob_refs();
+        INSERT INTO blobs (file_key, ref_count)
+            SELECT file_key, COUNT(*) FROM request_assets GROUP BY file_key
+        ON CONFLICT (file_key) DO UPDATE SET ref_count = EXCLUDED.ref_count;
+    END IF;
+END
+$$;
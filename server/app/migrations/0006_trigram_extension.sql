@@ -0,0 +1,5 @@
+-- pg_trgm backs fuzzy=true search on requests.query. It ships with
+-- PostgreSQL's contrib modules and is a trusted extension, so the database
+-- owner can create it.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
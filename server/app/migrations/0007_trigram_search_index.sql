@@ -0,0 +1,6 @@
+-- no-transaction
+-- Trigram index for fuzzy=true search, built CONCURRENTLY so a large
+-- requests table stays writable while it builds.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_requests_query_trgm
+    ON requests USING GIN (query gin_trgm_ops);
@@ -0,0 +1,37 @@
+-- no-transaction
+-- Search and keyset pagination indexes, moved out of 0001 so a populated
+-- database builds them CONCURRENTLY instead of blocking writes for the
+-- whole build. Databases that applied the earlier 0001 already have them,
+-- and IF NOT EXISTS makes this version a no-op there.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_requests_query_tsv
+    ON requests USING GIN (query_tsv);
+
+-- Composite indexes backing keyset pagination on (created_at, id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_requests_created_at_id
+    ON requests (created_at DESC, request_id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carts_created_at_id
+    ON carts (created_at DESC, cart_id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carts_products_created_at_id
+    ON carts_products (created_at DESC, cart_id DESC, product_id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_request_assets_created_at_id
+    ON request_assets (created_at DESC, request_asset_id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_request_assets_request_id_created_at_id
+    ON request_assets (request_id, created_at DESC, request_asset_id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_request_tags_created_at_id
+    ON request_tags (created_at DESC, tag_value DESC, request_id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_request_asset_upload_intents_expires_at
+    ON request_asset_upload_intents (expires_at);
+
+-- Tags of a request (and tagged requests by recency) without scanning the (tag_value, request_id) key
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_request_tags_request_id_created_at
+    ON request_tags (request_id, created_at DESC, tag_value DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_request_tag_counts_request_count
+    ON request_tag_counts (request_count DESC, tag_value);
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent
+
+# First line marker for files that must run outside a transaction, e.g. CREATE INDEX CONCURRENTLY
+NO_TRANSACTION_MARKER = "-- no-transaction"
+
+# Arbitrary application-wide key for pg_advisory_lock, so only one process migrates at a time
+MIGRATION_LOCK_ID = 727_465_001
+# Seconds between pg_try_advisory_lock attempts while another process migrates
+MIGRATION_LOCK_POLL_INTERVAL = 0.5
+
+_FILENAME = re.compile(r"^(\d+)_(\w+)\.sql$")
+_CONCURRENT_INDEX = re.compile(r"CREATE\s+INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+
+    def statements(self) -> List[str]:
+        """Individual statements of a no-transaction migration (comments stripped)"""
+        lines = [line for line in self.sql.splitlines() if not line.strip().startswith("--")]
+        return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    """Read NNNN_name.sql files in version order"""
+    migrations = []
+    for path in directory.glob("*.sql"):
+        match = _FILENAME.match(path.name)
+        if not match:
+            raise ValueError(f"Migration file name must look like 0001_name.sql: {path.name}")
+        migrations.append(Migration(int(match.group(1)), match.group(2), path.read_text()))
+
+    migrations.sort(key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def latest_version(migrations: Optional[List[Migration]] = None) -> int:
+    migrations = load_migrations() if migrations is None else migrations
+    return migrations[-1].version if migrations else 0
+
+
+async def schema_version(conn) -> int:
+    """Highest applied migration version, 0 for a database that was never migrated"""
+    if await conn.fetchval("SELECT to_regclass('schema_migrations')") is None:
+        return 0
+    return await conn.fetchval("SELECT coalesce(max(version), 0) FROM schema_migrations")
+
+
+async def migrate(conn, migrations: Optional[List[Migration]] = None) -> List[int]:
+    """
+    Apply pending migrations in order under a session advisory lock
+
+    Waiting processes poll for the lock (see _acquire_migration_lock) and
+    then find the migrations applied. Transactional files run as one transaction together with their
+    schema_migrations row. No-transaction files run statement by statement,
+    and invalid indexes left behind by an interrupted CONCURRENTLY build are
+    dropped before retrying.
+
+    Args:
+        conn: A dedicated (non-pooled or exclusively held) connection
+        migrations: Migrations to apply, defaults to the bundled files
+
+    Returns:
+        Versions applied by this call
+    """
+    migrations = load_migrations() if migrations is None else migrations
+    applied = []
+
+    await _acquire_migration_lock(conn)
+    try:
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        current = await schema_version(conn)
+
+        for migration in migrations:
+            if migration.version <= current:
+                continue
+            logger.info("Applying migration %04d_%s", migration.version, migration.name)
+
+            if migration.transactional:
+                async with conn.transaction():
+                    await conn.execute(migration.sql)
+                    await _record(conn, migration)
+            else:
+                for statement in migration.statements():
+                    await _drop_invalid_indexes(conn, _CONCURRENT_INDEX.findall(statement))
+                    await conn.execute(statement)
+                await _record(conn, migration)
+            applied.append(migration.version)
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+
+    return applied
+
+
+async def _acquire_migration_lock(conn):
+    """
+    Wait for the migration lock without holding a snapshot
+
+    A session blocked in pg_advisory_lock keeps its statement's snapshot
+    open, and CREATE INDEX CONCURRENTLY in the session holding the lock
+    waits for every such snapshot, so the two deadlock. Between
+    pg_try_advisory_lock attempts nothing is open.
+    """
+    while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", MIGRATION_LOCK_ID):
+        await asyncio.sleep(MIGRATION_LOCK_POLL_INTERVAL)
+
+
+async def _record(conn, migration: Migration):
+    await conn.execute(
+        "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+        migration.version, migration.name
+    )
+
+
+async def _drop_invalid_indexes(conn, index_names: List[str]):
+    if not index_names:
+        return
+    invalid = await conn.fetch("""
+        SELECT c.relname FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE NOT i.indisvalid AND c.relname = ANY($1::text[])
+    """, index_names)
+    for row in invalid:
+        logger.warning("Dropping invalid index %s from an interrupted build", row["relname"])
+        await conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{row["relname"]}"')
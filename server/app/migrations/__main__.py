@@ -0,0 +1,35 @@
+"""
+Apply pending schema migrations:
+
+    uv run python -m app.migrations            # migrate to the latest version
+    uv run python -m app.migrations --status   # print applied and latest versions
+"""
+import argparse
+import asyncio
+import logging
+
+import asyncpg
+
+from ..database import DATABASE_URL
+from . import latest_version, migrate, schema_version
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--status", action="store_true", help="Only report the schema version")
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(args.database_url)
+    try:
+        if not args.status:
+            applied = await migrate(conn)
+            print(f"Applied migrations: {applied}" if applied else "Schema already up to date")
+        print(f"Schema version {await schema_version(conn)} (latest {latest_version()})")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())
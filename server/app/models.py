@@ -1,8 +1,17 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Generic, List, Optional, TypeVar
 from datetime import datetime
 
 
+T = TypeVar("T")
+
+
+# Pagination models
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
 # Request models
 class RequestCreate(BaseModel):
     shopify_user_id: str
@@ -22,6 +31,10 @@ class RequestResponse(BaseModel):
     updated_at: datetime
 
 
+class RequestSearchHit(RequestResponse):
+    rank: float
+
+
 # Cart models
 class CartCreate(BaseModel):
     request_id: str
@@ -90,6 +103,55 @@ class RequestAssetResponse(BaseModel):
     updated_at: datetime
 
 
+class BatchUploadResult(BaseModel):
+    filename: str
+    status: str  # "uploaded" or "failed"
+    asset: Optional[RequestAssetResponse] = None
+    error: Optional[str] = None
+
+
+class BatchUploadResponse(BaseModel):
+    request_id: str
+    uploaded: int
+    failed: int
+    results: List[BatchUploadResult]
+
+
+class BulkDeleteRequest(BaseModel):
+    request_asset_ids: Optional[List[str]] = None
+    request_id: Optional[str] = None
+    delete_from_r2: bool = True
+
+
+class StorageDeleteError(BaseModel):
+    file_key: str
+    code: Optional[str] = None
+    message: Optional[str] = None
+
+
+class BulkDeleteResponse(BaseModel):
+    deleted: int
+    request_asset_ids: List[str]
+    storage_deleted: int
+    storage_errors: List[StorageDeleteError]
+
+
+class UploadIntentCreate(BaseModel):
+    request_id: str
+    filename: str
+    size: int
+    content_type: Optional[str] = None
+
+
+class UploadIntentResponse(BaseModel):
+    request_asset_id: str
+    file_key: str
+    upload_url: str
+    method: str = "PUT"
+    headers: Dict[str, str]
+    expires_at: datetime
+
+
 # Request Tag models
 class RequestTagCreate(BaseModel):
     tag_value: str
@@ -100,4 +162,20 @@ class RequestTagResponse(BaseModel):
     tag_value: str
     request_id: str
     created_at: datetime
-    updated_at: datetime
\ No newline at end of file
+    updated_at: datetime
+
+
+class TagCountResponse(BaseModel):
+    tag_value: str
+    request_count: int
+
+
+# Aggregated request models
+class CartWithProductsResponse(CartResponse):
+    products: Optional[List[ProductResponse]] = None
+
+
+class RequestFullResponse(RequestResponse):
+    assets: Optional[List[RequestAssetResponse]] = None
+    tags: Optional[List[RequestTagResponse]] = None
+    carts: Optional[List[CartWithProductsResponse]] = None
@@ -0,0 +1,84 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row on a page into an opaque cursor"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_columns: Sequence[str]) -> List[Any]:
+    """Decode a cursor produced by encode_cursor back into sort key values"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(key_columns):
+            raise ValueError("cursor does not match sort key")
+        return [
+            datetime.fromisoformat(value) if column == "created_at" else value
+            for column, value in zip(key_columns, values)
+        ]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_query(
+    table: str,
+    key_columns: Sequence[str],
+    limit: int,
+    cursor: Optional[str] = None,
+    where: Sequence[str] = (),
+    args: Sequence[Any] = (),
+    columns: str = "*",
+) -> Tuple[str, List[Any]]:
+    """
+    Build a keyset-paginated SELECT ordered by key_columns descending
+
+    Args:
+        table: Table to select from
+        key_columns: Unique sort key, e.g. ("created_at", "request_id")
+        limit: Page size; one extra row is fetched to detect a next page
+        cursor: Cursor returned with the previous page, if any
+        where: Extra conditions referencing $1..$n of args
+        args: Positional arguments for the extra conditions
+        columns: Select list, e.g. to leave out derived columns
+
+    Returns:
+        The SQL statement and its positional arguments
+    """
+    conditions = list(where)
+    query_args = list(args)
+
+    if cursor:
+        values = decode_cursor(cursor, key_columns)
+        placeholders = ", ".join(f"${len(query_args) + i + 1}" for i in range(len(values)))
+        conditions.append(f"({', '.join(key_columns)}) < ({placeholders})")
+        query_args.extend(values)
+
+    query = f"SELECT {columns} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY " + ", ".join(f"{column} DESC" for column in key_columns)
+
+    query_args.append(limit + 1)
+    query += f" LIMIT ${len(query_args)}"
+    return query, query_args
+
+
+def split_page(rows: Sequence[Any], key_columns: Sequence[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Trim the look-ahead row and compute the cursor for the next page"""
+    if len(rows) <= limit:
+        return list(rows), None
+    page = list(rows[:limit])
+    last = page[-1]
+    return page, encode_cursor([last[column] for column in key_columns])
@@ -0,0 +1,139 @@
+import logging
+import os
+import re
+from contextvars import ContextVar
+from typing import Any, Optional, Sequence
+from urllib.parse import parse_qs
+
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged with their normalized SQL
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+# Allow ?explain=1 to log EXPLAIN ANALYZE for a request's slowest statement.
+# EXPLAIN ANALYZE runs the statement a second time, so keep this off in production.
+DB_EXPLAIN_ENABLED = os.getenv("DB_EXPLAIN_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Only plain DML can be explained; EXPLAIN of anything else is a syntax error
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![$\w.])\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace and replace literals with ? so log lines group by statement"""
+    query = _STRING_LITERAL.sub("?", query)
+    query = _NUMBER_LITERAL.sub("?", query)
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+class QueryProfile:
+    """Database time spent serving one HTTP request"""
+
+    def __init__(self, explain: bool = False):
+        self.explain = explain
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_query: Optional[str] = None
+        self.slowest_args: Sequence[Any] = ()
+
+    def record(self, query: str, args: Sequence[Any], seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        if seconds >= self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_query = query
+            self.slowest_args = args
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, e.g. db;dur=12.5;desc="4 queries\""""
+        return f'db;dur={self.total_seconds * 1000:.1f};desc="{self.count} queries"'
+
+
+_current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+
+
+def record_query(query: str, args: Sequence[Any], seconds: float):
+    """Add a finished statement to the current request's profile and log it if slow"""
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record(query, args, seconds)
+    if seconds * 1000 >= DB_SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query (%.1f ms, %d params): %s", seconds * 1000, len(args), normalize_sql(query)
+        )
+
+
+async def explain_analyze(conn, query: str, args: Sequence[Any]) -> str:
+    """
+    EXPLAIN ANALYZE a statement inside a transaction that is always rolled back
+
+    Writes are executed for real by ANALYZE, so the rollback keeps them from
+    taking effect.
+    """
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        rows = await conn.fetch(f"EXPLAIN (ANALYZE, BUFFERS) {query}", *args)
+    finally:
+        await transaction.rollback()
+    return "\n".join(row[0] for row in rows)
+
+
+async def _log_slowest_plan(method: str, path: str, profile: QueryProfile):
+    query = profile.slowest_query
+    if query is None or not _EXPLAINABLE.match(query):
+        return
+    # Imported here because the database module wraps connections with this module's hooks
+    from .database import get_pool
+
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            plan = await explain_analyze(conn, query, profile.slowest_args)
+    except Exception as e:
+        logger.warning("Could not explain slowest query of %s %s: %s", method, path, e)
+        return
+    logger.info(
+        "Slowest query of %s %s (%.1f ms): %s\n%s",
+        method, path, profile.slowest_seconds * 1000, normalize_sql(query), plan
+    )
+
+
+class QueryProfileMiddleware:
+    """
+    ASGI middleware collecting the database time of each request
+
+    Adds a Server-Timing header with the query count and total DB time of the
+    queries run before the response started. With DB_EXPLAIN_ENABLED set,
+    ?explain=1 also logs EXPLAIN ANALYZE of the slowest statement once the
+    response has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        explain = DB_EXPLAIN_ENABLED and parse_qs(scope["query_string"].decode("latin-1")).get("explain") == ["1"]
+        profile = QueryProfile(explain=explain)
+        token = _current_profile.set(profile)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", profile.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_profile.reset(token)
+        if profile.explain:
+            await _log_slowest_plan(scope["method"], scope["path"], profile)
@@ -1,15 +1,44 @@
+import asyncio
 import boto3
+import functools
+import hashlib
 import os
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from botocore.config import Config
 from botocore.exceptions import ClientError
 from fastapi import HTTPException
 import mimetypes
 from dotenv import load_dotenv
 
+from .metrics import instrument_r2_service
+
 # Load environment variables from .env file
 load_dotenv()
 
+# HTTP client tuning for the shared S3 client
+R2_MAX_POOL_CONNECTIONS = int(os.getenv("R2_MAX_POOL_CONNECTIONS", "50"))
+R2_MAX_ATTEMPTS = int(os.getenv("R2_MAX_ATTEMPTS", "3"))
+R2_RETRY_MODE = os.getenv("R2_RETRY_MODE", "standard")
+R2_CONNECT_TIMEOUT = float(os.getenv("R2_CONNECT_TIMEOUT", "5"))
+R2_READ_TIMEOUT = float(os.getenv("R2_READ_TIMEOUT", "60"))
+R2_TCP_KEEPALIVE = os.getenv("R2_TCP_KEEPALIVE", "true").lower() in ("1", "true", "yes")
+
+# Blocking boto3 calls run on a bounded thread pool off the event loop
+R2_IO_CONCURRENCY = int(os.getenv("R2_IO_CONCURRENCY", "16"))
+# Seconds a caller may wait for a free I/O slot before getting a 503
+R2_IO_ACQUIRE_TIMEOUT = float(os.getenv("R2_IO_ACQUIRE_TIMEOUT", "30"))
+
+# Streaming uploads: files larger than one part go through S3 multipart upload
+R2_UPLOAD_MAX_BYTES = int(os.getenv("R2_UPLOAD_MAX_BYTES", str(500 * 1024 * 1024)))
+R2_MULTIPART_PART_SIZE = max(int(os.getenv("R2_MULTIPART_PART_SIZE", str(8 * 1024 * 1024))), 5 * 1024 * 1024)
+R2_MULTIPART_CONCURRENCY = int(os.getenv("R2_MULTIPART_CONCURRENCY", "4"))
+
+# S3 DeleteObjects accepts at most 1000 keys per call
+R2_DELETE_BATCH_SIZE = 1000
+
 
 class R2Service:
     """Cloudflare R2 storage service for handling file uploads and management"""
@@ -34,8 +63,50 @@ class R2Service:
             config=Config(
                 region_name='auto',  # R2 uses 'auto' region
                 signature_version='s3v4',
+                max_pool_connections=R2_MAX_POOL_CONNECTIONS,
+                retries={'max_attempts': R2_MAX_ATTEMPTS, 'mode': R2_RETRY_MODE},
+                connect_timeout=R2_CONNECT_TIMEOUT,
+                read_timeout=R2_READ_TIMEOUT,
+                tcp_keepalive=R2_TCP_KEEPALIVE,
             )
         )
+        
+        self._executor = ThreadPoolExecutor(max_workers=R2_IO_CONCURRENCY, thread_name_prefix="r2-io")
+        self._io_slots: Optional[asyncio.Semaphore] = None
+        self._io_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def close(self):
+        """Wait for in-flight I/O and release the pooled HTTP connections"""
+        self._executor.shutdown(wait=True)
+        close = getattr(self.s3_client, "close", None)
+        if close is not None:
+            close()
+    
+    def _get_io_slots(self) -> asyncio.Semaphore:
+        """Semaphore bounding in-flight R2 calls for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._io_slots_loop is not loop:
+            self._io_slots = asyncio.Semaphore(R2_IO_CONCURRENCY)
+            self._io_slots_loop = loop
+        return self._io_slots
+    
+    async def _run_io(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking boto3 call on the I/O thread pool
+        
+        Callers beyond R2_IO_CONCURRENCY wait asynchronously for a slot, and
+        give up with a 503 after R2_IO_ACQUIRE_TIMEOUT seconds.
+        """
+        slots = self._get_io_slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), R2_IO_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="R2 storage is busy, please retry")
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            slots.release()
     
     def _generate_file_key(self, request_id: str, filename: str) -> str:
         """Generate a unique file key for R2 storage"""
@@ -43,6 +114,11 @@ class R2Service:
         unique_id = str(uuid.uuid4())
         return f"request-assets/{request_id}/{unique_id}{file_extension}"
     
+    def _content_file_key(self, sha256_hex: str, filename: str) -> str:
+        """Content-addressed file key: identical bytes with the same extension share it"""
+        file_extension = os.path.splitext(filename)[1].lower()
+        return f"request-assets/blobs/{sha256_hex}{file_extension}"
+    
     def _get_content_type(self, filename: str) -> str:
         """Determine content type from filename"""
         content_type, _ = mimetypes.guess_type(filename)
@@ -65,7 +141,8 @@ class R2Service:
             content_type = self._get_content_type(filename)
             
             # Upload file to R2
-            self.s3_client.put_object(
+            await self._run_io(
+                self.s3_client.put_object,
                 Bucket=self.bucket_name,
                 Key=file_key,
                 Body=file_content,
@@ -76,6 +153,8 @@ class R2Service:
 
             return file_key
             
+        except HTTPException:
+            raise
         except ClientError as e:
             raise HTTPException(
                 status_code=500, 
@@ -87,6 +166,200 @@ class R2Service:
                 detail=f"Unexpected error during file upload: {str(e)}"
             )
     
+    async def _read_chunk(self, stream: Any, size: int) -> bytes:
+        """Read up to size bytes, only returning a short chunk at end of stream"""
+        chunks = []
+        remaining = size
+        while remaining > 0:
+            data = await stream.read(remaining)
+            if not data:
+                break
+            chunks.append(data)
+            remaining -= len(data)
+        return b"".join(chunks)
+    
+    async def upload_stream(
+        self,
+        request_id: str,
+        stream: Any,
+        filename: str,
+        max_size: int = R2_UPLOAD_MAX_BYTES,
+        reserve: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> Tuple[str, int]:
+        """
+        Upload a file to R2 storage without holding it in memory
+        
+        The stream is read in R2_MULTIPART_PART_SIZE chunks and hashed as it
+        goes; the object is stored under a key derived from its SHA-256, so
+        identical files share one object. A file that fits in one chunk is
+        stored with a single put_object, skipped entirely if that content is
+        already stored. Larger files use a multipart upload to a staging key
+        with up to R2_MULTIPART_CONCURRENCY parts in flight, so peak memory is
+        bounded by (concurrency + 1) * part size; once the hash is known the
+        upload is aborted if the content exists, or completed and copied to
+        its content key otherwise. reserve(file_key) is awaited before that
+        check, so a caller can pin the blob and keep a concurrent delete from
+        removing an object this upload decided to reuse.
+        
+        Args:
+            request_id: The request ID this asset belongs to (not part of the key)
+            stream: Object with an async read(n) method, e.g. an UploadFile
+            filename: Original filename
+            max_size: Largest accepted file size in bytes
+            reserve: Awaited with the content key before checking for an existing object
+            
+        Returns:
+            The file key and the number of bytes uploaded
+        """
+        content_type = self._get_content_type(filename)
+        digest = hashlib.sha256()
+        loop = asyncio.get_running_loop()
+        
+        chunk = await self._read_chunk(stream, R2_MULTIPART_PART_SIZE)
+        if not chunk:
+            raise HTTPException(status_code=400, detail="Empty file provided")
+        if len(chunk) > max_size:
+            raise HTTPException(status_code=413, detail=f"File exceeds maximum size of {max_size} bytes")
+        
+        if len(chunk) < R2_MULTIPART_PART_SIZE:
+            await loop.run_in_executor(None, digest.update, chunk)
+            file_key = self._content_file_key(digest.hexdigest(), filename)
+            if reserve is not None:
+                await reserve(file_key)
+            if await self.head_file(file_key) is not None:
+                return file_key, len(chunk)
+            try:
+                await self._run_io(
+                    self.s3_client.put_object,
+                    Bucket=self.bucket_name,
+                    Key=file_key,
+                    Body=chunk,
+                    ContentType=content_type,
+                    ACL='public-read'
+                )
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Failed to upload file to R2: {str(e)}")
+            return file_key, len(chunk)
+        
+        # The content key is only known at the end, so parts go to a staging key
+        staging_key = f"request-assets/uploads/{uuid.uuid4()}"
+        try:
+            upload = await self._run_io(
+                self.s3_client.create_multipart_upload,
+                Bucket=self.bucket_name,
+                Key=staging_key,
+                ContentType=content_type,
+                ACL='public-read'
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to start multipart upload: {str(e)}")
+        upload_id = upload["UploadId"]
+        
+        part_slots = asyncio.Semaphore(R2_MULTIPART_CONCURRENCY)
+        tasks: List[asyncio.Task] = []
+        
+        async def upload_part(part_number: int, body: bytes) -> dict:
+            try:
+                result = await self._run_io(
+                    self.s3_client.upload_part,
+                    Bucket=self.bucket_name,
+                    Key=staging_key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=body
+                )
+                return {"PartNumber": part_number, "ETag": result["ETag"]}
+            finally:
+                part_slots.release()
+        
+        total = 0
+        try:
+            part_number = 1
+            while chunk:
+                total += len(chunk)
+                if total > max_size:
+                    raise HTTPException(status_code=413, detail=f"File exceeds maximum size of {max_size} bytes")
+                
+                await part_slots.acquire()
+                for task in tasks:
+                    if task.done() and task.exception() is not None:
+                        part_slots.release()
+                        raise task.exception()
+                tasks.append(asyncio.create_task(upload_part(part_number, chunk)))
+                # hashlib releases the GIL on large buffers, so hash off the event loop
+                await loop.run_in_executor(None, digest.update, chunk)
+                part_number += 1
+                # Drop our reference so only in-flight parts stay in memory
+                chunk = None
+                chunk = await self._read_chunk(stream, R2_MULTIPART_PART_SIZE)
+            
+            parts = await asyncio.gather(*tasks)
+            file_key = self._content_file_key(digest.hexdigest(), filename)
+            if reserve is not None:
+                await reserve(file_key)
+            if await self.head_file(file_key) is not None:
+                await self._run_io(
+                    self.s3_client.abort_multipart_upload,
+                    Bucket=self.bucket_name,
+                    Key=staging_key,
+                    UploadId=upload_id
+                )
+                return file_key, total
+            await self._run_io(
+                self.s3_client.complete_multipart_upload,
+                Bucket=self.bucket_name,
+                Key=staging_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": sorted(parts, key=lambda p: p["PartNumber"])}
+            )
+        
+        except BaseException as e:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await self._run_io(
+                    self.s3_client.abort_multipart_upload,
+                    Bucket=self.bucket_name,
+                    Key=staging_key,
+                    UploadId=upload_id
+                )
+            except Exception:
+                # Bucket lifecycle rules clean up uploads we fail to abort
+                pass
+            if isinstance(e, (HTTPException, asyncio.CancelledError)):
+                raise
+            if isinstance(e, Exception):
+                raise HTTPException(status_code=500, detail=f"Multipart upload failed: {str(e)}")
+            raise
+        
+        try:
+            # Server-side copy; the object is under the 5 GiB CopyObject limit (see R2_UPLOAD_MAX_BYTES)
+            await self._run_io(
+                self.s3_client.copy_object,
+                Bucket=self.bucket_name,
+                Key=file_key,
+                CopySource={"Bucket": self.bucket_name, "Key": staging_key},
+                ContentType=content_type,
+                MetadataDirective='REPLACE',
+                ACL='public-read'
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to store uploaded file: {str(e)}")
+        finally:
+            try:
+                await self.delete_file(staging_key)
+            except HTTPException:
+                # Bucket lifecycle rules clean up staging objects we fail to delete
+                pass
+        return file_key, total
+    
     async def delete_file(self, file_key: str) -> bool:
         """
         Delete a file from R2 storage using its URL
@@ -99,13 +372,16 @@ class R2Service:
         """
         try:
             # Delete file from R2
-            self.s3_client.delete_object(
+            await self._run_io(
+                self.s3_client.delete_object,
                 Bucket=self.bucket_name,
                 Key=file_key
             )
             
             return True
             
+        except HTTPException:
+            raise
         except ClientError as e:
             # If file doesn't exist, consider it successfully deleted
             if e.response['Error']['Code'] == 'NoSuchKey':
@@ -120,6 +396,157 @@ class R2Service:
                 detail=f"Unexpected error during file deletion: {str(e)}"
             )
     
+    async def delete_files(self, file_keys: List[str]) -> Dict[str, list]:
+        """
+        Delete many files from R2 storage with batched DeleteObjects calls
+        
+        Args:
+            file_keys: The R2 object keys to delete
+            
+        Returns:
+            {"deleted": [keys], "errors": [{"file_key", "code", "message"}]};
+            per-key failures are reported rather than raised
+        """
+        keys = list(dict.fromkeys(file_keys))
+        batches = [keys[i:i + R2_DELETE_BATCH_SIZE] for i in range(0, len(keys), R2_DELETE_BATCH_SIZE)]
+        
+        async def delete_batch(batch: List[str]) -> List[dict]:
+            try:
+                response = await self._run_io(
+                    self.s3_client.delete_objects,
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+                )
+            except HTTPException as e:
+                return [{"file_key": key, "code": str(e.status_code), "message": e.detail} for key in batch]
+            except Exception as e:
+                return [{"file_key": key, "code": "RequestFailed", "message": str(e)} for key in batch]
+            return [
+                {"file_key": err.get("Key"), "code": err.get("Code"), "message": err.get("Message")}
+                for err in response.get("Errors", [])
+                # A key that is already gone counts as deleted
+                if err.get("Code") != "NoSuchKey"
+            ]
+        
+        errors = [err for batch_errors in await asyncio.gather(*(delete_batch(b) for b in batches)) for err in batch_errors]
+        failed = {err["file_key"] for err in errors}
+        return {"deleted": [key for key in keys if key not in failed], "errors": errors}
+    
+    async def head_file(self, file_key: str) -> Optional[dict]:
+        """
+        Fetch object metadata without downloading the body
+        
+        Args:
+            file_key: The R2 object key
+            
+        Returns:
+            The head_object response, or None if the object does not exist
+        """
+        try:
+            return await self._run_io(
+                self.s3_client.head_object,
+                Bucket=self.bucket_name,
+                Key=file_key
+            )
+        except HTTPException:
+            raise
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise HTTPException(
+                status_code=500, 
+                detail=f"Failed to read file metadata from R2: {str(e)}"
+            )
+    
+    async def download_file(self, file_key: str, max_bytes: int) -> Optional[bytes]:
+        """
+        Read an object into memory
+        
+        Args:
+            file_key: The R2 object key
+            max_bytes: Largest object to read
+            
+        Returns:
+            The object body, or None if it is missing or larger than max_bytes
+        """
+        def read() -> Optional[bytes]:
+            obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_key)
+            body = obj["Body"]
+            try:
+                if obj.get("ContentLength", 0) > max_bytes:
+                    return None
+                return body.read()
+            finally:
+                body.close()
+        
+        try:
+            return await self._run_io(read)
+        except HTTPException:
+            raise
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise HTTPException(
+                status_code=500, 
+                detail=f"Failed to read file from R2: {str(e)}"
+            )
+    
+    async def put_file(self, file_key: str, content: bytes, content_type: str) -> str:
+        """
+        Store bytes under a caller-chosen key, e.g. a derivative of another object
+        
+        Returns:
+            The file key
+        """
+        try:
+            await self._run_io(
+                self.s3_client.put_object,
+                Bucket=self.bucket_name,
+                Key=file_key,
+                Body=content,
+                ContentType=content_type,
+                ACL='public-read'
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to upload file to R2: {str(e)}")
+        return file_key
+    
+    def get_presigned_upload_url(self, file_key: str, content_type: str, content_length: int, expiration: int = 900) -> str:
+        """
+        Generate a presigned PUT URL for uploading straight to R2
+        
+        R2 does not support presigned POST policies, so the size and content
+        type conditions are enforced by signing Content-Length and Content-Type
+        into the PUT request; clients must send exactly those headers.
+        
+        Args:
+            file_key: The R2 object key to upload to
+            content_type: Content-Type the client must send
+            content_length: Exact size in bytes the client must send
+            expiration: URL expiration time in seconds
+            
+        Returns:
+            Presigned PUT URL
+        """
+        try:
+            return self.s3_client.generate_presigned_url(
+                'put_object',
+                Params={
+                    'Bucket': self.bucket_name,
+                    'Key': file_key,
+                    'ContentType': content_type,
+                    'ContentLength': content_length,
+                },
+                ExpiresIn=expiration
+            )
+        except ClientError as e:
+            raise HTTPException(
+                status_code=500, 
+                detail=f"Failed to generate upload URL: {str(e)}"
+            )
+    
     def get_signed_url(self, file_key: str, expiration: int = 3600) -> str:
         """
         Generate a signed URL for private file access
@@ -149,10 +576,32 @@ class R2Service:
 
 
 # Global R2 service instance
+_r2_service: Optional[R2Service] = None
+_r2_service_lock = threading.Lock()
+
+
+def init_r2_service() -> R2Service:
+    """Create the process-wide R2 service (idempotent), instrumented for /metrics"""
+    global _r2_service
+    with _r2_service_lock:
+        if _r2_service is None:
+            _r2_service = instrument_r2_service(R2Service())
+    return _r2_service
+
+
+def close_r2_service():
+    """Tear down the process-wide R2 service"""
+    global _r2_service
+    with _r2_service_lock:
+        if _r2_service is not None:
+            _r2_service.close()
+            _r2_service = None
+
+
 def get_r2_service() -> R2Service:
-    """Dependency to get R2 service instance"""
+    """Dependency to get the shared R2 service instance"""
     try:
-        return R2Service()
+        return init_r2_service()
     except ValueError as e:
         raise HTTPException(
             status_code=500,
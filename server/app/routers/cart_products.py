@@ -1,12 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from typing import Optional
 from datetime import datetime
 
-from ..models import CartProductCreate, CartProductResponse
-from ..database import get_db
+from ..models import Page, CartProductCreate, CartProductResponse
+from ..database import get_db, get_read_db
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_query, split_page
+from ..streaming import NDJSON_RESPONSES, export_query, ndjson_response, wants_ndjson
+from ..etags import row_etag
+from ..http_cache import REVALIDATE, not_modified, page_etag, set_validators, validator_headers
+from ..fast_json import model_fields, page_response
 
 router = APIRouter(prefix="/cart-products", tags=["cart-products"])
 
+CART_PRODUCT_KEYSET = ("created_at", "cart_id", "product_id")
+
+CART_PRODUCT_CACHE_CONTROL = REVALIDATE
+
+CART_PRODUCT_FIELDS = model_fields(CartProductResponse)
+
 
 @router.post("/", response_model=CartProductResponse)
 async def create_cart_product(cart_product: CartProductCreate, conn=Depends(get_db)):
@@ -25,20 +36,47 @@ async def create_cart_product(cart_product: CartProductCreate, conn=Depends(get_
     )
 
 
-@router.get("/", response_model=List[CartProductResponse])
-async def get_cart_products(conn=Depends(get_db)):
-    rows = await conn.fetch("SELECT * FROM carts_products ORDER BY created_at DESC")
-    return [CartProductResponse(**dict(row)) for row in rows]
+@router.get("/", response_model=Page[CartProductResponse], responses=NDJSON_RESPONSES)
+async def get_cart_products(
+    http_request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    conn=Depends(get_read_db)
+):
+    if wants_ndjson(http_request, stream):
+        return ndjson_response(
+            http_request, export_query("carts_products", CART_PRODUCT_KEYSET), [],
+            lambda row: CartProductResponse(**dict(row)).model_dump_json()
+        )
+
+    etag = await page_etag(conn, "carts_products", CART_PRODUCT_KEYSET, limit, cursor)
+    cached = not_modified(http_request, etag, CART_PRODUCT_CACHE_CONTROL)
+    if cached:
+        return cached
+
+    query, args = keyset_query("carts_products", CART_PRODUCT_KEYSET, limit, cursor)
+    rows, next_cursor = split_page(await conn.fetch(query, *args), CART_PRODUCT_KEYSET, limit)
+    return page_response(
+        rows, CART_PRODUCT_FIELDS, next_cursor, headers=validator_headers(etag, CART_PRODUCT_CACHE_CONTROL)
+    )
 
 
 @router.get("/{cart_id}/{product_id}", response_model=CartProductResponse)
-async def get_cart_product(cart_id: str, product_id: str, conn=Depends(get_db)):
+async def get_cart_product(
+    cart_id: str, product_id: str, http_request: Request, response: Response, conn=Depends(get_read_db)
+):
     row = await conn.fetchrow(
         "SELECT * FROM carts_products WHERE cart_id = $1 AND product_id = $2", 
         cart_id, product_id
     )
     if not row:
         raise HTTPException(status_code=404, detail="Cart product not found")
+    etag = row_etag(row["updated_at"])
+    cached = not_modified(http_request, etag, CART_PRODUCT_CACHE_CONTROL)
+    if cached:
+        return cached
+    set_validators(response, etag, CART_PRODUCT_CACHE_CONTROL)
     return CartProductResponse(**dict(row))
 
 
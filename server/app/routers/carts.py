@@ -1,13 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from typing import Optional
 from datetime import datetime
 import uuid
 
-from ..models import CartCreate, CartUpdate, CartResponse
-from ..database import get_db
+from ..models import Page, CartCreate, CartUpdate, CartResponse
+from ..database import get_db, get_read_db
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_query, split_page
+from ..streaming import NDJSON_RESPONSES, export_query, ndjson_response, wants_ndjson
+from ..etags import row_etag
+from ..http_cache import REVALIDATE, not_modified, page_etag, set_validators, validator_headers
+from ..fast_json import model_fields, page_response
+from ..updates import update_row
 
 router = APIRouter(prefix="/carts", tags=["carts"])
 
+CART_KEYSET = ("created_at", "cart_id")
+
+CART_CACHE_CONTROL = REVALIDATE
+
+CART_FIELDS = model_fields(CartResponse)
+
 
 @router.post("/", response_model=CartResponse)
 async def create_cart(cart: CartCreate, conn=Depends(get_db)):
@@ -28,39 +40,57 @@ async def create_cart(cart: CartCreate, conn=Depends(get_db)):
     )
 
 
-@router.get("/", response_model=List[CartResponse])
-async def get_carts(conn=Depends(get_db)):
-    rows = await conn.fetch("SELECT * FROM carts ORDER BY created_at DESC")
-    return [CartResponse(**dict(row)) for row in rows]
+@router.get("/", response_model=Page[CartResponse], responses=NDJSON_RESPONSES)
+async def get_carts(
+    http_request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    conn=Depends(get_read_db)
+):
+    if wants_ndjson(http_request, stream):
+        return ndjson_response(
+            http_request, export_query("carts", CART_KEYSET), [],
+            lambda row: CartResponse(**dict(row)).model_dump_json()
+        )
+
+    etag = await page_etag(conn, "carts", CART_KEYSET, limit, cursor)
+    cached = not_modified(http_request, etag, CART_CACHE_CONTROL)
+    if cached:
+        return cached
+
+    query, args = keyset_query("carts", CART_KEYSET, limit, cursor)
+    rows, next_cursor = split_page(await conn.fetch(query, *args), CART_KEYSET, limit)
+    return page_response(rows, CART_FIELDS, next_cursor, headers=validator_headers(etag, CART_CACHE_CONTROL))
 
 
 @router.get("/{cart_id}", response_model=CartResponse)
-async def get_cart(cart_id: str, conn=Depends(get_db)):
+async def get_cart(cart_id: str, http_request: Request, response: Response, conn=Depends(get_read_db)):
     row = await conn.fetchrow("SELECT * FROM carts WHERE cart_id = $1", cart_id)
     if not row:
         raise HTTPException(status_code=404, detail="Cart not found")
+    etag = row_etag(row["updated_at"])
+    cached = not_modified(http_request, etag, CART_CACHE_CONTROL)
+    if cached:
+        return cached
+    set_validators(response, etag, CART_CACHE_CONTROL)
     return CartResponse(**dict(row))
 
 
 @router.put("/{cart_id}", response_model=CartResponse)
-async def update_cart(cart_id: str, cart: CartUpdate, conn=Depends(get_db)):
-    existing = await conn.fetchrow("SELECT * FROM carts WHERE cart_id = $1", cart_id)
-    if not existing:
-        raise HTTPException(status_code=404, detail="Cart not found")
-    
-    update_data = cart.dict(exclude_unset=True)
-    if not update_data:
-        return CartResponse(**dict(existing))
-    
-    update_data["updated_at"] = datetime.utcnow()
-    
-    set_clause = ", ".join([f"{key} = ${i+2}" for i, key in enumerate(update_data.keys())])
-    values = [cart_id] + list(update_data.values())
-    
-    await conn.execute(f"UPDATE carts SET {set_clause} WHERE cart_id = $1", *values)
-    
-    updated_row = await conn.fetchrow("SELECT * FROM carts WHERE cart_id = $1", cart_id)
-    return CartResponse(**dict(updated_row))
+async def update_cart(
+    cart_id: str,
+    cart: CartUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    conn=Depends(get_db)
+):
+    row = await update_row(
+        conn, "carts", "cart_id", cart_id, cart.dict(exclude_unset=True),
+        resource="Cart", if_match=if_match
+    )
+    response.headers["ETag"] = row_etag(row["updated_at"])
+    return CartResponse(**row)
 
 
 @router.delete("/{cart_id}")
@@ -1,12 +1,28 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from typing import Optional
 import uuid
 
-from ..models import ProductCreate, ProductUpdate, ProductResponse
-from ..database import get_db
+from ..models import Page, ProductCreate, ProductUpdate, ProductResponse
+from ..database import get_db, get_read_db, primary_connection
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_query, split_page
+from ..streaming import NDJSON_RESPONSES, export_query, ndjson_response, wants_ndjson
+from ..updates import update_row
+from ..row_cache import product_cache
+from ..http_cache import content_etag, not_modified, page_etag, set_validators, validator_headers
+from ..fast_json import model_fields, page_response
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+# products has no timestamps, so pages are keyed on the primary key alone
+PRODUCT_KEYSET = ("product_id",)
+# ...and validated on their content, since there is no updated_at either
+PRODUCT_VERSION_COLUMNS = ("shopify_product_id", "shopify_variant_id")
+
+# Catalog rows change rarely and are the same for every user
+PRODUCT_CACHE_CONTROL = "public, max-age=60"
+
+PRODUCT_FIELDS = model_fields(ProductResponse)
+
 
 @router.post("/", response_model=ProductResponse)
 async def create_product(product: ProductCreate, conn=Depends(get_db)):
@@ -24,42 +40,67 @@ async def create_product(product: ProductCreate, conn=Depends(get_db)):
     )
 
 
-@router.get("/", response_model=List[ProductResponse])
-async def get_products(conn=Depends(get_db)):
-    rows = await conn.fetch("SELECT * FROM products")
-    return [ProductResponse(**dict(row)) for row in rows]
+@router.get("/", response_model=Page[ProductResponse], responses=NDJSON_RESPONSES)
+async def get_products(
+    http_request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    conn=Depends(get_read_db)
+):
+    if wants_ndjson(http_request, stream):
+        return ndjson_response(
+            http_request, export_query("products", PRODUCT_KEYSET), [],
+            lambda row: ProductResponse(**dict(row)).model_dump_json()
+        )
+
+    etag = await page_etag(conn, "products", PRODUCT_KEYSET, limit, cursor, version_columns=PRODUCT_VERSION_COLUMNS)
+    cached = not_modified(http_request, etag, PRODUCT_CACHE_CONTROL)
+    if cached:
+        return cached
+
+    query, args = keyset_query("products", PRODUCT_KEYSET, limit, cursor)
+    rows, next_cursor = split_page(await conn.fetch(query, *args), PRODUCT_KEYSET, limit)
+    return page_response(rows, PRODUCT_FIELDS, next_cursor, headers=validator_headers(etag, PRODUCT_CACHE_CONTROL))
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: str, conn=Depends(get_db)):
-    row = await conn.fetchrow("SELECT * FROM products WHERE product_id = $1", product_id)
+async def get_product(product_id: str, http_request: Request, response: Response):
+    # Only a cache miss checks out a connection. It loads from the primary: the
+    # invalidation NOTIFY can beat replication, and a lagging replica's old row
+    # would then sit in the cache until its TTL
+    async def load(key):
+        async with primary_connection() as conn:
+            row = await conn.fetchrow("SELECT * FROM products WHERE product_id = $1", key)
+        return dict(row) if row else None
+
+    row = await product_cache.get_or_load(product_id, load)
     if not row:
         raise HTTPException(status_code=404, detail="Product not found")
-    return ProductResponse(**dict(row))
+    etag = content_etag(*(row[column] for column in ("product_id", *PRODUCT_VERSION_COLUMNS)))
+    cached = not_modified(http_request, etag, PRODUCT_CACHE_CONTROL)
+    if cached:
+        return cached
+    set_validators(response, etag, PRODUCT_CACHE_CONTROL)
+    return ProductResponse(**row)
 
 
 @router.put("/{product_id}", response_model=ProductResponse)
 async def update_product(product_id: str, product: ProductUpdate, conn=Depends(get_db)):
-    existing = await conn.fetchrow("SELECT * FROM products WHERE product_id = $1", product_id)
-    if not existing:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    update_data = product.dict(exclude_unset=True)
-    if not update_data:
-        return ProductResponse(**dict(existing))
-    
-    set_clause = ", ".join([f"{key} = ${i+2}" for i, key in enumerate(update_data.keys())])
-    values = [product_id] + list(update_data.values())
-    
-    await conn.execute(f"UPDATE products SET {set_clause} WHERE product_id = $1", *values)
-    
-    updated_row = await conn.fetchrow("SELECT * FROM products WHERE product_id = $1", product_id)
-    return ProductResponse(**dict(updated_row))
+    # products has no updated_at, so there is no row version to honour If-Match with
+    row = await update_row(
+        conn, "products", "product_id", product_id, product.dict(exclude_unset=True),
+        resource="Product"
+    )
+    # Other workers are told by the NOTIFY trigger; drop our copy right away
+    product_cache.invalidate(product_id)
+    return ProductResponse(**row)
 
 
 @router.delete("/{product_id}")
 async def delete_product(product_id: str, conn=Depends(get_db)):
     result = await conn.execute("DELETE FROM products WHERE product_id = $1", product_id)
+    product_cache.invalidate(product_id)
     if result == "DELETE 0":
         raise HTTPException(status_code=404, detail="Product not found")
     return {"message": "Product deleted successfully"}
\ No newline at end of file
@@ -1,22 +1,76 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, Header, UploadFile, File, Form, Query, Request, Response
 from typing import List, Optional
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+import asyncio
+import asyncpg
 import uuid
 import logging
+import os
+import zlib
 
-from ..models import RequestAssetCreate, RequestAssetUpdate, RequestAssetResponse
-from ..database import get_db
-from ..r2_service import get_r2_service, R2Service
+from ..models import (
+    Page, RequestAssetCreate, RequestAssetUpdate, RequestAssetResponse,
+    BatchUploadResult, BatchUploadResponse, BulkDeleteRequest, BulkDeleteResponse,
+    StorageDeleteError, UploadIntentCreate, UploadIntentResponse
+)
+from ..database import get_db, get_read_db
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_query, split_page
+from ..streaming import NDJSON_RESPONSES, export_query, ndjson_response, wants_ndjson
+from ..r2_service import get_r2_service, R2Service, R2_UPLOAD_MAX_BYTES
+from ..signed_url_cache import signed_url_cache, cached_signed_url, signed_url_epoch
+from ..upload_intents import UPLOAD_INTENT_TTL
+from ..etags import row_etag
+from ..updates import update_row
+from ..http_cache import REVALIDATE, not_modified, page_etag, set_validators, validator_headers
+from ..fast_json import page_response
+from ..image_variants import VARIANT_FILE_KEY_SQL, VARIANT_FILE_KEYS_SQL, start_asset_variants
+from ..blobs import BlobReservations, release_blobs
 
 router = APIRouter(prefix="/request-assets", tags=["request_assets"])
 
+REQUEST_ASSET_KEYSET = ("created_at", "request_asset_id")
+
+# Responses embed signed URLs, so they are private and always revalidated
+REQUEST_ASSET_CACHE_CONTROL = REVALIDATE
+
+# Limits for POST /request-assets/upload-batch
+BATCH_UPLOAD_MAX_FILES = int(os.getenv("BATCH_UPLOAD_MAX_FILES", "20"))
+BATCH_UPLOAD_CONCURRENCY = int(os.getenv("BATCH_UPLOAD_CONCURRENCY", "4"))
+
 logger = logging.getLogger(__name__)
 
 
 def _signed_url_from_key(file_key: str, r2_service: R2Service, expiration_seconds: int = 3600) -> str:
-    """Build a presigned URL for a given file key."""
+    """Build a presigned URL for a given file key, reusing cached URLs while they stay fresh."""
     # public_url = r2_service.build_public_url(file_key)
-    return r2_service.get_signed_url(file_key, expiration_seconds)
+    return cached_signed_url(file_key, r2_service, expiration_seconds)
+
+
+def _display_key(row) -> str:
+    """The variant picked by ?size= if there is one, else the original"""
+    return row.get("variant_file_key") or row["file_key"]
+
+
+def _etag_variant(row) -> str:
+    """ETag suffix: the signed URL window, plus the resized variant served (variants never bump updated_at)"""
+    variant_key = row.get("variant_file_key")
+    if not variant_key:
+        return signed_url_epoch()
+    return f"{signed_url_epoch()}.{zlib.crc32(variant_key.encode()):08x}"
+
+
+def _variant_columns(size_param: str) -> str:
+    """Select list adding the key of the smallest variant at least size_param wide"""
+    return f"*, {VARIANT_FILE_KEY_SQL.format(size_param=size_param)} AS variant_file_key"
+
+
+# The RETURNING subquery reads the pre-delete snapshot, so it still sees the cascaded variant rows
+BULK_DELETE_RETURNING = f"request_asset_id, file_key, {VARIANT_FILE_KEYS_SQL} AS variant_file_keys"
+
+SIZE_QUERY = Query(
+    None, ge=1, le=10000,
+    description="Display width in px; returns the smallest resized variant at least this wide, else the original"
+)
 
 @router.post("/upload", response_model=RequestAssetResponse)
 async def upload_asset(
@@ -37,35 +91,34 @@ async def upload_asset(
     # Validate file
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
+    if file.size == 0:
+        raise HTTPException(status_code=400, detail="Empty file provided")
+    if file.size is not None and file.size > R2_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds maximum size of {R2_UPLOAD_MAX_BYTES} bytes")
     
-    # Read file content
-    try:
-        file_content = await file.read()
-        if len(file_content) == 0:
-            raise HTTPException(status_code=400, detail="Empty file provided")
-    except HTTPException:
-        # Preserve HTTPException details (e.g., our empty file validation)
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to read file: {str(e)}")
-    
-    # Upload to R2
-    try:
-        file_key = await r2_service.upload_file(request_id, file_content, file.filename)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
-    
-    # Save asset record to database
-    request_asset_id = str(uuid.uuid4())
-    now = datetime.utcnow()
+    async with BlobReservations(conn, r2_service) as blobs:
+        # Stream to R2 in bounded chunks instead of reading the whole file
+        try:
+            file_key, size_bytes = await r2_service.upload_stream(
+                request_id, file, file.filename, reserve=blobs.reserve
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+        
+        # Save asset record to database
+        request_asset_id = str(uuid.uuid4())
+        now = datetime.utcnow()
 
-    # Store file_key in database
-    await conn.execute("""
-        INSERT INTO request_assets (request_asset_id, request_id, file_key, created_at, updated_at)
-        VALUES ($1, $2, $3, $4, $5)
-    """, request_asset_id, request_id, file_key, now, now)
+        # Store file_key in database; the row's reference replaces the upload's reservation
+        async with conn.transaction():
+            await conn.execute("""
+                INSERT INTO request_assets (request_asset_id, request_id, file_key, created_at, updated_at)
+                VALUES ($1, $2, $3, $4, $5)
+            """, request_asset_id, request_id, file_key, now, now)
+            await blobs.transfer([file_key])
+    start_asset_variants(request_asset_id, file_key, r2_service)
     
     # Return a presigned URL while storing the canonical public URL
     response = RequestAssetResponse(
@@ -84,7 +137,7 @@ async def upload_asset(
             request_asset_id,
             file.filename,
             getattr(file, "content_type", None),
-            len(file_content),
+            size_bytes,
         )
     except Exception:
         # avoid breaking the response on logging errors
@@ -93,6 +146,192 @@ async def upload_asset(
     return response
 
 
+@router.post("/upload-batch", response_model=BatchUploadResponse)
+async def upload_assets_batch(
+    request_id: str = Form(...),
+    files: List[UploadFile] = File(...),
+    conn=Depends(get_db),
+    r2_service: R2Service = Depends(get_r2_service)
+):
+    """Upload several files for one request, reporting success or failure per file"""
+    
+    if len(files) > BATCH_UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_UPLOAD_MAX_FILES} files per batch")
+    
+    # Validate that the request exists once for the whole batch
+    request_exists = await conn.fetchrow(
+        "SELECT request_id FROM requests WHERE request_id = $1", request_id
+    )
+    if not request_exists:
+        raise HTTPException(status_code=404, detail="Request not found")
+    
+    slots = asyncio.Semaphore(BATCH_UPLOAD_CONCURRENCY)
+    
+    # Reservations of files that fail, or of the whole batch if the insert
+    # fails, are given back on exit and objects nothing else uses are deleted
+    async with BlobReservations(conn, r2_service) as blobs:
+        async def upload_one(file: UploadFile):
+            if not file.filename:
+                return None, "No file provided"
+            if file.size == 0:
+                return None, "Empty file provided"
+            async with slots:
+                try:
+                    file_key, _ = await r2_service.upload_stream(
+                        request_id, file, file.filename, reserve=blobs.reserve
+                    )
+                    return file_key, None
+                except HTTPException as e:
+                    return None, e.detail
+                except Exception as e:
+                    return None, f"Upload failed: {str(e)}"
+        
+        outcomes = await asyncio.gather(*(upload_one(f) for f in files))
+        
+        now = datetime.utcnow()
+        uploaded = [
+            (str(uuid.uuid4()), file, file_key)
+            for file, (file_key, _) in zip(files, outcomes) if file_key
+        ]
+        insert_error = None
+        if uploaded:
+            try:
+                async with conn.transaction():
+                    await conn.executemany("""
+                        INSERT INTO request_assets (request_asset_id, request_id, file_key, created_at, updated_at)
+                        VALUES ($1, $2, $3, $4, $5)
+                    """, [(asset_id, request_id, file_key, now, now) for asset_id, _, file_key in uploaded])
+                    await blobs.transfer([file_key for _, _, file_key in uploaded])
+            except Exception as e:
+                logger.warning("Batch insert failed for request_id=%s: %s", request_id, e)
+                insert_error = "Failed to save asset record"
+    if uploaded and not insert_error:
+        for asset_id, _, file_key in uploaded:
+            start_asset_variants(asset_id, file_key, r2_service)
+    
+    asset_ids = {id(file): asset_id for asset_id, file, _ in uploaded}
+    results: List[BatchUploadResult] = []
+    for file, (file_key, error) in zip(files, outcomes):
+        filename = file.filename or ""
+        if file_key and not insert_error:
+            results.append(BatchUploadResult(
+                filename=filename,
+                status="uploaded",
+                asset=RequestAssetResponse(
+                    request_asset_id=asset_ids[id(file)],
+                    request_id=request_id,
+                    url=_signed_url_from_key(file_key, r2_service),
+                    created_at=now,
+                    updated_at=now
+                )
+            ))
+        else:
+            results.append(BatchUploadResult(filename=filename, status="failed", error=error or insert_error))
+    
+    succeeded = sum(1 for r in results if r.status == "uploaded")
+    logger.info(
+        "Batch upload: request_id=%s uploaded=%s failed=%s",
+        request_id, succeeded, len(results) - succeeded,
+    )
+    return BatchUploadResponse(
+        request_id=request_id,
+        uploaded=succeeded,
+        failed=len(results) - succeeded,
+        results=results
+    )
+
+
+@router.post("/upload-intent", response_model=UploadIntentResponse)
+async def create_upload_intent(
+    intent: UploadIntentCreate,
+    conn=Depends(get_db),
+    r2_service: R2Service = Depends(get_r2_service)
+):
+    """Reserve an asset and return a presigned URL for uploading it directly to R2"""
+    
+    if intent.size <= 0:
+        raise HTTPException(status_code=400, detail="Empty file provided")
+    if intent.size > R2_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds maximum size of {R2_UPLOAD_MAX_BYTES} bytes")
+    
+    request_exists = await conn.fetchrow(
+        "SELECT request_id FROM requests WHERE request_id = $1", intent.request_id
+    )
+    if not request_exists:
+        raise HTTPException(status_code=404, detail="Request not found")
+    
+    request_asset_id = str(uuid.uuid4())
+    file_key = r2_service._generate_file_key(intent.request_id, intent.filename)
+    content_type = intent.content_type or r2_service._get_content_type(intent.filename)
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=UPLOAD_INTENT_TTL)
+    
+    upload_url = r2_service.get_presigned_upload_url(file_key, content_type, intent.size, UPLOAD_INTENT_TTL)
+    
+    await conn.execute("""
+        INSERT INTO request_asset_upload_intents
+            (request_asset_id, request_id, file_key, content_type, size_bytes, expires_at, created_at)
+        VALUES ($1, $2, $3, $4, $5, $6, $7)
+    """, request_asset_id, intent.request_id, file_key, content_type, intent.size, expires_at, now)
+    
+    return UploadIntentResponse(
+        request_asset_id=request_asset_id,
+        file_key=file_key,
+        upload_url=upload_url,
+        headers={"Content-Type": content_type, "Content-Length": str(intent.size)},
+        expires_at=expires_at
+    )
+
+
+@router.post("/{request_asset_id}/complete", response_model=RequestAssetResponse)
+async def complete_upload(
+    request_asset_id: str,
+    conn=Depends(get_db),
+    r2_service: R2Service = Depends(get_r2_service)
+):
+    """Verify a direct upload landed in R2 and record it as a request asset"""
+    
+    intent = await conn.fetchrow(
+        "SELECT * FROM request_asset_upload_intents WHERE request_asset_id = $1",
+        request_asset_id
+    )
+    if not intent:
+        raise HTTPException(status_code=404, detail="Upload intent not found")
+    if intent["expires_at"] < datetime.utcnow():
+        raise HTTPException(status_code=410, detail="Upload intent expired")
+    
+    head = await r2_service.head_file(intent["file_key"])
+    if head is None:
+        raise HTTPException(status_code=409, detail="File has not been uploaded yet")
+    if head.get("ContentLength") != intent["size_bytes"] or head.get("ContentType") != intent["content_type"]:
+        # Drop the mismatched object; the intent stays valid for a retry until it expires
+        await r2_service.delete_file(intent["file_key"])
+        raise HTTPException(status_code=400, detail="Uploaded file does not match the upload intent")
+    
+    now = datetime.utcnow()
+    # Consume the intent and create the asset atomically
+    row = await conn.fetchrow("""
+        WITH intent AS (
+            DELETE FROM request_asset_upload_intents WHERE request_asset_id = $1
+            RETURNING request_asset_id, request_id, file_key
+        )
+        INSERT INTO request_assets (request_asset_id, request_id, file_key, created_at, updated_at)
+        SELECT request_asset_id, request_id, file_key, $2, $2 FROM intent
+        RETURNING *
+    """, request_asset_id, now)
+    if not row:
+        raise HTTPException(status_code=404, detail="Upload intent not found")
+    start_asset_variants(row["request_asset_id"], row["file_key"], r2_service)
+    
+    return RequestAssetResponse(
+        request_asset_id=row["request_asset_id"],
+        request_id=row["request_id"],
+        url=_signed_url_from_key(row["file_key"], r2_service),
+        created_at=row["created_at"],
+        updated_at=row["updated_at"]
+    )
+
+
 @router.post("/", response_model=RequestAssetResponse)
 async def create_request_asset(asset: RequestAssetCreate, conn=Depends(get_db), r2_service: R2Service = Depends(get_r2_service)):
     """Create a new request asset record (for external URLs)"""
@@ -121,53 +360,106 @@ async def create_request_asset(asset: RequestAssetCreate, conn=Depends(get_db),
     )
 
 
-@router.get("/", response_model=List[RequestAssetResponse])
+@router.get("/", response_model=Page[RequestAssetResponse], responses=NDJSON_RESPONSES)
 async def get_request_assets(
+    http_request: Request,
     request_id: Optional[str] = None, 
-    conn=Depends(get_db),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    size: Optional[int] = SIZE_QUERY,
+    conn=Depends(get_read_db),
     r2_service: R2Service = Depends(get_r2_service)
 ):
-    """Get all request assets, optionally filtered by request_id"""
+    """Get a page of request assets, optionally filtered by request_id"""
     
-    if request_id:
-        rows = await conn.fetch(
-            "SELECT * FROM request_assets WHERE request_id = $1 ORDER BY created_at DESC", 
-            request_id
-        )
-    else:
-        rows = await conn.fetch("SELECT * FROM request_assets ORDER BY created_at DESC")
-
-    responses: List[RequestAssetResponse] = []
-    for row in rows:
-        data = dict(row)
-        file_key = data.get("file_key")
-        responses.append(RequestAssetResponse(
-            request_asset_id=data["request_asset_id"],
-            request_id=data["request_id"],
-            url=_signed_url_from_key(file_key, r2_service),
-            created_at=data["created_at"],
-            updated_at=data["updated_at"],
-        ))
-    return responses
+    if wants_ndjson(http_request, stream):
+        def serialize(row) -> str:
+            return RequestAssetResponse(
+                request_asset_id=row["request_asset_id"],
+                request_id=row["request_id"],
+                url=_signed_url_from_key(_display_key(row), r2_service),
+                created_at=row["created_at"],
+                updated_at=row["updated_at"],
+            ).model_dump_json()
+
+        where, args = (["request_id = $1"], [request_id]) if request_id else ([], [])
+        columns = "*"
+        if size is not None:
+            args.append(size)
+            columns = _variant_columns(f"${len(args)}")
+        return ndjson_response(http_request, export_query("request_assets", REQUEST_ASSET_KEYSET, where, columns), args, serialize)
+
+    where, args = (["request_id = $1"], [request_id]) if request_id else ([], [])
+    # file_key is versioned too: the signed URL in each item is derived from it,
+    # and so is the variant served for ?size=, which appears without an updated_at bump
+    columns, version_columns = "*", ("updated_at", "file_key")
+    if size is not None:
+        args = [*args, size]
+        variant_key = VARIANT_FILE_KEY_SQL.format(size_param=f"${len(args)}")
+        columns = _variant_columns(f"${len(args)}")
+        version_columns = (*version_columns, f"{variant_key} AS variant_file_key")
+    etag = await page_etag(
+        conn, "request_assets", REQUEST_ASSET_KEYSET, limit, cursor, where=where, args=args,
+        version_columns=version_columns, variant=signed_url_epoch()
+    )
+    cached = not_modified(http_request, etag, REQUEST_ASSET_CACHE_CONTROL)
+    if cached:
+        return cached
+
+    query, args = keyset_query(
+        "request_assets", REQUEST_ASSET_KEYSET, limit, cursor, where=where, args=args, columns=columns
+    )
+    rows, next_cursor = split_page(await conn.fetch(query, *args), REQUEST_ASSET_KEYSET, limit)
+
+    def item(row) -> dict:
+        return {
+            "request_asset_id": row["request_asset_id"],
+            "request_id": row["request_id"],
+            "url": _signed_url_from_key(_display_key(row), r2_service),
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    return page_response(
+        rows, next_cursor=next_cursor, headers=validator_headers(etag, REQUEST_ASSET_CACHE_CONTROL), transform=item
+    )
 
 
 @router.get("/{request_asset_id}", response_model=RequestAssetResponse)
-async def get_request_asset(request_asset_id: str, conn=Depends(get_db), r2_service: R2Service = Depends(get_r2_service)):
+async def get_request_asset(
+    request_asset_id: str,
+    http_request: Request,
+    response: Response,
+    size: Optional[int] = SIZE_QUERY,
+    conn=Depends(get_read_db),
+    r2_service: R2Service = Depends(get_r2_service)
+):
     """Get a specific request asset by ID"""
     
-    row = await conn.fetchrow(
-        "SELECT * FROM request_assets WHERE request_asset_id = $1", 
-        request_asset_id
-    )
+    if size is None:
+        row = await conn.fetchrow(
+            "SELECT * FROM request_assets WHERE request_asset_id = $1", 
+            request_asset_id
+        )
+    else:
+        row = await conn.fetchrow(
+            f"SELECT {_variant_columns('$2')} FROM request_assets WHERE request_asset_id = $1",
+            request_asset_id, size
+        )
     if not row:
         raise HTTPException(status_code=404, detail="Request asset not found")
+    etag = row_etag(row["updated_at"], variant=_etag_variant(row))
+    cached = not_modified(http_request, etag, REQUEST_ASSET_CACHE_CONTROL)
+    if cached:
+        return cached
+    set_validators(response, etag, REQUEST_ASSET_CACHE_CONTROL)
     
     data = dict(row)
-    file_key = data.get("file_key")
     return RequestAssetResponse(
         request_asset_id=data["request_asset_id"],
         request_id=data["request_id"],
-        url=_signed_url_from_key(file_key, r2_service),
+        url=_signed_url_from_key(_display_key(data), r2_service),
         created_at=data["created_at"],
         updated_at=data["updated_at"],
     )
@@ -177,52 +469,45 @@ async def get_request_asset(request_asset_id: str, conn=Depends(get_db), r2_serv
 async def update_request_asset(
     request_asset_id: str, 
     asset: RequestAssetUpdate, 
+    response: Response,
+    if_match: Optional[str] = Header(None),
     conn=Depends(get_db),
     r2_service: R2Service = Depends(get_r2_service)
 ):
     """Update a request asset"""
     
-    # Check if request asset exists
-    existing = await conn.fetchrow(
-        "SELECT * FROM request_assets WHERE request_asset_id = $1", 
-        request_asset_id
-    )
-    if not existing:
-        raise HTTPException(status_code=404, detail="Request asset not found")
-    
     update_data = asset.dict(exclude_unset=True)
-    if not update_data:
-        return RequestAssetResponse(**dict(existing))
-    
-    # If updating request_id, validate it exists
-    if "request_id" in update_data:
-        request_exists = await conn.fetchrow(
-            "SELECT request_id FROM requests WHERE request_id = $1", 
-            update_data["request_id"]
+    try:
+        # RETURNING sees the pre-update snapshot in subqueries, which yields the replaced file_key
+        data = await update_row(
+            conn, "request_assets", "request_asset_id", request_asset_id, update_data,
+            resource="Request asset", if_match=if_match,
+            extra_returning=[
+                "(SELECT file_key FROM request_assets AS previous"
+                " WHERE previous.request_asset_id = $1) AS previous_file_key",
+                f"{VARIANT_FILE_KEYS_SQL} AS previous_variant_file_keys",
+            ]
         )
-        if not request_exists:
-            raise HTTPException(status_code=404, detail="Request not found")
-    
-    update_data["updated_at"] = datetime.utcnow()
-    
-    set_clause = ", ".join([f"{key} = ${i+2}" for i, key in enumerate(update_data.keys())])
-    values = [request_asset_id] + list(update_data.values())
+    except asyncpg.ForeignKeyViolationError:
+        raise HTTPException(status_code=404, detail="Request not found")
     
-    await conn.execute(
-        f"UPDATE request_assets SET {set_clause} WHERE request_asset_id = $1", 
-        *values
-    )
+    # The asset no longer points at its old object, so drop its cached URLs
+    previous_file_key = data.get("previous_file_key")
+    if previous_file_key and previous_file_key != data["file_key"]:
+        signed_url_cache.invalidate(previous_file_key)
+        # Variants were resized from the old object; replace them with ones of the new file
+        variant_keys = data.get("previous_variant_file_keys") or []
+        if variant_keys:
+            await conn.execute("DELETE FROM request_asset_variants WHERE request_asset_id = $1", request_asset_id)
+        # The old object and its variants go once no other asset shares the blob
+        await release_blobs(conn, r2_service, [previous_file_key], {previous_file_key: variant_keys})
+        start_asset_variants(request_asset_id, data["file_key"], r2_service)
     
-    updated_row = await conn.fetchrow(
-        "SELECT * FROM request_assets WHERE request_asset_id = $1", 
-        request_asset_id
-    )
-    data = dict(updated_row)
-    file_key = data.get("file_key")
+    response.headers["ETag"] = row_etag(data["updated_at"])
     return RequestAssetResponse(
         request_asset_id=data["request_asset_id"],
         request_id=data["request_id"],
-        url=_signed_url_from_key(file_key, r2_service),
+        url=_signed_url_from_key(data["file_key"], r2_service),
         created_at=data["created_at"],
         updated_at=data["updated_at"],
     )
@@ -237,9 +522,9 @@ async def delete_request_asset(
 ):
     """Delete a request asset and optionally remove file from R2"""
     
-    # Get asset details before deletion
+    # Get asset details before deletion; its variant rows go with it (ON DELETE CASCADE)
     asset_row = await conn.fetchrow(
-        "SELECT * FROM request_assets WHERE request_asset_id = $1", 
+        f"SELECT *, {VARIANT_FILE_KEYS_SQL} AS variant_file_keys FROM request_assets WHERE request_asset_id = $1", 
         request_asset_id
     )
     if not asset_row:
@@ -253,25 +538,63 @@ async def delete_request_asset(
     if result == "DELETE 0":
         raise HTTPException(status_code=404, detail="Request asset not found")
     
-    # Optionally delete from R2 storage
+    file_key = dict(asset_row)["file_key"]
+    variant_keys = dict(asset_row).get("variant_file_keys") or []
+    
+    # Optionally delete from R2 storage, once no other asset shares the blob
     if delete_from_r2:
-        try:
-            file_key = dict(asset_row)["file_key"]
-            await r2_service.delete_file(file_key)
-        except HTTPException as e:
+        storage = await release_blobs(conn, r2_service, [file_key], {file_key: variant_keys})
+        for err in storage["errors"]:
             # Log warning but don't fail the operation
-            print(f"Warning: Failed to delete file from R2: {e.detail}")
-        except Exception as e:
-            print(f"Warning: Unexpected error deleting file from R2: {str(e)}")
+            print(f"Warning: Failed to delete file from R2: {err['code']} {err['message']}")
     
     return {"message": "Request asset deleted successfully"}
 
 
+@router.post("/bulk-delete", response_model=BulkDeleteResponse)
+async def bulk_delete_request_assets(
+    payload: BulkDeleteRequest,
+    conn=Depends(get_db),
+    r2_service: R2Service = Depends(get_r2_service)
+):
+    """Delete many request assets by ID, or every asset of a request, in one call"""
+    
+    if (payload.request_asset_ids is None) == (payload.request_id is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of request_asset_ids or request_id")
+    
+    if payload.request_id is not None:
+        rows = await conn.fetch(
+            f"DELETE FROM request_assets WHERE request_id = $1 RETURNING {BULK_DELETE_RETURNING}",
+            payload.request_id
+        )
+    else:
+        rows = await conn.fetch(
+            f"DELETE FROM request_assets WHERE request_asset_id = ANY($1::varchar[]) RETURNING {BULK_DELETE_RETURNING}",
+            payload.request_asset_ids
+        )
+    
+    # Blobs still referenced by other assets stay in storage; resized variants
+    # are removed with their originals but not counted separately
+    storage = {"deleted": [], "errors": []}
+    if payload.delete_from_r2:
+        variant_keys = {}
+        for row in rows:
+            variant_keys.setdefault(row["file_key"], []).extend(row.get("variant_file_keys") or [])
+        storage = await release_blobs(conn, r2_service, list(variant_keys), variant_keys)
+    
+    return BulkDeleteResponse(
+        deleted=len(rows),
+        request_asset_ids=[row["request_asset_id"] for row in rows],
+        storage_deleted=len(storage["deleted"]),
+        storage_errors=[StorageDeleteError(**err) for err in storage["errors"]]
+    )
+
+
 @router.get("/{request_asset_id}/signed-url")
 async def get_signed_url(
     request_asset_id: str,
     expiration: int = 3600,
-    conn=Depends(get_db),
+    conn=Depends(get_read_db),
     r2_service: R2Service = Depends(get_r2_service)
 ):
     """Get a signed URL for temporary access to a private asset"""
@@ -1,12 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from typing import List, Optional
 from datetime import datetime
 
-from ..models import RequestTagCreate, RequestTagResponse
-from ..database import get_db
+from ..models import Page, RequestTagCreate, RequestTagResponse, TagCountResponse
+from ..database import get_db, get_read_db
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_query, split_page
+from ..streaming import NDJSON_RESPONSES, export_query, ndjson_response, wants_ndjson
+from ..etags import row_etag
+from ..http_cache import REVALIDATE, not_modified, page_etag, set_validators, validator_headers
+from ..fast_json import model_fields, page_response
 
 router = APIRouter(prefix="/request-tags", tags=["request-tags"])
 
+REQUEST_TAG_KEYSET = ("created_at", "tag_value", "request_id")
+
+REQUEST_TAG_CACHE_CONTROL = REVALIDATE
+
+REQUEST_TAG_FIELDS = model_fields(RequestTagResponse)
+
 
 @router.post("/", response_model=RequestTagResponse)
 async def create_request_tag(request_tag: RequestTagCreate, conn=Depends(get_db)):
@@ -25,20 +36,65 @@ async def create_request_tag(request_tag: RequestTagCreate, conn=Depends(get_db)
     )
 
 
-@router.get("/", response_model=List[RequestTagResponse])
-async def get_request_tags(conn=Depends(get_db)):
-    rows = await conn.fetch("SELECT * FROM request_tags ORDER BY created_at DESC")
-    return [RequestTagResponse(**dict(row)) for row in rows]
+@router.get("/", response_model=Page[RequestTagResponse], responses=NDJSON_RESPONSES)
+async def get_request_tags(
+    http_request: Request,
+    request_id: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    conn=Depends(get_read_db)
+):
+    where, args = (["request_id = $1"], [request_id]) if request_id else ([], [])
+
+    if wants_ndjson(http_request, stream):
+        return ndjson_response(
+            http_request, export_query("request_tags", REQUEST_TAG_KEYSET, where), args,
+            lambda row: RequestTagResponse(**dict(row)).model_dump_json()
+        )
+
+    etag = await page_etag(conn, "request_tags", REQUEST_TAG_KEYSET, limit, cursor, where=where, args=args)
+    cached = not_modified(http_request, etag, REQUEST_TAG_CACHE_CONTROL)
+    if cached:
+        return cached
+
+    query, args = keyset_query("request_tags", REQUEST_TAG_KEYSET, limit, cursor, where=where, args=args)
+    rows, next_cursor = split_page(await conn.fetch(query, *args), REQUEST_TAG_KEYSET, limit)
+    return page_response(
+        rows, REQUEST_TAG_FIELDS, next_cursor, headers=validator_headers(etag, REQUEST_TAG_CACHE_CONTROL)
+    )
+
+
+@router.get("/counts", response_model=List[TagCountResponse])
+async def get_request_tag_counts(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    conn=Depends(get_read_db)
+):
+    """Most popular tags, read from the trigger-maintained counter table"""
+    rows = await conn.fetch("""
+        SELECT tag_value, request_count FROM request_tag_counts
+        WHERE request_count > 0
+        ORDER BY request_count DESC, tag_value
+        LIMIT $1
+    """, limit)
+    return [TagCountResponse(**dict(row)) for row in rows]
 
 
 @router.get("/{tag_value}/{request_id}", response_model=RequestTagResponse)
-async def get_request_tag(tag_value: str, request_id: str, conn=Depends(get_db)):
+async def get_request_tag(
+    tag_value: str, request_id: str, http_request: Request, response: Response, conn=Depends(get_read_db)
+):
     row = await conn.fetchrow(
         "SELECT * FROM request_tags WHERE tag_value = $1 AND request_id = $2", 
         tag_value, request_id
     )
     if not row:
         raise HTTPException(status_code=404, detail="Request tag not found")
+    etag = row_etag(row["updated_at"])
+    cached = not_modified(http_request, etag, REQUEST_TAG_CACHE_CONTROL)
+    if cached:
+        return cached
+    set_validators(response, etag, REQUEST_TAG_CACHE_CONTROL)
     return RequestTagResponse(**dict(row))
 
 
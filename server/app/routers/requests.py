@@ -1,13 +1,116 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from typing import Dict, List, Optional
 from datetime import datetime
+import os
+import re
 import uuid
 
-from ..models import RequestCreate, RequestUpdate, RequestResponse
-from ..database import get_db
+from ..models import (
+    Page, RequestCreate, RequestUpdate, RequestResponse, RequestFullResponse, RequestSearchHit,
+    RequestAssetResponse, RequestTagResponse, CartWithProductsResponse, ProductResponse
+)
+from ..blobs import release_blobs
+from ..database import ENABLE_TRIGRAM_SEARCH, get_db, get_read_db
+from ..image_variants import VARIANT_FILE_KEYS_SQL
+from ..r2_service import get_r2_service, R2Service
+from ..signed_url_cache import cached_signed_url
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, keyset_query, split_page
+from ..streaming import NDJSON_RESPONSES, export_query, ndjson_response, wants_ndjson
+from ..etags import row_etag
+from ..http_cache import REVALIDATE, not_modified, page_etag, set_validators, validator_headers
+from ..fast_json import model_fields, page_response
+from ..updates import update_row
 
 router = APIRouter(prefix="/requests", tags=["requests"])
 
+REQUEST_KEYSET = ("created_at", "request_id")
+
+# The request feed is polled, so clients revalidate every time
+REQUEST_CACHE_CONTROL = REVALIDATE
+
+# Explicit select list so the derived query_tsv search column is never fetched
+REQUEST_COLUMNS = "request_id, shopify_user_id, query, created_at, updated_at"
+
+SEARCH_KEYSET = ("rank", "created_at", "request_id")
+
+# Matches ranked per search (the newest, for full-text); bounds ts_rank/similarity work on common words
+SEARCH_CANDIDATE_LIMIT = int(os.getenv("SEARCH_CANDIDATE_LIMIT", "1000"))
+
+REQUEST_FIELDS = model_fields(RequestResponse)
+SEARCH_HIT_FIELDS = model_fields(RequestSearchHit)
+
+# Sections GET /requests/{request_id}/full can include
+FULL_REQUEST_SECTIONS = ("assets", "tags", "carts", "products")
+
+
+def _tag_filter(tags: List[str], match: str):
+    """WHERE clause restricting requests to those tagged with all/any of tags"""
+    tags = sorted(set(tags))
+    if match == "any":
+        return [
+            "request_id IN (SELECT request_id FROM request_tags WHERE tag_value = ANY($1::varchar[]))"
+        ], [tags]
+    return [
+        "request_id IN (SELECT request_id FROM request_tags WHERE tag_value = ANY($1::varchar[])"
+        " GROUP BY request_id HAVING count(*) = $2)"
+    ], [tags, len(tags)]
+
+
+def build_search_query(q: str, limit: int, cursor: Optional[str] = None, fuzzy: bool = False):
+    """
+    Build the ranked, keyset-paginated search statement for GET /requests/search
+    
+    Full-text mode matches the words of q against the query_tsv GIN index,
+    the last one as a prefix (it may still be being typed), and ranks with
+    ts_rank. Fuzzy mode uses pg_trgm similarity on the raw query text
+    instead, tolerating typos. Only SEARCH_CANDIDATE_LIMIT matches are
+    ranked, so a common word costs about the same as a rare one instead of
+    scoring every matching row before the LIMIT. Full-text ranks the newest
+    matches (idx_requests_created_at_id for common words, a top-N sort of
+    the GIN matches for rare ones); older ones are never returned. Fuzzy
+    ranks the first matches the trigram index yields, in no particular
+    order, because the index is lossy and ordering would recheck every
+    candidate row.
+    
+    Returns:
+        The SQL statement and its positional arguments
+    """
+    if fuzzy:
+        args = [q, SEARCH_CANDIDATE_LIMIT]
+        hits = f"""
+            SELECT {REQUEST_COLUMNS}, similarity(query, $1) AS rank
+            FROM (
+                SELECT {REQUEST_COLUMNS} FROM requests
+                WHERE query % $1
+                LIMIT $2
+            ) AS candidates
+        """
+    else:
+        words = re.findall(r"\w+", q.lower())
+        if not words:
+            raise HTTPException(status_code=400, detail="Search query has no searchable words")
+        # Exact lexemes use the GIN posting trees directly; prefix entries are
+        # expanded into a bitmap, so only the last word pays for that
+        args = [" & ".join(words[:-1] + [f"{words[-1]}:*"]), SEARCH_CANDIDATE_LIMIT]
+        hits = f"""
+            SELECT {REQUEST_COLUMNS}, ts_rank(query_tsv, tsq) AS rank
+            FROM to_tsquery('english', $1) AS tsq, LATERAL (
+                SELECT {REQUEST_COLUMNS}, query_tsv FROM requests
+                WHERE query_tsv @@ tsq
+                ORDER BY created_at DESC, request_id DESC
+                LIMIT $2
+            ) AS candidates
+        """
+    
+    query = f"SELECT * FROM ({hits}) AS hits"
+    if cursor:
+        rank, created_at, request_id = decode_cursor(cursor, SEARCH_KEYSET)
+        args.extend([rank, created_at, request_id])
+        query += " WHERE (rank, created_at, request_id) < ($3::real, $4, $5)"
+    args.append(limit + 1)
+    query += f" ORDER BY rank DESC, created_at DESC, request_id DESC LIMIT ${len(args)}"
+    return query, args
+
 
 @router.post("/", response_model=RequestResponse)
 async def create_request(request: RequestCreate, conn=Depends(get_db)):
@@ -28,45 +131,194 @@ async def create_request(request: RequestCreate, conn=Depends(get_db)):
     )
 
 
-@router.get("/", response_model=List[RequestResponse])
-async def get_requests(conn=Depends(get_db)):
-    rows = await conn.fetch("SELECT * FROM requests ORDER BY created_at DESC")
-    return [RequestResponse(**dict(row)) for row in rows]
+@router.get("/", response_model=Page[RequestResponse], responses=NDJSON_RESPONSES)
+async def get_requests(
+    http_request: Request,
+    tag: Optional[List[str]] = Query(None, description="Only requests with these tags"),
+    tag_match: str = Query("all", pattern="^(all|any)$", description="Require all tags or any of them"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    conn=Depends(get_read_db)
+):
+    where, args = _tag_filter(tag, tag_match) if tag else ([], [])
+
+    if wants_ndjson(http_request, stream):
+        return ndjson_response(
+            http_request, export_query("requests", REQUEST_KEYSET, where, columns=REQUEST_COLUMNS), args,
+            lambda row: RequestResponse(**dict(row)).model_dump_json()
+        )
+
+    etag = await page_etag(conn, "requests", REQUEST_KEYSET, limit, cursor, where=where, args=args)
+    cached = not_modified(http_request, etag, REQUEST_CACHE_CONTROL)
+    if cached:
+        return cached
+
+    query, args = keyset_query(
+        "requests", REQUEST_KEYSET, limit, cursor, where=where, args=args, columns=REQUEST_COLUMNS
+    )
+    rows, next_cursor = split_page(await conn.fetch(query, *args), REQUEST_KEYSET, limit)
+    return page_response(
+        rows, REQUEST_FIELDS, next_cursor, headers=validator_headers(etag, REQUEST_CACHE_CONTROL)
+    )
+
+
+@router.get("/search", response_model=Page[RequestSearchHit])
+async def search_requests(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to match against request queries"),
+    fuzzy: bool = Query(False, description="Typo-tolerant trigram matching (requires ENABLE_TRIGRAM_SEARCH)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    conn=Depends(get_read_db)
+):
+    """
+    Full-text search over request queries, best matches first
+
+    Ranks the newest SEARCH_CANDIDATE_LIMIT matches (fuzzy: an arbitrary
+    SEARCH_CANDIDATE_LIMIT of them), so older matches of a common word are
+    not returned.
+    """
+    if fuzzy and not ENABLE_TRIGRAM_SEARCH:
+        raise HTTPException(status_code=400, detail="Fuzzy search is not enabled")
+    
+    query, args = build_search_query(q, limit, cursor, fuzzy)
+    rows, next_cursor = split_page(await conn.fetch(query, *args), SEARCH_KEYSET, limit)
+    return page_response(rows, SEARCH_HIT_FIELDS, next_cursor)
 
 
 @router.get("/{request_id}", response_model=RequestResponse)
-async def get_request(request_id: str, conn=Depends(get_db)):
-    row = await conn.fetchrow("SELECT * FROM requests WHERE request_id = $1", request_id)
+async def get_request(request_id: str, http_request: Request, response: Response, conn=Depends(get_read_db)):
+    row = await conn.fetchrow(f"SELECT {REQUEST_COLUMNS} FROM requests WHERE request_id = $1", request_id)
     if not row:
         raise HTTPException(status_code=404, detail="Request not found")
+    etag = row_etag(row["updated_at"])
+    cached = not_modified(http_request, etag, REQUEST_CACHE_CONTROL)
+    if cached:
+        return cached
+    set_validators(response, etag, REQUEST_CACHE_CONTROL)
     return RequestResponse(**dict(row))
 
 
-@router.put("/{request_id}", response_model=RequestResponse)
-async def update_request(request_id: str, request: RequestUpdate, conn=Depends(get_db)):
-    # Check if request exists
-    existing = await conn.fetchrow("SELECT * FROM requests WHERE request_id = $1", request_id)
-    if not existing:
-        raise HTTPException(status_code=404, detail="Request not found")
+@router.get("/{request_id}/full", response_model=RequestFullResponse, response_model_exclude_none=True)
+async def get_request_full(
+    request_id: str,
+    include: Optional[str] = Query(
+        None, description="Comma-separated sections to load: assets, tags, carts, products (default: all)"
+    ),
+    conn=Depends(get_read_db),
+    r2_service: R2Service = Depends(get_r2_service)
+):
+    """Get a request with its assets, tags, carts and cart products in a fixed number of queries"""
     
-    update_data = request.dict(exclude_unset=True)
-    if not update_data:
-        return RequestResponse(**dict(existing))
+    sections = set(FULL_REQUEST_SECTIONS) if include is None else {
+        part.strip() for part in include.split(",") if part.strip()
+    }
+    unknown = sections - set(FULL_REQUEST_SECTIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include sections: {', '.join(sorted(unknown))}")
+    if "products" in sections:
+        sections.add("carts")
     
-    update_data["updated_at"] = datetime.utcnow()
+    row = await conn.fetchrow(f"SELECT {REQUEST_COLUMNS} FROM requests WHERE request_id = $1", request_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Request not found")
+    response = RequestFullResponse(**dict(row))
+    
+    if "assets" in sections:
+        asset_rows = await conn.fetch(
+            "SELECT * FROM request_assets WHERE request_id = $1 ORDER BY created_at DESC, request_asset_id DESC",
+            request_id
+        )
+        response.assets = [
+            RequestAssetResponse(
+                request_asset_id=a["request_asset_id"],
+                request_id=a["request_id"],
+                url=cached_signed_url(a["file_key"], r2_service),
+                created_at=a["created_at"],
+                updated_at=a["updated_at"],
+            )
+            for a in asset_rows
+        ]
     
-    set_clause = ", ".join([f"{key} = ${i+2}" for i, key in enumerate(update_data.keys())])
-    values = [request_id] + list(update_data.values())
+    if "tags" in sections:
+        tag_rows = await conn.fetch(
+            "SELECT * FROM request_tags WHERE request_id = $1 ORDER BY created_at DESC, tag_value",
+            request_id
+        )
+        response.tags = [RequestTagResponse(**dict(t)) for t in tag_rows]
     
-    await conn.execute(f"UPDATE requests SET {set_clause} WHERE request_id = $1", *values)
+    if "carts" in sections:
+        cart_rows = await conn.fetch(
+            "SELECT * FROM carts WHERE request_id = $1 ORDER BY created_at DESC, cart_id DESC",
+            request_id
+        )
+        carts = [CartWithProductsResponse(**dict(c)) for c in cart_rows]
+        
+        if "products" in sections and carts:
+            # One batched lookup for the products of every cart
+            product_rows = await conn.fetch("""
+                SELECT cp.cart_id, p.product_id, p.shopify_product_id, p.shopify_variant_id
+                FROM carts_products cp
+                JOIN products p ON p.product_id = cp.product_id
+                WHERE cp.cart_id = ANY($1::varchar[])
+                ORDER BY cp.created_at
+            """, [c.cart_id for c in carts])
+            products_by_cart: Dict[str, List[ProductResponse]] = {c.cart_id: [] for c in carts}
+            for p in product_rows:
+                products_by_cart[p["cart_id"]].append(ProductResponse(
+                    product_id=p["product_id"],
+                    shopify_product_id=p["shopify_product_id"],
+                    shopify_variant_id=p["shopify_variant_id"],
+                ))
+            for cart in carts:
+                cart.products = products_by_cart[cart.cart_id]
+        
+        response.carts = carts
     
-    updated_row = await conn.fetchrow("SELECT * FROM requests WHERE request_id = $1", request_id)
-    return RequestResponse(**dict(updated_row))
+    return response
+
+
+@router.put("/{request_id}", response_model=RequestResponse)
+async def update_request(
+    request_id: str,
+    request: RequestUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    conn=Depends(get_db)
+):
+    row = await update_row(
+        conn, "requests", "request_id", request_id, request.dict(exclude_unset=True),
+        resource="Request", if_match=if_match, columns=REQUEST_COLUMNS
+    )
+    response.headers["ETag"] = row_etag(row["updated_at"])
+    return RequestResponse(**row)
 
 
 @router.delete("/{request_id}")
-async def delete_request(request_id: str, conn=Depends(get_db)):
-    result = await conn.execute("DELETE FROM requests WHERE request_id = $1", request_id)
-    if result == "DELETE 0":
-        raise HTTPException(status_code=404, detail="Request not found")
+async def delete_request(
+    request_id: str,
+    conn=Depends(get_db),
+    r2_service: R2Service = Depends(get_r2_service)
+):
+    """Delete a request and its assets, removing stored files no other asset uses"""
+    async with conn.transaction():
+        # FOR UPDATE holds off new assets, whose foreign key check would wait on the row
+        request_exists = await conn.fetchrow(
+            "SELECT request_id FROM requests WHERE request_id = $1 FOR UPDATE", request_id
+        )
+        if not request_exists:
+            raise HTTPException(status_code=404, detail="Request not found")
+        # Deleted here rather than by the cascade to learn which blobs lost a reference;
+        # the RETURNING subquery still sees the variant rows the cascade removes
+        assets = await conn.fetch(
+            f"DELETE FROM request_assets WHERE request_id = $1 "
+            f"RETURNING file_key, {VARIANT_FILE_KEYS_SQL} AS variant_file_keys",
+            request_id
+        )
+        await conn.execute("DELETE FROM requests WHERE request_id = $1", request_id)
+
+    variant_keys = {}
+    for row in assets:
+        variant_keys.setdefault(row["file_key"], []).extend(row.get("variant_file_keys") or [])
+    await release_blobs(conn, r2_service, list(variant_keys), variant_keys)
     return {"message": "Request deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+PRODUCT_CACHE_MAX_ENTRIES = int(os.getenv("PRODUCT_CACHE_MAX_ENTRIES", "5000"))
+# Upper bound on staleness should an invalidation notification ever be missed
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", "300"))
+
+
+class RowCache:
+    """
+    Bounded LRU cache of rows by primary key with a TTL
+
+    The cache starts disabled and only serves rows while something keeps it
+    consistent (the cache invalidation listener enables it once LISTENing).
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Any, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so loads that raced one are not stored
+        self._generation = 0
+        self.enabled = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get_or_load(
+        self, key: Any, load: Callable[[Any], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached row for key, loading it on a miss
+
+        Args:
+            key: Primary key value
+            load: Coroutine function returning the row as a dict, or None if missing
+
+        Returns:
+            The row, or None if it does not exist (misses are not cached)
+        """
+        if not self.enabled:
+            return await load(key)
+
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+
+        row = await load(key)
+        if row is None:
+            return None
+
+        with self._lock:
+            # An invalidation arrived while loading; the row may already be stale
+            if self._generation != generation:
+                return row
+            self._entries[key] = (row, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return row
+
+    def invalidate(self, key: Any):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def set_enabled(self, enabled: bool):
+        """Turn caching on or off, dropping everything cached so far"""
+        with self._lock:
+            self.enabled = enabled
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+# Per-process product cache, kept consistent across workers by app.cache_invalidation
+product_cache = RowCache(PRODUCT_CACHE_MAX_ENTRIES, PRODUCT_CACHE_TTL)
@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Set, Tuple
+
+
+SIGNED_URL_CACHE_MAX_ENTRIES = int(os.getenv("SIGNED_URL_CACHE_MAX_ENTRIES", "10000"))
+# Fraction of a URL's lifetime that must remain for it to be served from cache
+SIGNED_URL_CACHE_MIN_REMAINING = float(os.getenv("SIGNED_URL_CACHE_MIN_REMAINING", "0.5"))
+
+
+class SignedUrlCache:
+    """Bounded LRU cache of presigned URLs keyed by (file_key, expiration)"""
+
+    def __init__(
+        self,
+        max_entries: int = SIGNED_URL_CACHE_MAX_ENTRIES,
+        min_remaining: float = SIGNED_URL_CACHE_MIN_REMAINING,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.min_remaining = min_remaining
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[str, float]]" = OrderedDict()
+        self._expirations_by_key: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_sign(self, file_key: str, expiration: int, sign: Callable[[str, int], str]) -> str:
+        """
+        Return a cached URL for file_key, re-signing it ahead of expiry
+
+        Args:
+            file_key: The R2 object key
+            expiration: Requested URL lifetime in seconds
+            sign: Presigning function, called on a miss as sign(file_key, expiration)
+
+        Returns:
+            A presigned URL with at least min_remaining of its lifetime left
+        """
+        cache_key = (file_key, expiration)
+        now = self._clock()
+
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[1] - now >= expiration * self.min_remaining:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        url = sign(file_key, expiration)
+
+        with self._lock:
+            self._entries[cache_key] = (url, now + expiration)
+            self._entries.move_to_end(cache_key)
+            self._expirations_by_key.setdefault(file_key, set()).add(expiration)
+            while len(self._entries) > self.max_entries:
+                (evicted_key, evicted_expiration), _ = self._entries.popitem(last=False)
+                self._forget(evicted_key, evicted_expiration)
+                self.evictions += 1
+        return url
+
+    def invalidate(self, file_key: str):
+        """Drop every cached URL for file_key"""
+        with self._lock:
+            for expiration in self._expirations_by_key.pop(file_key, set()):
+                self._entries.pop((file_key, expiration), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._expirations_by_key.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def _forget(self, file_key: str, expiration: int):
+        expirations = self._expirations_by_key.get(file_key)
+        if expirations is not None:
+            expirations.discard(expiration)
+            if not expirations:
+                del self._expirations_by_key[file_key]
+
+
+# Process-wide cache shared by every route that hands out signed URLs
+signed_url_cache = SignedUrlCache()
+
+
+def cached_signed_url(file_key: str, r2_service, expiration_seconds: int = 3600) -> str:
+    """Presigned URL for file_key from the shared cache, signing with r2_service on a miss"""
+    return signed_url_cache.get_or_sign(file_key, expiration_seconds, r2_service.get_signed_url)
+
+
+def signed_url_epoch(expiration_seconds: int = 3600) -> str:
+    """
+    Wall-clock window for validators of responses that embed signed URLs
+
+    Cached URLs keep at least min_remaining of their lifetime. An ETag that
+    includes this window changes after half of that, so a 304 never keeps a
+    client on a URL that is about to expire.
+    """
+    window = max(1, int(expiration_seconds * signed_url_cache.min_remaining / 2))
+    return str(int(time.time() // window))
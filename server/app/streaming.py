@@ -0,0 +1,67 @@
+import os
+from typing import Any, Callable, Sequence
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from .database import read_connection
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows fetched per round trip by the server-side cursor
+STREAM_PREFETCH_ROWS = int(os.getenv("STREAM_PREFETCH_ROWS", "500"))
+
+# OpenAPI description of the streaming variant of a list route
+NDJSON_RESPONSES = {
+    200: {"content": {NDJSON_MEDIA_TYPE: {"schema": {"type": "string"}}}},
+}
+
+
+def wants_ndjson(request: Request, stream: bool = False) -> bool:
+    """True if the client asked for a streamed NDJSON export"""
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def export_query(table: str, key_columns: Sequence[str], where: Sequence[str] = (), columns: str = "*") -> str:
+    """Unbounded SELECT in the same order as the paginated listing"""
+    query = f"SELECT {columns} FROM {table}"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    return query + " ORDER BY " + ", ".join(f"{column} DESC" for column in key_columns)
+
+
+def ndjson_response(request: Request, query: str, args: Sequence[Any], serialize: Callable[[Any], str]) -> StreamingResponse:
+    """
+    Stream query results as newline-delimited JSON
+
+    Rows are read through a server-side cursor inside a read-only transaction,
+    so only STREAM_PREFETCH_ROWS rows are held in memory at a time. FastAPI
+    releases the route's get_db/get_read_db connection before the body is
+    sent, so the stream checks out its own read connection (replica or
+    primary, as for get_read_db) when it starts and returns it to the pool
+    when the generator finishes or is closed.
+
+    Args:
+        request: The incoming request, used to pick the read connection
+        query: SELECT statement to export
+        args: Positional arguments for the statement
+        serialize: Turns one record into a JSON document (without newline)
+
+    Returns:
+        A StreamingResponse yielding one JSON document per line
+    """
+    async def body():
+        async with read_connection(request) as conn, conn.transaction(readonly=True):
+            # One chunk per prefetched batch rather than one ASGI message per row;
+            # the first row goes out alone to keep time-to-first-byte low
+            lines, flush_at = [], 1
+            async for record in conn.cursor(query, *args, prefetch=STREAM_PREFETCH_ROWS):
+                lines.append(serialize(record))
+                if len(lines) >= flush_at:
+                    yield "\n".join(lines) + "\n"
+                    lines, flush_at = [], STREAM_PREFETCH_ROWS
+            if lines:
+                yield "\n".join(lines) + "\n"
+
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,99 @@
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence
+
+from fastapi import HTTPException
+
+from .etags import if_match_versions, matches_if_match
+
+
+# Columns a PUT may change, per table. Update payload keys are checked against
+# this before they are interpolated into SQL.
+UPDATABLE_COLUMNS = {
+    "requests": ("shopify_user_id", "query"),
+    "carts": ("request_id", "shopify_user_id"),
+    "products": ("shopify_product_id", "shopify_variant_id"),
+    "request_assets": ("request_id", "file_key"),
+}
+
+# Tables with an updated_at column, which doubles as the row version for If-Match
+VERSIONED_TABLES = {"requests", "carts", "request_assets"}
+
+
+async def update_row(
+    conn,
+    table: str,
+    key_column: str,
+    key: Any,
+    changes: Dict[str, Any],
+    resource: str,
+    if_match: Optional[str] = None,
+    columns: str = "*",
+    extra_returning: Sequence[str] = (),
+) -> Dict[str, Any]:
+    """
+    Apply a partial update in a single UPDATE ... RETURNING round trip
+
+    With an If-Match header the version check is part of the UPDATE's WHERE
+    clause, and a CTE reports whether the row exists at all, so a missing row
+    (404) and a concurrent edit (412) are told apart without a second query.
+
+    Args:
+        conn: Database connection
+        table: Table to update, must be listed in UPDATABLE_COLUMNS
+        key_column: Primary key column
+        key: Primary key value
+        changes: Column values to set (exclude_unset payload)
+        resource: Name used in error details, e.g. "Cart"
+        if_match: Raw If-Match header, if any
+        columns: Select list returned for the updated row
+        extra_returning: Additional RETURNING expressions
+
+    Returns:
+        The updated row as a dict
+    """
+    unknown = set(changes) - set(UPDATABLE_COLUMNS[table])
+    if unknown:
+        raise ValueError(f"Columns not updatable on {table}: {sorted(unknown)}")
+    versioned = table in VERSIONED_TABLES
+
+    if not changes:
+        row = await conn.fetchrow(f"SELECT {columns} FROM {table} WHERE {key_column} = $1", key)
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"{resource} not found")
+        if versioned and not matches_if_match(if_match, row["updated_at"]):
+            raise HTTPException(status_code=412, detail=f"{resource} was modified by another update")
+        return dict(row)
+
+    changes = dict(changes)
+    if versioned:
+        changes["updated_at"] = datetime.utcnow()
+
+    args = [key] + list(changes.values())
+    set_clause = ", ".join(f"{column} = ${i + 2}" for i, column in enumerate(changes))
+    conditions = [f"{key_column} = $1"]
+
+    check_version = versioned and if_match is not None and if_match.strip() != "*"
+    if check_version:
+        args.append(if_match_versions(if_match))
+        conditions.append(f"updated_at = ANY(${len(args)}::timestamp[])")
+
+    returning = ", ".join([columns, *extra_returning])
+    query = f"UPDATE {table} SET {set_clause} WHERE {' AND '.join(conditions)} RETURNING {returning}"
+
+    if not check_version:
+        row = await conn.fetchrow(query, *args)
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"{resource} not found")
+        return dict(row)
+
+    row = dict(await conn.fetchrow(f"""
+        WITH updated AS ({query})
+        SELECT updated.*, EXISTS (SELECT 1 FROM {table} WHERE {key_column} = $1) AS row_exists
+        FROM (SELECT 1) AS one LEFT JOIN updated ON true
+    """, *args))
+    row_exists = row.pop("row_exists")
+    if row[key_column] is None:
+        if row_exists:
+            raise HTTPException(status_code=412, detail=f"{resource} was modified by another update")
+        raise HTTPException(status_code=404, detail=f"{resource} not found")
+    return row
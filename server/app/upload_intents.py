@@ -0,0 +1,36 @@
+import logging
+import os
+from datetime import datetime
+
+from .database import get_pool
+from .r2_service import init_r2_service
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds a presigned upload URL (and its pending intent) stays valid
+UPLOAD_INTENT_TTL = int(os.getenv("UPLOAD_INTENT_TTL", "900"))
+# Seconds between sweeps for intents that were never completed
+UPLOAD_INTENT_SWEEP_INTERVAL = float(os.getenv("UPLOAD_INTENT_SWEEP_INTERVAL", "300"))
+
+
+async def expire_upload_intents():
+    """Delete expired upload intents and any objects uploaded for them"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            "DELETE FROM request_asset_upload_intents WHERE expires_at < $1 RETURNING file_key",
+            datetime.utcnow()
+        )
+    if not rows:
+        return
+
+    try:
+        r2_service = init_r2_service()
+    except ValueError:
+        return
+    # One DeleteObjects call per 1000 keys rather than a request per object
+    storage = await r2_service.delete_files([row["file_key"] for row in rows])
+    for err in storage["errors"]:
+        logger.warning("Failed to delete orphaned upload %s: %s %s", err["file_key"], err["code"], err["message"])
+    logger.info("Expired %d pending upload intents", len(rows))
@@ -0,0 +1,374 @@
+"""
+End-to-end load test against local Postgres and a moto S3 stand-in.
+
+Starts a moto S3 server and the API (uvicorn subprocess, migrations applied
+on startup), seeds realistic volumes with COPY, then runs a weighted mix of
+workloads from --concurrency virtual users for --duration seconds:
+
+    createdb go_cart_bench
+    uv run python benchmarks/load_test.py \\
+        --database-url postgresql://localhost:5432/go_cart_bench \\
+        --concurrency 32 --duration 30 --output before.json
+
+Workloads (weights via --mix name=weight,...):
+    feed            GET /requests/ then follow next_cursor for a few pages
+    request_detail  GET /requests/{id}/full
+    search          GET /requests/search
+    create_request  POST /requests/ and tag it
+    build_cart      POST /carts/ and add 1-5 products
+    product         GET /products/{id}
+    upload          POST /request-assets/upload with a 64 KiB file
+
+Prints (and optionally writes) a JSON report with per-endpoint request
+counts, error counts, RPS and p50/p95/p99 latency, so runs before and after
+a change can be diffed. Pass --base-url to drive an already running server
+instead (seeding still uses --database-url).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import asyncpg
+import httpx
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = "feed=40,request_detail=15,search=10,create_request=10,build_cart=10,product=10,upload=5"
+WORDS = ["red", "blue", "running", "trail", "leather", "desk", "lamp", "shoes", "jacket", "chair",
+         "mug", "backpack", "vintage", "modern", "waterproof", "organic", "cotton", "oak", "gift", "tent"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Recorder:
+    """Latency samples and error counts per endpoint template"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[endpoint] += 1
+            self.statuses[endpoint]["exception"] += 1
+            return None
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        self.statuses[endpoint][str(resp.status_code)] += 1
+        if resp.status_code >= 400:
+            self.errors[endpoint] += 1
+            return None
+        return resp
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint in sorted(set(self.latencies) | set(self.errors)):
+            ordered = sorted(self.latencies[endpoint])
+            count = len(ordered)
+            endpoints[endpoint] = {
+                "requests": count,
+                "errors": self.errors[endpoint],
+                "rps": round(count / elapsed, 1),
+                "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+                "mean_ms": round(statistics.fmean(ordered) * 1000, 2) if ordered else 0.0,
+                "statuses": dict(self.statuses[endpoint]),
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "requests": total,
+            "errors": sum(self.errors.values()),
+            "rps": round(total / elapsed, 1),
+            "endpoints": endpoints,
+        }
+
+
+class Dataset:
+    """Ids of seeded rows that the workloads read from and write against"""
+
+    def __init__(self, request_ids, product_ids):
+        self.request_ids = request_ids
+        self.product_ids = product_ids
+
+
+async def seed(database_url: str, requests: int, products: int, carts_per_request: float, rng: random.Random):
+    conn = await asyncpg.connect(database_url)
+    try:
+        now = datetime.utcnow()
+        request_rows = [
+            (str(uuid.uuid4()), f"bench-user-{i % 5000}", " ".join(rng.sample(WORDS, rng.randint(2, 5))),
+             now - timedelta(seconds=i), now - timedelta(seconds=i))
+            for i in range(requests)
+        ]
+        await conn.copy_records_to_table(
+            "requests", records=request_rows,
+            columns=["request_id", "shopify_user_id", "query", "created_at", "updated_at"],
+        )
+        product_rows = [(str(uuid.uuid4()), f"gid://shopify/Product/{i}", f"gid://shopify/ProductVariant/{i}")
+                        for i in range(products)]
+        await conn.copy_records_to_table(
+            "products", records=product_rows, columns=["product_id", "shopify_product_id", "shopify_variant_id"],
+        )
+
+        tag_rows, cart_rows, cart_product_rows = [], [], []
+        for request_id, user, _, created_at, _ in request_rows:
+            for tag in rng.sample(WORDS, rng.randint(1, 3)):
+                tag_rows.append((tag, request_id, created_at, created_at))
+            for _ in range(int(carts_per_request) + (rng.random() < carts_per_request % 1)):
+                cart_id = str(uuid.uuid4())
+                cart_rows.append((cart_id, request_id, user, created_at, created_at))
+                for product in rng.sample(product_rows, min(len(product_rows), rng.randint(1, 4))):
+                    cart_product_rows.append((cart_id, product[0], created_at, created_at))
+        await conn.copy_records_to_table(
+            "request_tags", records=tag_rows, columns=["tag_value", "request_id", "created_at", "updated_at"],
+        )
+        await conn.copy_records_to_table(
+            "carts", records=cart_rows,
+            columns=["cart_id", "request_id", "shopify_user_id", "created_at", "updated_at"],
+        )
+        await conn.copy_records_to_table(
+            "carts_products", records=cart_product_rows,
+            columns=["cart_id", "product_id", "created_at", "updated_at"],
+        )
+        await conn.execute("ANALYZE")
+        return Dataset([r[0] for r in request_rows], [p[0] for p in product_rows])
+    finally:
+        await conn.close()
+
+
+async def feed(client, rec: Recorder, data: Dataset, rng: random.Random):
+    cursor = None
+    for _ in range(rng.randint(1, 3)):
+        params = {"limit": 20}
+        if cursor:
+            params["cursor"] = cursor
+        resp = await rec.call(client, "GET /requests/", "GET", "/requests/", params=params)
+        if resp is None:
+            return
+        cursor = resp.json()["next_cursor"]
+        if not cursor:
+            return
+
+
+async def request_detail(client, rec, data, rng):
+    await rec.call(client, "GET /requests/{id}/full", "GET", f"/requests/{rng.choice(data.request_ids)}/full")
+
+
+async def search(client, rec, data, rng):
+    await rec.call(client, "GET /requests/search", "GET", "/requests/search",
+                   params={"q": " ".join(rng.sample(WORDS, rng.randint(1, 2))), "limit": 20})
+
+
+async def create_request(client, rec, data, rng):
+    resp = await rec.call(client, "POST /requests/", "POST", "/requests/", json={
+        "shopify_user_id": f"bench-user-{rng.randint(0, 4999)}",
+        "query": " ".join(rng.sample(WORDS, rng.randint(2, 5))),
+    })
+    if resp is None:
+        return
+    request_id = resp.json()["request_id"]
+    data.request_ids.append(request_id)
+    await rec.call(client, "POST /request-tags/", "POST", "/request-tags/",
+                   json={"tag_value": rng.choice(WORDS), "request_id": request_id})
+
+
+async def build_cart(client, rec, data, rng):
+    resp = await rec.call(client, "POST /carts/", "POST", "/carts/", json={
+        "request_id": rng.choice(data.request_ids), "shopify_user_id": f"bench-user-{rng.randint(0, 4999)}",
+    })
+    if resp is None:
+        return
+    cart_id = resp.json()["cart_id"]
+    for product_id in rng.sample(data.product_ids, min(len(data.product_ids), rng.randint(1, 5))):
+        await rec.call(client, "POST /cart-products/", "POST", "/cart-products/",
+                       json={"cart_id": cart_id, "product_id": product_id})
+
+
+async def product(client, rec, data, rng):
+    await rec.call(client, "GET /products/{id}", "GET", f"/products/{rng.choice(data.product_ids)}")
+
+
+UPLOAD_PAYLOAD = os.urandom(64 * 1024)
+
+
+async def upload(client, rec, data, rng):
+    await rec.call(client, "POST /request-assets/upload", "POST", "/request-assets/upload",
+                   data={"request_id": rng.choice(data.request_ids)},
+                   files={"file": ("photo.png", UPLOAD_PAYLOAD, "image/png")})
+
+
+WORKLOADS = {
+    "feed": feed,
+    "request_detail": request_detail,
+    "search": search,
+    "create_request": create_request,
+    "build_cart": build_cart,
+    "product": product,
+    "upload": upload,
+}
+
+
+def parse_mix(spec: str):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in WORKLOADS:
+            raise SystemExit(f"Unknown workload {name!r}; choose from {', '.join(WORKLOADS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def drive(base_url: str, data: Dataset, mix, concurrency: int, duration: float, seed: int) -> dict:
+    rec = Recorder()
+    names, weights = list(mix), list(mix.values())
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+
+        async def user(index: int):
+            rng = random.Random(seed + index)
+            while time.perf_counter() < deadline:
+                await WORKLOADS[rng.choices(names, weights)[0]](client, rec, data, rng)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+        return rec.report(time.perf_counter() - started)
+
+
+def start_moto():
+    from moto.server import ThreadedMotoServer
+    import boto3
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    port = free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    endpoint = f"http://127.0.0.1:{port}"
+    boto3.client(
+        "s3", endpoint_url=endpoint, region_name="us-east-1",
+        aws_access_key_id="bench", aws_secret_access_key="bench",
+    ).create_bucket(Bucket="bench")
+    return server, endpoint
+
+
+async def wait_healthy(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"API at {base_url} did not become healthy within {timeout}s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "postgresql://localhost:5432/go_cart_bench"))
+    parser.add_argument("--base-url", help="Drive an already running server instead of starting one")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--requests", type=int, default=100_000, help="Requests to seed")
+    parser.add_argument("--products", type=int, default=5_000, help="Products to seed")
+    parser.add_argument("--carts-per-request", type=float, default=0.5)
+    parser.add_argument("--no-seed", action="store_true")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for data and workload choice")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    moto_server = server = None
+    base_url = args.base_url
+    try:
+        if base_url is None:
+            moto_server, endpoint = start_moto()
+            port = free_port()
+            env = dict(
+                os.environ,
+                DATABASE_URL=args.database_url,
+                DB_AUTO_MIGRATE="true",
+                R2_ENDPOINT_URL=endpoint,
+                R2_ACCESS_KEY_ID="bench",
+                R2_SECRET_ACCESS_KEY="bench",
+                R2_BUCKET_NAME="bench",
+                AWS_DEFAULT_REGION="us-east-1",
+            )
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+                 "--log-level", "warning", "--no-access-log"],
+                cwd=SERVER_DIR, env=env,
+            )
+            base_url = f"http://127.0.0.1:{port}"
+        await wait_healthy(base_url)
+
+        rng = random.Random(args.seed)
+        if args.no_seed:
+            conn = await asyncpg.connect(args.database_url)
+            try:
+                data = Dataset(
+                    [r["request_id"] for r in await conn.fetch("SELECT request_id FROM requests LIMIT 100000")],
+                    [r["product_id"] for r in await conn.fetch("SELECT product_id FROM products LIMIT 100000")],
+                )
+            finally:
+                await conn.close()
+        else:
+            data = await seed(args.database_url, args.requests, args.products, args.carts_per_request, rng)
+
+        if args.warmup:
+            await drive(base_url, data, mix, args.concurrency, args.warmup, args.seed + 1_000_000)
+        report = await drive(base_url, data, mix, args.concurrency, args.duration, args.seed)
+        report["config"] = {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "mix": mix,
+            "seeded_requests": args.requests if not args.no_seed else None,
+            "seeded_products": args.products if not args.no_seed else None,
+        }
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if moto_server is not None:
+            moto_server.stop()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
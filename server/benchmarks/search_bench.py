@@ -0,0 +1,129 @@
+"""
+Search latency benchmark for GET /requests/search.
+
+Copies the migrated requests table (columns and indexes) into a scratch
+--schema, seeds it with --rows rows of random product queries via COPY,
+runs ANALYZE, then times --samples searches against a running server that
+reads the scratch schema first:
+
+    DB_SEARCH_PATH=search_bench,public uvicorn main:app --port 8000
+    uv run python benchmarks/search_bench.py --database-url postgresql://localhost/shopify_minis --rows 1000000
+
+The scratch schema is dropped afterwards unless --keep is given, and
+--database-url has no default so the application tables are never seeded by
+accident. Prints a JSON report with p50/p95/p99 latency for full-text and,
+with --fuzzy (needs ENABLE_TRIGRAM_SEARCH on the server), trigram search.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import asyncpg
+import httpx
+
+
+WORDS = [
+    "red", "blue", "black", "running", "trail", "leather", "wool", "linen", "desk", "lamp",
+    "shoes", "boots", "jacket", "scarf", "chair", "table", "mug", "kettle", "backpack", "tent",
+    "vintage", "modern", "minimal", "waterproof", "organic", "cotton", "ceramic", "oak", "steel", "gift",
+]
+
+
+def random_query(rng: random.Random) -> str:
+    return " ".join(rng.sample(WORDS, rng.randint(2, 6)))
+
+
+async def seed(database_url: str, schema: str, rows: int, batch_size: int = 50_000):
+    rng = random.Random(0)
+    conn = await asyncpg.connect(database_url)
+    try:
+        await conn.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE')
+        await conn.execute(f'CREATE SCHEMA "{schema}"')
+        await conn.execute(f'CREATE TABLE "{schema}".requests (LIKE public.requests INCLUDING ALL)')
+        now = datetime.utcnow()
+        for start in range(0, rows, batch_size):
+            records = [
+                (str(uuid.uuid4()), f"bench-user-{i % 1000}", random_query(rng),
+                 now - timedelta(seconds=i), now - timedelta(seconds=i))
+                for i in range(start, min(start + batch_size, rows))
+            ]
+            await conn.copy_records_to_table(
+                "requests",
+                schema_name=schema,
+                records=records,
+                columns=["request_id", "shopify_user_id", "query", "created_at", "updated_at"],
+            )
+        await conn.execute(f'ANALYZE "{schema}".requests')
+    finally:
+        await conn.close()
+
+
+async def drop_schema(database_url: str, schema: str):
+    conn = await asyncpg.connect(database_url)
+    try:
+        await conn.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE')
+    finally:
+        await conn.close()
+
+
+async def time_searches(client: httpx.AsyncClient, samples: int, fuzzy: bool):
+    rng = random.Random(1)
+    latencies = []
+    for _ in range(samples):
+        words = rng.sample(WORDS, rng.randint(1, 3))
+        if fuzzy:
+            # Drop a letter to exercise typo tolerance
+            words = [w[:-1] if len(w) > 4 else w for w in words]
+        started = time.perf_counter()
+        resp = await client.get("/requests/search", params={"q": " ".join(words), "fuzzy": fuzzy})
+        resp.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    quantiles = statistics.quantiles(ordered, n=100)
+    return {
+        "samples": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 2),
+        "p95_ms": round(quantiles[94], 2),
+        "p99_ms": round(quantiles[98], 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--database-url", required=True, help="Database the server under test is connected to")
+    parser.add_argument("--schema", default="search_bench", help="Scratch schema seeded and dropped by the run")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--no-seed", action="store_true", help="Reuse the scratch schema from a --keep run")
+    parser.add_argument("--keep", action="store_true", help="Leave the scratch schema in place afterwards")
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--fuzzy", action="store_true")
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        await seed(args.database_url, args.schema, args.rows)
+
+    report = {}
+    try:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=None) as client:
+            report["fulltext"] = summarize(await time_searches(client, args.samples, fuzzy=False))
+            if args.fuzzy:
+                report["fuzzy"] = summarize(await time_searches(client, args.samples, fuzzy=True))
+    finally:
+        if not args.keep:
+            await drop_schema(args.database_url, args.schema)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+Serialization micro-benchmark: per-row Pydantic models vs the orjson page path.
+
+Serves the same rows through two throwaway routes with the same
+response_model, one returning Page[RequestResponse] built row by row (the
+old list route body) and one returning page_response(), and times full
+ASGI requests in process:
+
+    uv run python benchmarks/serialization.py --sizes 1000 10000 100000
+
+Rows are plain dicts shaped like asyncpg Records (Records cannot be built
+without a server); both paths index them the same way. Prints a JSON report
+with rows per second for each path and size.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.fast_json import model_fields, page_response  # noqa: E402
+from app.models import Page, RequestResponse  # noqa: E402
+
+
+def make_rows(n: int):
+    now = datetime.utcnow()
+    return [
+        {"request_id": f"req-{i:08d}", "shopify_user_id": f"user-{i % 1000}", "query": f"benchmark query {i}",
+         "created_at": now - timedelta(seconds=i), "updated_at": now - timedelta(seconds=i)}
+        for i in range(n)
+    ]
+
+
+def build_app(rows) -> FastAPI:
+    app = FastAPI()
+    fields = model_fields(RequestResponse)
+
+    @app.get("/pydantic", response_model=Page[RequestResponse])
+    async def pydantic_page():
+        return Page[RequestResponse](items=[RequestResponse(**dict(row)) for row in rows], next_cursor=None)
+
+    @app.get("/orjson", response_model=Page[RequestResponse])
+    async def orjson_page():
+        return page_response(rows, fields)
+
+    return app
+
+
+async def time_path(client: httpx.AsyncClient, path: str, rows: int, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        resp = await client.get(path)
+        resp.raise_for_status()
+        samples.append(time.perf_counter() - started)
+    assert len(resp.json()["items"]) == rows
+    best = min(samples)
+    return {
+        "ms_median": round(statistics.median(samples) * 1000, 2),
+        "rows_per_second": int(rows / best),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    report = {}
+    for size in args.sizes:
+        app = build_app(make_rows(size))
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            slow = await time_path(client, "/pydantic", size, args.repeat)
+            fast = await time_path(client, "/orjson", size, args.repeat)
+        report[str(size)] = {
+            "pydantic": slow,
+            "orjson": fast,
+            "speedup": round(fast["rows_per_second"] / slow["rows_per_second"], 2),
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,151 @@
+"""
+Time-to-first-byte benchmark: NDJSON streaming export vs buffered pages.
+
+Seeds the requests table with --rows rows (skip with --no-seed) and then
+exports every row both ways against a running server:
+
+    uv run python benchmarks/ttfb.py --base-url http://localhost:8000 --rows 200000 --server-pid 1234
+
+Prints a JSON report with TTFB and total export time for each mode. With
+--server-pid (a single-worker server on this machine) it also samples the
+server's resident memory during each export and reports the peak growth.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import asyncpg
+import httpx
+
+
+async def seed(database_url: str, rows: int):
+    conn = await asyncpg.connect(database_url)
+    try:
+        now = datetime.utcnow()
+        records = [
+            (str(uuid.uuid4()), f"bench-user-{i % 1000}", f"benchmark query {i}",
+             now - timedelta(seconds=i), now - timedelta(seconds=i))
+            for i in range(rows)
+        ]
+        await conn.copy_records_to_table(
+            "requests",
+            records=records,
+            columns=["request_id", "shopify_user_id", "query", "created_at", "updated_at"],
+        )
+    finally:
+        await conn.close()
+
+
+def rss_bytes(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+async def peak_rss_growth(pid: int, export):
+    """Run export() while sampling the server's RSS; returns its result and the peak growth in bytes"""
+    baseline = peak = rss_bytes(pid)
+    done = asyncio.Event()
+
+    async def sample():
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, rss_bytes(pid))
+            await asyncio.sleep(0.005)
+
+    sampler = asyncio.create_task(sample())
+    try:
+        result = await export()
+    finally:
+        done.set()
+        await sampler
+    return (*result, peak - baseline)
+
+
+async def export_streamed(client: httpx.AsyncClient):
+    started = time.perf_counter()
+    ttfb = None
+    rows = 0
+    async with client.stream("GET", "/requests/", params={"stream": "true"}) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+            if line:
+                rows += 1
+    return ttfb, time.perf_counter() - started, rows
+
+
+async def export_buffered(client: httpx.AsyncClient, page_size: int):
+    started = time.perf_counter()
+    ttfb = None
+    rows = 0
+    cursor = None
+    while True:
+        params = {"limit": page_size}
+        if cursor:
+            params["cursor"] = cursor
+        resp = await client.get("/requests/", params=params)
+        resp.raise_for_status()
+        if ttfb is None:
+            ttfb = time.perf_counter() - started
+        body = resp.json()
+        rows += len(body["items"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    return ttfb, time.perf_counter() - started, rows
+
+
+def summarize(samples):
+    ttfbs = [s[0] * 1000 for s in samples]
+    totals = [s[1] * 1000 for s in samples]
+    summary = {
+        "rows": samples[0][2],
+        "ttfb_ms_median": round(statistics.median(ttfbs), 2),
+        "ttfb_ms_min": round(min(ttfbs), 2),
+        "total_ms_median": round(statistics.median(totals), 2),
+    }
+    if len(samples[0]) > 3:
+        summary["peak_rss_growth_mb"] = round(max(s[3] for s in samples) / 1024 / 1024, 1)
+    return summary
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "postgresql://localhost:5432/shopify_minis"))
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--no-seed", action="store_true")
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--server-pid", type=int, help="Sample this server process's memory during exports")
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        await seed(args.database_url, args.rows)
+
+    async def measure(export):
+        if args.server_pid:
+            return await peak_rss_growth(args.server_pid, export)
+        return await export()
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=None) as client:
+        streamed = [await measure(lambda: export_streamed(client)) for _ in range(args.repeat)]
+        buffered = [await measure(lambda: export_buffered(client, args.page_size)) for _ in range(args.repeat)]
+
+    print(json.dumps({
+        "stream": summarize(streamed),
+        "buffered": summarize(buffered),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
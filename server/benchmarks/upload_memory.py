@@ -0,0 +1,128 @@
+"""
+Peak RSS of streamed vs buffered uploads against a local moto S3 server.
+
+Every (mode, size) case runs in a fresh subprocess so ru_maxrss reflects
+that case alone:
+
+    uv run python benchmarks/upload_memory.py --sizes-mb 16 64 256
+
+"stream" feeds a file on disk through R2Service.upload_stream (multipart,
+bounded memory); "buffered" reads the whole file into memory and calls
+R2Service.upload_file, like the old /request-assets/upload handler did.
+Prints a JSON report of peak RSS per case.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FileStream:
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+
+def peak_rss_mb() -> float:
+    # VmHWM is this process's own high-water mark; ru_maxrss on Linux survives
+    # fork/exec and would report the parent's (moto server's) peak instead
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def run_case(mode: str, path: str):
+    from app.r2_service import R2Service
+
+    svc = R2Service()
+    try:
+        if mode == "stream":
+            await svc.upload_stream("bench", FileStream(path), "payload.bin")
+        else:
+            with open(path, "rb") as f:
+                await svc.upload_file("bench", f.read(), "payload.bin")
+    finally:
+        svc.close()
+
+
+def child(mode: str, path: str):
+    baseline = peak_rss_mb()
+    asyncio.run(run_case(mode, path))
+    print(json.dumps({"baseline_rss_mb": baseline, "peak_rss_mb": peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    from moto.server import ThreadedMotoServer
+    import boto3
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+
+    env = dict(
+        os.environ,
+        R2_ENDPOINT_URL=f"http://127.0.0.1:{port}",
+        R2_ACCESS_KEY_ID="bench",
+        R2_SECRET_ACCESS_KEY="bench",
+        R2_BUCKET_NAME="bench",
+        AWS_DEFAULT_REGION="us-east-1",
+    )
+    boto3.client(
+        "s3", endpoint_url=env["R2_ENDPOINT_URL"], region_name="us-east-1",
+        aws_access_key_id="bench", aws_secret_access_key="bench",
+    ).create_bucket(Bucket="bench")
+
+    results = []
+    try:
+        for size_mb in args.sizes_mb:
+            with tempfile.NamedTemporaryFile(delete=False) as tmp:
+                for _ in range(size_mb):
+                    tmp.write(os.urandom(1024 * 1024))
+            try:
+                for mode in ("stream", "buffered"):
+                    out = subprocess.run(
+                        [sys.executable, __file__, "--child", mode, tmp.name],
+                        env=env, capture_output=True, text=True, check=True,
+                    )
+                    report = json.loads(out.stdout.strip().splitlines()[-1])
+                    results.append({"mode": mode, "size_mb": size_mb, **report})
+            finally:
+                os.unlink(tmp.name)
+    finally:
+        server.stop()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
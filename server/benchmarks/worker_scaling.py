@@ -0,0 +1,153 @@
+"""
+Worker scaling benchmark: RPS of serve.py as WEB_CONCURRENCY grows.
+
+Starts serve.py once per worker count, drives it from several client
+processes (so the load generator is not the bottleneck) and reports
+throughput and latency for each count:
+
+    uv run python benchmarks/worker_scaling.py --workers 1,2,4,8 --duration 15 --database-url postgresql://localhost/shopify_minis
+
+By default it hits /health, which runs no query and shows the CPU scaling
+of the HTTP stack itself; the server still connects to --database-url at
+startup. Point --path at a database-backed route to include the pool and
+Postgres. Run the client on
+a machine with spare cores, or it competes with the workers it measures.
+
+Prints a JSON report with RPS, p50/p99 latency and scaling efficiency
+(RPS per worker relative to one worker).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def _drive(url: str, connections: int, duration: float):
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+
+        async def user():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    resp = await client.get(url)
+                    if resp.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(user() for _ in range(connections)))
+    return latencies, errors
+
+
+def client_process(url: str, connections: int, duration: float, results):
+    results.put(asyncio.run(_drive(url, connections, duration)))
+
+
+def run_load(url: str, clients: int, connections: int, duration: float):
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=client_process, args=(url, connections, duration, results))
+        for _ in range(clients)
+    ]
+    for proc in procs:
+        proc.start()
+    latencies, errors = [], 0
+    for _ in procs:
+        proc_latencies, proc_errors = results.get()
+        latencies.extend(proc_latencies)
+        errors += proc_errors
+    for proc in procs:
+        proc.join()
+    return sorted(latencies), errors
+
+
+def wait_healthy(base_url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"serve.py at {base_url} did not become healthy within {timeout}s")
+
+
+def measure(workers: int, args) -> dict:
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), HOST="127.0.0.1", PORT=str(port))
+    if args.database_url:
+        env["DATABASE_URL"] = args.database_url
+    server = subprocess.Popen([sys.executable, "serve.py"], cwd=SERVER_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_healthy(base_url)
+        run_load(base_url + args.path, args.clients, args.connections, args.warmup)
+        latencies, errors = run_load(base_url + args.path, args.clients, args.connections, args.duration)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / args.duration, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--path", default="/health")
+    parser.add_argument("--database-url", help="DATABASE_URL for the server under test")
+    parser.add_argument("--clients", type=int, default=os.cpu_count() or 1, help="Load generator processes")
+    parser.add_argument("--connections", type=int, default=32, help="Concurrent connections per client process")
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--warmup", type=float, default=3)
+    args = parser.parse_args()
+
+    results = [measure(int(n), args) for n in args.workers.split(",")]
+    baseline = results[0]["rps"] / results[0]["workers"] if results[0]["rps"] else 0
+    for result in results:
+        result["efficiency"] = round(result["rps"] / (baseline * result["workers"]), 2) if baseline else 0.0
+    print(json.dumps({
+        "path": args.path,
+        "cpu_count": os.cpu_count(),
+        "clients": args.clients,
+        "connections_per_client": args.connections,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,23 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import logging
 from contextlib import asynccontextmanager
-from app.database import create_tables
+from app.database import (
+    init_pool, close_pool, pool_stats, ensure_schema,
+    DATABASE_REPLICA_URLS, DB_REPLICA_CHECK_INTERVAL, ReadYourWritesMiddleware,
+    check_replicas, close_replica_pools, replica_stats,
+)
 from app.routers import requests, carts, products, cart_products, request_tags, request_assets
+from app.r2_service import init_r2_service, close_r2_service
+from app.signed_url_cache import signed_url_cache
+from app.background import run_periodically, cancel_tasks
+from app.upload_intents import expire_upload_intents, UPLOAD_INTENT_SWEEP_INTERVAL
+from app.cache_invalidation import cache_invalidation_listener
+from app.row_cache import product_cache
+from app.metrics import MetricsMiddleware, mark_worker_stopped, metrics_response
+from app.profiling import QueryProfileMiddleware
+from app.image_variants import shutdown_variant_executor, wait_for_variant_tasks
 import asyncpg
 import os
 from dotenv import load_dotenv
@@ -17,10 +31,11 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database tables with foreign key constraints"""
+    """Create the shared connection pool and check the database schema version"""
     try:
-        await create_tables()
-        print("✅ Database tables created successfully!")
+        await init_pool()
+        version = await ensure_schema()
+        print(f"✅ Database schema at version {version}")
     except (asyncpg.PostgresConnectionError, OSError) as e:
         print(f"⚠️  Warning: Could not connect to PostgreSQL database: {e}")
         print("💡 Please ensure PostgreSQL is running and accessible.")
@@ -29,7 +44,29 @@ async def lifespan(app: FastAPI):
         print("   - Docker: docker run --name postgres -e POSTGRES_DB=shopify_minis -p 5432:5432 -d postgres")
         print("   Or set DATABASE_URL environment variable to a different database.")
         print("\n🔗 API will start without database connection.")
+    try:
+        init_r2_service()
+    except ValueError as e:
+        logging.getLogger(__name__).warning("R2 storage is not configured: %s", e)
+    background_tasks = [
+        asyncio.create_task(run_periodically(
+            "expire-upload-intents", UPLOAD_INTENT_SWEEP_INTERVAL, expire_upload_intents
+        )),
+        asyncio.create_task(cache_invalidation_listener.run()),
+    ]
+    if DATABASE_REPLICA_URLS:
+        # Replicas join the read rotation once their first health check passes
+        background_tasks.append(asyncio.create_task(run_periodically(
+            "check-replicas", DB_REPLICA_CHECK_INTERVAL, check_replicas
+        )))
     yield
+    await cancel_tasks(background_tasks)
+    await wait_for_variant_tasks()
+    shutdown_variant_executor()
+    close_r2_service()
+    await close_replica_pools()
+    await close_pool()
+    mark_worker_stopped()
 
 
 app = FastAPI(
@@ -54,6 +91,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Pin a client's reads to the primary for a short while after it writes
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Per-request DB time as a Server-Timing header (and ?explain=1 when enabled)
+app.add_middleware(QueryProfileMiddleware)
+
+# Request latency and in-flight metrics, exposed on /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(requests.router)
 app.include_router(carts.router)
@@ -71,6 +117,23 @@ async def root():
         "docs": "/docs"
     }
 
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok",
+        "db_pool": pool_stats(),
+        "db_replicas": replica_stats(),
+        "signed_url_cache": signed_url_cache.stats(),
+        "product_cache": {**product_cache.stats(), "listener": cache_invalidation_listener.stats()},
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return metrics_response()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
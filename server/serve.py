@@ -0,0 +1,59 @@
+"""
+Production entry point: several uvicorn worker processes behind one socket
+
+    uv run python serve.py
+
+Each worker imports main:app and runs its lifespan, so every process opens
+its own database pool, R2 client and cache listener. Configure with:
+
+    WEB_CONCURRENCY              worker processes (default: CPU count)
+    HOST / PORT                  bind address (default 0.0.0.0:8000)
+    GRACEFUL_SHUTDOWN_TIMEOUT    seconds a worker drains in-flight requests after SIGTERM
+    MAX_REQUESTS_PER_WORKER      recycle a worker after this many requests (0 = never)
+    KEEPALIVE_TIMEOUT            seconds idle keep-alive connections stay open
+"""
+import os
+import shutil
+import tempfile
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+GRACEFUL_SHUTDOWN_TIMEOUT = float(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
+MAX_REQUESTS_PER_WORKER = int(os.getenv("MAX_REQUESTS_PER_WORKER", "0"))
+KEEPALIVE_TIMEOUT = int(os.getenv("KEEPALIVE_TIMEOUT", "5"))
+
+
+def main():
+    metrics_dir = None
+    if WEB_CONCURRENCY > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Workers must share a metrics directory for /metrics to cover all of them
+        metrics_dir = tempfile.mkdtemp(prefix="go-cart-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+
+    try:
+        uvicorn.run(
+            "main:app",
+            host=HOST,
+            port=PORT,
+            workers=WEB_CONCURRENCY,
+            loop="uvloop",
+            http="httptools",
+            timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_TIMEOUT,
+            limit_max_requests=MAX_REQUESTS_PER_WORKER or None,
+            timeout_keep_alive=KEEPALIVE_TIMEOUT,
+            proxy_headers=True,
+        )
+    finally:
+        if metrics_dir is not None:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
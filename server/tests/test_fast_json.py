@@ -0,0 +1,60 @@
+import json
+from datetime import datetime
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from main import app as fastapi_app
+from app.database import get_db, get_read_db
+from app.fast_json import model_fields, page_response
+from app.models import Page, RequestResponse
+
+
+NOW = datetime(2024, 5, 1, 12, 0, 0, 250000)
+
+
+def request_rows(n):
+    return [
+        {"request_id": f"req-{i}", "shopify_user_id": "u1", "query": f"q{i}", "created_at": NOW,
+         "updated_at": NOW, "query_tsv": "'q':1"}
+        for i in range(n)
+    ]
+
+
+def test_page_response_matches_pydantic_serialization():
+    rows = request_rows(3)
+    fast = page_response(rows, model_fields(RequestResponse), "cursor-1")
+    slow = Page[RequestResponse](items=[RequestResponse(**row) for row in rows], next_cursor="cursor-1")
+
+    assert fast.media_type == "application/json"
+    assert json.loads(fast.body) == json.loads(slow.model_dump_json())
+    assert "query_tsv" not in fast.body.decode()
+
+
+class PageDB:
+    async def fetchval(self, query, *args):
+        return "digest"
+
+    async def fetch(self, query, *args):
+        return request_rows(2)
+
+
+@pytest.mark.asyncio
+async def test_list_route_uses_fast_path_and_keeps_schema():
+    async def override_get_db():
+        yield PageDB()
+
+    fastapi_app.dependency_overrides[get_db] = override_get_db
+    fastapi_app.dependency_overrides[get_read_db] = override_get_db
+    try:
+        async with AsyncClient(transport=ASGITransport(app=fastapi_app), base_url="http://test") as client:
+            resp = await client.get("/requests/")
+            schema = (await client.get("/openapi.json")).json()
+    finally:
+        fastapi_app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    assert resp.headers["etag"] == '"digest"'
+    assert resp.json()["items"][0]["created_at"] == "2024-05-01T12:00:00.250000"
+    ok = schema["paths"]["/requests/"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert ok == {"$ref": "#/components/schemas/Page_RequestResponse_"}
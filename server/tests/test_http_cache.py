@@ -0,0 +1,171 @@
+from datetime import datetime
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from main import app as fastapi_app
+import app.database as database
+import app.signed_url_cache as signed_url_cache_module
+from app.database import get_db, get_read_db
+from app.etags import row_etag
+from app.r2_service import get_r2_service
+from app.row_cache import product_cache
+
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+
+class CacheDB:
+    """Returns a fixed page digest from fetchval and canned rows from fetch/fetchrow"""
+
+    def __init__(self, digest="abc123", rows=(), row=None):
+        self.digest = digest
+        self.rows = list(rows)
+        self.row = row
+        self.validator_queries = []
+        self.fetches = 0
+
+    async def fetchval(self, query, *args):
+        self.validator_queries.append((query, args))
+        return self.digest
+
+    async def fetch(self, query, *args):
+        self.fetches += 1
+        return self.rows
+
+    async def fetchrow(self, query, *args):
+        return self.row
+
+
+class ConnPool:
+    """Hands out one fake connection to routes that check out their own"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.acquired = 0
+
+    def acquire(self):
+        pool = self
+
+        class _Acquire:
+            async def __aenter__(self):
+                pool.acquired += 1
+                return pool.conn
+
+            async def __aexit__(self, *exc):
+                pass
+
+        return _Acquire()
+
+
+@pytest.fixture
+def cache_app():
+    holder = {}
+
+    async def override_get_db():
+        yield holder["db"]
+
+    class R2:
+        def get_signed_url(self, file_key, expiration=3600):
+            return f"https://cdn.test/{file_key}"
+
+    fastapi_app.dependency_overrides[get_db] = override_get_db
+    fastapi_app.dependency_overrides[get_read_db] = override_get_db
+    fastapi_app.dependency_overrides[get_r2_service] = lambda: R2()
+    try:
+        yield fastapi_app, holder
+    finally:
+        fastapi_app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_list_validator_is_an_aggregate_over_the_page(cache_app):
+    app, holder = cache_app
+    cart = {"cart_id": "c1", "request_id": "r1", "shopify_user_id": "u1", "created_at": NOW, "updated_at": NOW}
+    holder["db"] = db = CacheDB(rows=[cart])
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.get("/carts/", params={"limit": 10})
+
+    assert resp.status_code == 200
+    assert resp.headers["etag"] == '"abc123"'
+    assert resp.headers["cache-control"] == "private, no-cache"
+    query, args = db.validator_queries[0]
+    assert query.startswith("SELECT md5(string_agg(ROW(created_at, cart_id, updated_at)::text, ';'")
+    assert "FROM (SELECT created_at, cart_id, updated_at FROM carts ORDER BY" in query
+    assert args == (11,)
+
+
+@pytest.mark.asyncio
+async def test_list_answers_304_without_fetching_rows(cache_app):
+    app, holder = cache_app
+    holder["db"] = db = CacheDB()
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.get("/request-tags/", headers={"If-None-Match": 'W/"other", "abc123"'})
+
+    assert resp.status_code == 304
+    assert resp.content == b""
+    assert resp.headers["etag"] == '"abc123"'
+    assert db.fetches == 0
+
+
+@pytest.mark.asyncio
+async def test_item_304_and_per_route_cache_control(cache_app, monkeypatch):
+    app, holder = cache_app
+    holder["db"] = CacheDB(row={"request_id": "r1", "shopify_user_id": "u1", "query": "lamp",
+                                "created_at": NOW, "updated_at": NOW})
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        first = await client.get("/requests/r1")
+        again = await client.get("/requests/r1", headers={"If-None-Match": first.headers["etag"]})
+
+    assert first.status_code == 200
+    assert first.headers["etag"] == row_etag(NOW)
+    assert again.status_code == 304
+
+    monkeypatch.setattr(database, "_pool", ConnPool(
+        CacheDB(row={"product_id": "p1", "shopify_product_id": "sp1", "shopify_variant_id": "sv1"})
+    ))
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        product = await client.get("/products/p1")
+
+    assert product.headers["cache-control"] == "public, max-age=60"
+    assert product.headers["etag"].startswith('"')
+
+
+@pytest.mark.asyncio
+async def test_asset_etag_rolls_over_before_signed_urls_expire(cache_app, monkeypatch):
+    app, holder = cache_app
+    holder["db"] = CacheDB(row={"request_asset_id": "a1", "request_id": "r1", "file_key": "k.png",
+                                "created_at": NOW, "updated_at": NOW})
+
+    monkeypatch.setattr(signed_url_cache_module.time, "time", lambda: 1_000_000.0)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        first = await client.get("/request-assets/a1")
+        same_window = await client.get("/request-assets/a1", headers={"If-None-Match": first.headers["etag"]})
+        monkeypatch.setattr(signed_url_cache_module.time, "time", lambda: 1_000_000.0 + 3600)
+        later = await client.get("/request-assets/a1", headers={"If-None-Match": first.headers["etag"]})
+
+    assert same_window.status_code == 304
+    assert later.status_code == 200
+    assert later.headers["etag"] != first.headers["etag"]
+
+
+@pytest.mark.asyncio
+async def test_product_cache_hit_checks_out_no_connection(cache_app, monkeypatch):
+    app, _ = cache_app
+    pool = ConnPool(CacheDB(row={"product_id": "p9", "shopify_product_id": "sp9", "shopify_variant_id": "sv9"}))
+    monkeypatch.setattr(database, "_pool", pool)
+    product_cache.set_enabled(True)
+
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            miss = await client.get("/products/p9")
+            hit = await client.get("/products/p9")
+    finally:
+        product_cache.set_enabled(False)
+
+    assert miss.status_code == hit.status_code == 200
+    assert hit.json()["shopify_variant_id"] == "sv9"
+    assert pool.acquired == 1
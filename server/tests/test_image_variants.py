@@ -0,0 +1,234 @@
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+import app.database as database
+import app.image_variants as image_variants
+from main import app as fastapi_app
+from app.database import get_db, get_read_db
+from app.image_variants import generate_asset_variants, render_variants, variant_file_key
+from app.r2_service import get_r2_service
+
+PIL = pytest.importorskip("PIL.Image")
+
+
+ASSET = {
+    "request_asset_id": "a1", "request_id": "r1", "file_key": "request-assets/r1/photo.jpg",
+    "created_at": datetime(2024, 5, 1), "updated_at": datetime(2024, 5, 1),
+}
+
+
+def jpeg_bytes(width, height) -> bytes:
+    out = io.BytesIO()
+    PIL.new("RGB", (width, height), (200, 40, 40)).save(out, "JPEG")
+    return out.getvalue()
+
+
+def test_render_variants_downscales_to_each_smaller_width():
+    variants = render_variants(jpeg_bytes(1000, 500), (320, 640, 1280), 80, 10_000_000)
+
+    assert [(size, width, height) for size, width, height, _ in variants] == [(320, 320, 160), (640, 640, 320)]
+    for _, width, height, body in variants:
+        with PIL.open(io.BytesIO(body)) as image:
+            assert image.format == "WEBP" and image.size == (width, height)
+
+
+def test_variant_file_key_is_a_webp_sibling():
+    assert variant_file_key("request-assets/r1/abc.jpg", 640) == "request-assets/r1/abc_w640.webp"
+
+
+class FakeR2:
+    def __init__(self, objects):
+        self.objects = dict(objects)
+        self.deleted = []
+
+    async def download_file(self, file_key, max_bytes):
+        return self.objects.get(file_key)
+
+    async def put_file(self, file_key, content, content_type):
+        self.objects[file_key] = content
+        return file_key
+
+    async def delete_files(self, file_keys):
+        self.deleted.extend(file_keys)
+        return {"deleted": list(file_keys), "errors": []}
+
+    def get_signed_url(self, file_key, expiration=3600):
+        return f"https://cdn.test/{file_key}?expires={expiration}"
+
+
+class FakeConn:
+    def __init__(self, asset_exists=True):
+        self.asset_exists = asset_exists
+        self.variants = []
+        self.queries = []
+
+    async def execute(self, query, *args):
+        self.queries.append(query)
+        return "INSERT 0 0"
+
+    async def fetchval(self, query, *args):
+        self.queries.append(query)
+        if "FOR SHARE" in query:
+            return 1 if self.asset_exists else None
+        return False
+
+    async def executemany(self, query, args_list):
+        self.variants.extend(args_list)
+
+    def transaction(self):
+        class _Transaction:
+            async def __aenter__(self):
+                pass
+
+            async def __aexit__(self, *exc):
+                pass
+
+        return _Transaction()
+
+    def acquire(self):
+        conn = self
+
+        class _Acquire:
+            async def __aenter__(self):
+                return conn
+
+            async def __aexit__(self, *exc):
+                pass
+
+        return _Acquire()
+
+
+@pytest.fixture
+def inline_resizing(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(image_variants, "get_variant_executor", lambda: executor)
+    monkeypatch.setattr(image_variants, "IMAGE_VARIANTS_ENABLED", True)
+    yield
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_generate_asset_variants_stores_and_records_variants(inline_resizing, monkeypatch):
+    conn = FakeConn()
+    monkeypatch.setattr(database, "_pool", conn)
+    r2 = FakeR2({ASSET["file_key"]: jpeg_bytes(800, 600)})
+
+    await generate_asset_variants("a1", ASSET["file_key"], r2)
+
+    assert [(row[1], row[3], row[4]) for row in conn.variants] == [
+        (320, 240, "request-assets/r1/photo_w320.webp"),
+        (640, 480, "request-assets/r1/photo_w640.webp"),
+    ]
+    assert "request-assets/r1/photo_w640.webp" in r2.objects
+    # If-Match ETags stay valid: recording variants never touches the asset's updated_at
+    assert not any("updated_at" in query for query in conn.queries)
+
+
+@pytest.mark.asyncio
+async def test_generate_asset_variants_cleans_up_when_asset_changed(inline_resizing, monkeypatch):
+    conn = FakeConn(asset_exists=False)
+    monkeypatch.setattr(database, "_pool", conn)
+    r2 = FakeR2({ASSET["file_key"]: jpeg_bytes(800, 600)})
+
+    await generate_asset_variants("a1", ASSET["file_key"], r2)
+
+    assert conn.variants == []
+    assert sorted(r2.deleted) == ["request-assets/r1/photo_w320.webp", "request-assets/r1/photo_w640.webp"]
+
+
+class FakeReadConn:
+    def __init__(self):
+        self.queries = []
+
+    async def fetchrow(self, query, *args):
+        self.queries.append((query, args))
+        row = dict(ASSET)
+        if "request_asset_variants" in query:
+            row["variant_file_key"] = "request-assets/r1/photo_w640.webp"
+        return row
+
+
+@pytest.mark.asyncio
+async def test_get_request_asset_with_size_serves_variant():
+    conn = FakeReadConn()
+
+    async def override_get_db():
+        yield conn
+
+    fastapi_app.dependency_overrides[get_db] = override_get_db
+    fastapi_app.dependency_overrides[get_read_db] = override_get_db
+    fastapi_app.dependency_overrides[get_r2_service] = lambda: FakeR2({})
+    try:
+        async with AsyncClient(transport=ASGITransport(app=fastapi_app), base_url="http://test") as client:
+            sized = await client.get("/request-assets/a1", params={"size": 500})
+            original = await client.get("/request-assets/a1")
+    finally:
+        fastapi_app.dependency_overrides.clear()
+
+    assert sized.json()["url"].startswith("https://cdn.test/request-assets/r1/photo_w640.webp")
+    assert conn.queries[0][1] == ("a1", 500)
+    assert original.json()["url"].startswith("https://cdn.test/request-assets/r1/photo.jpg")
+    # Same row version for If-Match, but a sized read's ETag changes once a variant exists
+    assert sized.headers["etag"] != original.headers["etag"]
+    assert sized.headers["etag"].split("-")[0] == original.headers["etag"].split("-")[0]
+
+
+class UploadDB:
+    def __init__(self):
+        self.committed = False
+
+    async def fetchrow(self, query, *args):
+        return {"request_id": args[0]}
+
+    async def execute(self, query, *args):
+        return "INSERT 0 1"
+
+    def transaction(self):
+        db = self
+
+        class _Transaction:
+            async def __aenter__(self):
+                pass
+
+            async def __aexit__(self, exc_type, *exc):
+                db.committed = exc_type is None
+
+        return _Transaction()
+
+
+class UploadR2(FakeR2):
+    async def upload_stream(self, request_id, file, filename, reserve=None):
+        await reserve("request-assets/blobs/abc.jpg")
+        return "request-assets/blobs/abc.jpg", 3
+
+
+@pytest.mark.asyncio
+async def test_upload_starts_variants_once_the_asset_is_committed(monkeypatch):
+    conn = UploadDB()
+    started = []
+
+    async def fake_generate(request_asset_id, file_key, r2_service):
+        started.append((file_key, conn.committed))
+
+    async def override_get_db():
+        yield conn
+
+    monkeypatch.setattr(image_variants, "generate_asset_variants", fake_generate)
+    fastapi_app.dependency_overrides[get_db] = override_get_db
+    fastapi_app.dependency_overrides[get_r2_service] = lambda: UploadR2({})
+    try:
+        async with AsyncClient(transport=ASGITransport(app=fastapi_app), base_url="http://test") as client:
+            resp = await client.post(
+                "/request-assets/upload", data={"request_id": "r1"}, files={"file": ("a.jpg", b"abc", "image/jpeg")}
+            )
+        await image_variants.wait_for_variant_tasks()
+    finally:
+        fastapi_app.dependency_overrides.clear()
+
+    assert resp.status_code == 200
+    assert started == [("request-assets/blobs/abc.jpg", True)]
@@ -0,0 +1,142 @@
+import pytest
+from botocore.awsrequest import AWSResponse
+from httpx import AsyncClient, ASGITransport
+from prometheus_client import REGISTRY
+
+from main import app as fastapi_app
+from app.database import get_db, get_read_db
+from app.metrics import InstrumentedConnection, instrument_r2_service, statement_name
+from app.r2_service import R2Service
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("SELECT * FROM requests WHERE request_id = $1", "select_requests"),
+    ("SELECT md5(string_agg(x, ';')) FROM (SELECT * FROM carts LIMIT $1) AS page", "select_carts"),
+    ("\n  INSERT INTO carts_products (cart_id, product_id) VALUES ($1, $2)", "insert_carts_products"),
+    ("UPDATE products SET shopify_product_id = $1 WHERE product_id = $2", "update_products"),
+    ("DELETE FROM request_tags WHERE tag_value = $1", "delete_request_tags"),
+    ("WITH updated AS (UPDATE requests SET query = $1 RETURNING *) SELECT * FROM updated", "update_requests"),
+    ("SELECT to_regclass('schema_migrations')", "select"),
+    ("BEGIN", "begin"),
+])
+def test_statement_name(query, expected):
+    assert statement_name(query) == expected
+
+
+class FakeConn:
+    async def fetchrow(self, query, *args):
+        if "missing" in args:
+            raise RuntimeError("boom")
+        return {"request_id": args[0]}
+
+    def transaction(self):
+        return "transaction"
+
+    async def cursor(self, query, *args, prefetch=None):
+        for i in range(prefetch):
+            yield {"request_id": f"r{i}"}
+
+
+@pytest.mark.asyncio
+async def test_instrumented_connection_times_queries_and_passes_through():
+    conn = InstrumentedConnection(FakeConn())
+    before = sample("db_query_duration_seconds_count", statement="select_requests")
+    errors = sample("db_query_errors_total", statement="select_requests")
+
+    assert await conn.fetchrow("SELECT * FROM requests WHERE request_id = $1", "r1") == {"request_id": "r1"}
+    with pytest.raises(RuntimeError):
+        await conn.fetchrow("SELECT * FROM requests WHERE request_id = $1", "missing")
+
+    assert sample("db_query_duration_seconds_count", statement="select_requests") == before + 2
+    assert sample("db_query_errors_total", statement="select_requests") == errors + 1
+    assert conn.transaction() == "transaction"
+
+
+@pytest.mark.asyncio
+async def test_instrumented_cursor_is_timed_over_the_whole_export():
+    conn = InstrumentedConnection(FakeConn())
+    before = sample("db_query_duration_seconds_count", statement="cursor_select_requests")
+
+    rows = [row async for row in conn.cursor("SELECT * FROM requests ORDER BY created_at", prefetch=3)]
+
+    assert [row["request_id"] for row in rows] == ["r0", "r1", "r2"]
+    assert sample("db_query_duration_seconds_count", statement="cursor_select_requests") == before + 1
+
+
+class RequestDB:
+    async def fetchrow(self, query, *args):
+        return None
+
+
+@pytest.mark.asyncio
+async def test_requests_are_labeled_by_route_template_and_status():
+    async def override_get_db():
+        yield RequestDB()
+
+    fastapi_app.dependency_overrides[get_db] = override_get_db
+    fastapi_app.dependency_overrides[get_read_db] = override_get_db
+    labels = {"method": "GET", "route": "/requests/{request_id}", "status": "404"}
+    before = sample("http_request_duration_seconds_count", **labels)
+    try:
+        async with AsyncClient(transport=ASGITransport(app=fastapi_app), base_url="http://test") as client:
+            assert (await client.get("/requests/nope")).status_code == 404
+            assert (await client.get("/no/such/route")).status_code == 404
+            resp = await client.get("/metrics")
+    finally:
+        fastapi_app.dependency_overrides.clear()
+
+    assert sample("http_request_duration_seconds_count", **labels) == before + 1
+    assert sample("http_requests_in_progress", method="GET") == 0
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert 'route="unmatched"' in resp.text
+    assert "/no/such/route" not in resp.text
+
+
+@pytest.fixture
+def r2_env(monkeypatch):
+    monkeypatch.setenv("R2_ENDPOINT_URL", "https://r2.example.com")
+    monkeypatch.setenv("R2_ACCESS_KEY_ID", "key")
+    monkeypatch.setenv("R2_SECRET_ACCESS_KEY", "secret")
+    monkeypatch.setenv("R2_BUCKET_NAME", "bucket")
+
+
+class RawBody:
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+def fake_r2_endpoint(request, **kwargs):
+    """before-send handler answering in place of R2: puts succeed, deletes are denied"""
+    if request.method == "DELETE":
+        body = b"<Error><Code>AccessDenied</Code><Message>denied</Message></Error>"
+        return AWSResponse(request.url, 403, {}, RawBody(body))
+    return AWSResponse(request.url, 200, {}, RawBody(b""))
+
+
+@pytest.mark.asyncio
+async def test_r2_calls_record_latency_and_errors(r2_env):
+    svc = instrument_r2_service(R2Service())
+    svc.s3_client.meta.events.register("before-send.s3", fake_r2_endpoint)
+    puts = sample("r2_operation_duration_seconds_count", operation="put_object")
+    deletes = sample("r2_operation_duration_seconds_count", operation="delete_object")
+    delete_errors = sample("r2_operation_errors_total", operation="delete_object", code="AccessDenied")
+    presigns = sample("r2_operation_duration_seconds_count", operation="presign_get_object")
+
+    await svc.upload_file("req-1", b"data", "photo.png")
+    with pytest.raises(Exception):
+        await svc.delete_file("request-assets/req-1/photo.png")
+    svc.get_signed_url("request-assets/req-1/photo.png")
+    svc.close()
+
+    assert sample("r2_operation_duration_seconds_count", operation="put_object") == puts + 1
+    assert sample("r2_operation_duration_seconds_count", operation="delete_object") == deletes + 1
+    assert sample("r2_operation_errors_total", operation="delete_object", code="AccessDenied") == delete_errors + 1
+    assert sample("r2_operation_duration_seconds_count", operation="presign_get_object") == presigns + 1
@@ -0,0 +1,197 @@
+from contextlib import asynccontextmanager
+
+import pytest
+
+import app.database as database
+from app.migrations import MIGRATION_LOCK_ID, Migration, latest_version, load_migrations, migrate
+
+
+class FakeConn:
+    """Records statements and tracks schema_migrations rows in memory"""
+
+    def __init__(self, applied=(), invalid_indexes=(), lock_busy=0):
+        self.applied = list(applied)
+        # pg_try_advisory_lock attempts that find another process migrating
+        self.lock_busy = lock_busy
+        self.invalid_indexes = list(invalid_indexes)
+        self.executed = []
+        self.in_transaction = False
+        self.closed = False
+
+    async def execute(self, query, *args):
+        self.executed.append((query, args, self.in_transaction))
+        if query.startswith("INSERT INTO schema_migrations"):
+            self.applied.append(args[0])
+
+    async def fetchval(self, query, *args):
+        if "pg_try_advisory_lock" in query:
+            self.executed.append((query, args, self.in_transaction))
+            self.lock_busy -= 1
+            return self.lock_busy < 0
+        if "to_regclass('schema_migrations')" in query:
+            return "schema_migrations" if self.applied else None
+        if "FROM schema_migrations" in query:
+            return max(self.applied, default=0)
+        return None
+
+    async def fetch(self, query, *args):
+        return [{"relname": name} for name in self.invalid_indexes if name in args[0]]
+
+    @asynccontextmanager
+    async def transaction(self):
+        self.in_transaction = True
+        try:
+            yield
+        finally:
+            self.in_transaction = False
+
+    async def close(self):
+        self.closed = True
+
+    def statements(self):
+        return [query for query, _, _ in self.executed]
+
+
+MIGRATIONS = [
+    Migration(1, "initial", "CREATE TABLE a (id int);\nCREATE TABLE b (id int);"),
+    Migration(2, "indexes", "-- no-transaction\n-- why\nCREATE INDEX CONCURRENTLY IF NOT EXISTS idx_a ON a (id);\n"
+                            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_b ON b (id);\n"),
+]
+
+
+def test_bundled_migrations_are_ordered_and_parse():
+    migrations = load_migrations()
+    assert [m.version for m in migrations] == list(range(1, len(migrations) + 1))
+    assert latest_version(migrations) == migrations[-1].version
+    for migration in migrations:
+        if not migration.transactional:
+            assert all("CONCURRENTLY" in statement for statement in migration.statements())
+
+
+@pytest.mark.asyncio
+async def test_migrate_applies_pending_versions_under_advisory_lock():
+    conn = FakeConn()
+
+    assert await migrate(conn, MIGRATIONS) == [1, 2]
+
+    statements = conn.statements()
+    assert statements[0] == "SELECT pg_try_advisory_lock($1)"
+    assert statements[-1] == "SELECT pg_advisory_unlock($1)"
+    assert conn.executed[0][1] == (MIGRATION_LOCK_ID,)
+
+    # The transactional file runs whole inside a transaction with its version row
+    initial = [e for e in conn.executed if e[0] == MIGRATIONS[0].sql]
+    assert initial and initial[0][2] is True
+
+    # Concurrent index builds run one statement at a time, outside any transaction
+    concurrent = [e for e in conn.executed if "CONCURRENTLY" in e[0]]
+    assert [q.split()[6] for q, _, _ in concurrent] == ["idx_a", "idx_b"]
+    assert not any(in_tx for _, _, in_tx in concurrent)
+    assert conn.applied == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_migrate_polls_for_the_lock_outside_a_transaction(monkeypatch):
+    import app.migrations as migrations
+
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(migrations.asyncio, "sleep", fake_sleep)
+    conn = FakeConn(applied=[1, 2], lock_busy=2)
+
+    assert await migrate(conn, MIGRATIONS) == []
+
+    statements = conn.statements()
+    assert statements[:3] == ["SELECT pg_try_advisory_lock($1)"] * 3
+    assert "SELECT pg_advisory_lock($1)" not in statements
+    assert not any(in_tx for query, _, in_tx in conn.executed if "advisory" in query)
+    assert sleeps == [migrations.MIGRATION_LOCK_POLL_INTERVAL] * 2
+
+
+@pytest.mark.asyncio
+async def test_migrate_skips_applied_versions_and_drops_invalid_indexes():
+    conn = FakeConn(applied=[1], invalid_indexes=["idx_b"])
+
+    assert await migrate(conn, MIGRATIONS) == [2]
+
+    statements = conn.statements()
+    assert MIGRATIONS[0].sql not in statements
+    drop = statements.index('DROP INDEX CONCURRENTLY IF EXISTS "idx_b"')
+    assert statements[drop + 1].startswith("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_b")
+
+
+@pytest.mark.asyncio
+async def test_migrate_releases_lock_on_failure():
+    class FailingConn(FakeConn):
+        async def execute(self, query, *args):
+            await super().execute(query, *args)
+            if query == MIGRATIONS[0].sql:
+                raise RuntimeError("boom")
+
+    conn = FailingConn()
+    with pytest.raises(RuntimeError):
+        await migrate(conn, MIGRATIONS)
+    assert conn.statements()[-1] == "SELECT pg_advisory_unlock($1)"
+    assert conn.applied == []
+
+
+class SchemaPool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        pool = self
+
+        class _Acquire:
+            async def __aenter__(self):
+                return pool.conn
+
+            async def __aexit__(self, *exc):
+                pass
+
+        return _Acquire()
+
+
+@pytest.mark.asyncio
+async def test_ensure_schema_only_checks_version_when_current(monkeypatch):
+    conn = FakeConn(applied=list(range(1, latest_version() + 1)))
+    monkeypatch.setattr(database, "_pool", SchemaPool(conn))
+
+    async def fail_connect(*args, **kwargs):
+        raise AssertionError("must not open a migration connection")
+
+    monkeypatch.setattr(database.asyncpg, "connect", fail_connect)
+
+    assert await database.ensure_schema() == latest_version()
+    assert conn.executed == []
+
+
+@pytest.mark.asyncio
+async def test_ensure_schema_without_auto_migrate_leaves_schema_alone(monkeypatch):
+    conn = FakeConn()
+    monkeypatch.setattr(database, "_pool", SchemaPool(conn))
+    monkeypatch.setattr(database, "DB_AUTO_MIGRATE", False)
+
+    assert await database.ensure_schema() == 0
+    assert conn.executed == []
+
+
+@pytest.mark.asyncio
+async def test_ensure_schema_migrates_on_dedicated_connection(monkeypatch):
+    pooled = FakeConn()
+    dedicated = FakeConn()
+    monkeypatch.setattr(database, "_pool", SchemaPool(pooled))
+    monkeypatch.setattr(database, "DB_AUTO_MIGRATE", True)
+
+    async def connect(url):
+        return dedicated
+
+    monkeypatch.setattr(database.asyncpg, "connect", connect)
+
+    assert await database.ensure_schema() == latest_version()
+    assert pooled.executed == []
+    assert dedicated.closed
+    assert dedicated.applied == list(range(1, latest_version() + 1))
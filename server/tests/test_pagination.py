@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.pagination import decode_cursor, encode_cursor, keyset_query, split_page
+
+
+KEYSET = ("created_at", "request_id")
+
+
+def test_cursor_round_trip_restores_datetimes():
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    cursor = encode_cursor([created_at, "req-1"])
+    assert decode_cursor(cursor, KEYSET) == [created_at, "req-1"]
+
+
+def test_decode_cursor_rejects_garbage():
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("not-a-cursor", KEYSET)
+    assert exc.value.status_code == 400
+
+
+def test_keyset_query_first_page():
+    query, args = keyset_query("requests", KEYSET, 20)
+    assert query == "SELECT * FROM requests ORDER BY created_at DESC, request_id DESC LIMIT $1"
+    assert args == [21]
+
+
+def test_keyset_query_with_filter_and_cursor():
+    created_at = datetime(2024, 5, 1, 12, 0, 0)
+    cursor = encode_cursor([created_at, "asset-9"])
+    query, args = keyset_query(
+        "request_assets", ("created_at", "request_asset_id"), 10, cursor,
+        where=["request_id = $1"], args=["req-1"]
+    )
+    assert query == (
+        "SELECT * FROM request_assets WHERE request_id = $1 "
+        "AND (created_at, request_asset_id) < ($2, $3) "
+        "ORDER BY created_at DESC, request_asset_id DESC LIMIT $4"
+    )
+    assert args == ["req-1", created_at, "asset-9", 11]
+
+
+def test_split_page_emits_cursor_only_when_more_rows_exist():
+    rows = [
+        {"created_at": datetime(2024, 5, 1, 12, 0, i), "request_id": f"req-{i}"}
+        for i in range(3, 0, -1)
+    ]
+
+    page, cursor = split_page(rows, KEYSET, 2)
+    assert [r["request_id"] for r in page] == ["req-3", "req-2"]
+    assert decode_cursor(cursor, KEYSET) == [rows[1]["created_at"], "req-2"]
+
+    page, cursor = split_page(rows, KEYSET, 3)
+    assert len(page) == 3 and cursor is None
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+
+import app.routers.requests as requests_router
+from app.migrations import latest_version, migrate, schema_version
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = [
+    pytest.mark.integration,
+    pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set; requires a scratch PostgreSQL database"),
+]
+
+
+async def _connect(schema: str):
+    import asyncpg
+
+    return await asyncpg.connect(TEST_DATABASE_URL, server_settings={"search_path": f"{schema},public"})
+
+
+@pytest_asyncio.fixture
+async def schema():
+    """A scratch schema, dropped afterwards; the application tables live in it"""
+    import asyncpg
+
+    name = f"test_{uuid.uuid4().hex[:12]}"
+    admin = await asyncpg.connect(TEST_DATABASE_URL)
+    await admin.execute(f'CREATE SCHEMA "{name}"')
+    try:
+        yield name
+    finally:
+        await admin.execute(f'DROP SCHEMA "{name}" CASCADE')
+        await admin.close()
+
+
+@pytest_asyncio.fixture
+async def conn(schema):
+    conn = await _connect(schema)
+    await migrate(conn)
+    try:
+        yield conn
+    finally:
+        await conn.close()
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_the_newest_matches(conn, monkeypatch):
+    monkeypatch.setattr(requests_router, "SEARCH_CANDIDATE_LIMIT", 5)
+    now = datetime(2024, 5, 1, 12, 0, 0)
+    # Older rows rank higher and come first in the heap; only the newest five may be ranked
+    rows = [
+        (f"old-{i}", "u", "red red red shoes", now - timedelta(days=1, minutes=i)) for i in range(20)
+    ] + [
+        (f"new-{i}", "u", "red lamp with a long description", now - timedelta(minutes=i)) for i in range(5)
+    ]
+    await conn.executemany(
+        "INSERT INTO requests (request_id, shopify_user_id, query, created_at, updated_at) VALUES ($1, $2, $3, $4, $4)",
+        rows
+    )
+
+    query, args = requests_router.build_search_query("red", 10)
+    hits = await conn.fetch(query, *args)
+
+    assert [hit["request_id"] for hit in hits] == [f"new-{i}" for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_migrate_calls_build_valid_indexes(schema):
+    # Every worker runs migrate() at startup; waiting ones must not deadlock the CONCURRENTLY builds
+    conns = [await _connect(schema) for _ in range(4)]
+    try:
+        results = await asyncio.gather(*(migrate(conn) for conn in conns))
+        invalid = await conns[0].fetchval(
+            "SELECT count(*) FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE NOT i.indisvalid AND c.relnamespace = $1::regnamespace",
+            schema
+        )
+        version = await schema_version(conns[0])
+    finally:
+        await asyncio.gather(*(conn.close() for conn in conns))
+
+    assert sorted(len(applied) for applied in results) == [0, 0, 0, latest_version()]
+    assert version == latest_version()
+    assert invalid == 0
+
+
+class RecordingR2:
+    def __init__(self):
+        self.deleted = []
+
+    async def delete_files(self, file_keys):
+        self.deleted.extend(file_keys)
+        return {"deleted": list(file_keys), "errors": []}
+
+
+@pytest.mark.asyncio
+async def test_delete_request_frees_blobs_no_other_asset_uses(conn):
+    now = datetime(2024, 5, 1, 12, 0, 0)
+    await conn.executemany(
+        "INSERT INTO requests (request_id, shopify_user_id, query, created_at, updated_at) VALUES ($1, 'u', 'q', $2, $2)",
+        [("r1", now), ("r2", now)]
+    )
+    await conn.executemany(
+        "INSERT INTO request_assets (request_asset_id, request_id, file_key, created_at, updated_at) "
+        "VALUES ($1, $2, $3, $4, $4)",
+        [("a1", "r1", "blobs/only.jpg", now), ("a2", "r1", "blobs/shared.jpg", now), ("a3", "r2", "blobs/shared.jpg", now)]
+    )
+    await conn.execute(
+        "INSERT INTO request_asset_variants (request_asset_id, size, width, height, file_key, content_type, size_bytes, created_at) "
+        "VALUES ('a1', 320, 320, 240, 'blobs/only_w320.webp', 'image/webp', 10, $1)",
+        now
+    )
+    r2 = RecordingR2()
+
+    await requests_router.delete_request("r1", conn=conn, r2_service=r2)
+
+    assert sorted(r2.deleted) == ["blobs/only.jpg", "blobs/only_w320.webp"]
+    blobs = await conn.fetch("SELECT file_key, ref_count FROM blobs ORDER BY file_key")
+    assert [(row["file_key"], row["ref_count"]) for row in blobs] == [("blobs/shared.jpg", 1)]
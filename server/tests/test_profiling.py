@@ -0,0 +1,121 @@
+import logging
+from datetime import datetime
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+import app.database as database
+import app.profiling as profiling
+from main import app as fastapi_app
+from app.database import get_db, get_read_db
+from app.metrics import InstrumentedConnection
+from app.profiling import normalize_sql
+
+
+NOW_ROW = {"request_id": "req-1", "shopify_user_id": "u1", "query": "desk lamp",
+           "created_at": datetime(2024, 5, 1, 12), "updated_at": datetime(2024, 5, 1, 12)}
+
+
+def test_normalize_sql_collapses_whitespace_and_literals():
+    query = """
+        SELECT * FROM requests
+        WHERE query = 'it''s' AND created_at > $1 AND score > 0.5
+        LIMIT 51
+    """
+    assert normalize_sql(query) == (
+        "SELECT * FROM requests WHERE query = ? AND created_at > $1 AND score > ? LIMIT ?"
+    )
+
+
+class FakeConn:
+    def __init__(self):
+        self.explained = []
+        self.rolled_back = False
+
+    async def fetchrow(self, query, *args):
+        return NOW_ROW
+
+    async def fetch(self, query, *args):
+        self.explained.append((query, args))
+        return [("Index Scan using requests_pkey on requests",), ("Execution Time: 0.1 ms",)]
+
+    def transaction(self):
+        conn = self
+
+        class _Transaction:
+            async def start(self):
+                pass
+
+            async def rollback(self):
+                conn.rolled_back = True
+
+        return _Transaction()
+
+
+@pytest.fixture
+def profiled_app():
+    conn = FakeConn()
+
+    async def override_get_db():
+        yield InstrumentedConnection(conn)
+
+    fastapi_app.dependency_overrides[get_db] = override_get_db
+    fastapi_app.dependency_overrides[get_read_db] = override_get_db
+    yield conn
+    fastapi_app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_server_timing_header_summarizes_request_queries(profiled_app):
+    async with AsyncClient(transport=ASGITransport(app=fastapi_app), base_url="http://test") as client:
+        resp = await client.get("/requests/req-1")
+
+    assert resp.status_code == 200
+    timing = resp.headers["server-timing"]
+    assert timing.startswith("db;dur=") and timing.endswith('desc="1 queries"')
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_are_logged_normalized(profiled_app, monkeypatch, caplog):
+    monkeypatch.setattr(profiling, "DB_SLOW_QUERY_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="app.profiling"):
+        async with AsyncClient(transport=ASGITransport(app=fastapi_app), base_url="http://test") as client:
+            await client.get("/requests/req-1")
+
+    slow = [r.getMessage() for r in caplog.records if r.getMessage().startswith("Slow query")]
+    assert len(slow) == 1
+    assert "1 params" in slow[0] and "\n" not in slow[0]
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        conn = self.conn
+
+        class _Acquire:
+            async def __aenter__(self):
+                return conn
+
+            async def __aexit__(self, *exc):
+                pass
+
+        return _Acquire()
+
+
+@pytest.mark.asyncio
+async def test_explain_requires_env_flag_and_rolls_back(profiled_app, monkeypatch, caplog):
+    monkeypatch.setattr(database, "_pool", FakePool(profiled_app))
+    async with AsyncClient(transport=ASGITransport(app=fastapi_app), base_url="http://test") as client:
+        await client.get("/requests/req-1", params={"explain": "1"})
+        assert profiled_app.explained == []
+
+        monkeypatch.setattr(profiling, "DB_EXPLAIN_ENABLED", True)
+        with caplog.at_level(logging.INFO, logger="app.profiling"):
+            await client.get("/requests/req-1", params={"explain": "1"})
+
+    query, args = profiled_app.explained[0]
+    assert query.startswith("EXPLAIN (ANALYZE, BUFFERS) ") and args == ("req-1",)
+    assert profiled_app.rolled_back
+    assert any("Index Scan using requests_pkey" in r.getMessage() for r in caplog.records)
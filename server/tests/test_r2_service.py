@@ -1,3 +1,5 @@
+import asyncio
+import hashlib
 import os
 import pytest
 
@@ -61,3 +63,278 @@ def test_upload_and_delete_and_signed_url(monkeypatch):
     assert ok is True
     assert len(dummy.delete_calls) == 1
 
+
+
+def test_get_r2_service_reuses_one_client_until_closed(monkeypatch):
+    import app.r2_service as r2_mod
+
+    created = []
+
+    def fake_client(*args, **kwargs):
+        created.append(kwargs["config"])
+        return DummyS3Client()
+
+    monkeypatch.setattr(r2_mod.boto3, "client", fake_client)
+    monkeypatch.setattr(r2_mod, "_r2_service", None)
+
+    first = r2_mod.get_r2_service()
+    assert r2_mod.get_r2_service() is first
+    assert len(created) == 1
+    assert created[0].max_pool_connections == r2_mod.R2_MAX_POOL_CONNECTIONS
+    assert created[0].tcp_keepalive == r2_mod.R2_TCP_KEEPALIVE
+
+    r2_mod.close_r2_service()
+    assert r2_mod.get_r2_service() is not first
+    assert len(created) == 2
+    r2_mod.close_r2_service()
+
+
+@pytest.fixture
+def moto_server(monkeypatch):
+    import socket
+    from moto.server import ThreadedMotoServer
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    endpoint = f"http://127.0.0.1:{port}"
+    monkeypatch.setenv("R2_ENDPOINT_URL", endpoint)
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+
+    # Moto backends are process-global; start every test from an empty store
+    import urllib.request
+    urllib.request.urlopen(urllib.request.Request(f"{endpoint}/moto-api/reset", method="POST"))
+
+    import boto3
+    boto3.client(
+        "s3", endpoint_url=endpoint, region_name="us-east-1",
+        aws_access_key_id="key", aws_secret_access_key="secret",
+    ).create_bucket(Bucket="bucket")
+    try:
+        yield endpoint
+    finally:
+        server.stop()
+
+
+class UploadOnlyDB:
+    async def fetchrow(self, query, *args):
+        if "FROM requests WHERE request_id = $1" in query:
+            return {"request_id": args[0]}
+        return None
+
+    async def execute(self, query, *args):
+        return "INSERT 0 1"
+
+    def transaction(self):
+        class _Transaction:
+            async def __aenter__(self):
+                pass
+
+            async def __aexit__(self, *exc):
+                pass
+
+        return _Transaction()
+
+
+@pytest.mark.asyncio
+async def test_slow_r2_upload_does_not_block_other_endpoints(moto_server):
+    import io
+    import time
+    from httpx import AsyncClient, ASGITransport
+
+    from main import app
+    from app.database import get_db, get_read_db
+    from app.r2_service import get_r2_service
+
+    svc = R2Service()
+    real_put = svc.s3_client.put_object
+
+    def slow_put(**kwargs):
+        # Simulate a slow R2 round trip on the worker thread
+        time.sleep(0.5)
+        return real_put(**kwargs)
+
+    svc.s3_client.put_object = slow_put
+
+    async def override_get_db():
+        yield UploadOnlyDB()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_r2_service] = lambda: svc
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            upload = asyncio.create_task(client.post(
+                "/request-assets/upload",
+                files={"file": ("big.bin", io.BytesIO(b"x" * 1024), "application/octet-stream")},
+                data={"request_id": "req-1"},
+            ))
+            await asyncio.sleep(0.1)
+
+            started = time.perf_counter()
+            root = await client.get("/")
+            elapsed = time.perf_counter() - started
+
+            assert root.status_code == 200
+            assert not upload.done()
+            assert elapsed < 0.2
+
+            resp = await upload
+        assert resp.status_code == 200
+    finally:
+        app.dependency_overrides.clear()
+        svc.close()
+
+    objects = svc.s3_client.list_objects_v2(Bucket="bucket")
+    assert objects["KeyCount"] == 1
+
+
+class ChunkedStream:
+    """Async file-like object that hands out at most `step` bytes per read"""
+
+    def __init__(self, data: bytes, step: int = 64 * 1024):
+        self.data = data
+        self.pos = 0
+        self.step = step
+
+    async def read(self, size: int = -1) -> bytes:
+        size = self.step if size < 0 else min(size, self.step)
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += len(chunk)
+        return chunk
+
+
+@pytest.mark.asyncio
+async def test_upload_stream_uses_multipart_for_large_files(moto_server):
+    import app.r2_service as r2_mod
+
+    svc = R2Service()
+    data = os.urandom(r2_mod.R2_MULTIPART_PART_SIZE * 2 + 1024)
+    try:
+        file_key, size = await svc.upload_stream("req1", ChunkedStream(data), "video.mp4")
+        assert size == len(data)
+        obj = svc.s3_client.get_object(Bucket="bucket", Key=file_key)
+        assert obj["Body"].read() == data
+        assert obj["ContentType"] == "video/mp4"
+        assert file_key == f"request-assets/blobs/{hashlib.sha256(data).hexdigest()}.mp4"
+        # Only the content-addressed copy remains; the staging object is removed
+        assert svc.s3_client.list_objects_v2(Bucket="bucket")["KeyCount"] == 1
+    finally:
+        svc.close()
+
+
+@pytest.mark.asyncio
+async def test_upload_stream_small_file_uses_single_put(moto_server):
+    svc = R2Service()
+    try:
+        file_key, size = await svc.upload_stream("req1", ChunkedStream(b"tiny", step=2), "a.txt")
+        assert size == 4
+        obj = svc.s3_client.get_object(Bucket="bucket", Key=file_key)
+        assert obj["Body"].read() == b"tiny"
+    finally:
+        svc.close()
+
+
+@pytest.mark.asyncio
+async def test_upload_stream_skips_storing_duplicate_content(moto_server):
+    import app.r2_service as r2_mod
+
+    svc = R2Service()
+    puts = []
+    real_put, real_copy = svc.s3_client.put_object, svc.s3_client.copy_object
+    svc.s3_client.put_object = lambda **kwargs: puts.append(kwargs["Key"]) or real_put(**kwargs)
+    svc.s3_client.copy_object = lambda **kwargs: puts.append(kwargs["Key"]) or real_copy(**kwargs)
+    large = os.urandom(r2_mod.R2_MULTIPART_PART_SIZE + 1024)
+    try:
+        small_keys = [(await svc.upload_stream(r, ChunkedStream(b"same bytes"), "a.png"))[0] for r in ("r1", "r2")]
+        large_keys = [(await svc.upload_stream(r, ChunkedStream(large), "b.mp4"))[0] for r in ("r1", "r2")]
+
+        assert small_keys[0] == small_keys[1] and large_keys[0] == large_keys[1]
+        assert puts == [small_keys[0], large_keys[0]]
+        assert svc.s3_client.list_objects_v2(Bucket="bucket")["KeyCount"] == 2
+        assert not svc.s3_client.list_multipart_uploads(Bucket="bucket").get("Uploads")
+    finally:
+        svc.close()
+
+
+@pytest.mark.asyncio
+async def test_upload_stream_reserves_before_reusing_stored_content(moto_server):
+    import app.r2_service as r2_mod
+
+    svc = R2Service()
+    large = os.urandom(r2_mod.R2_MULTIPART_PART_SIZE + 1024)
+    reserved = []
+
+    async def reserve_after_concurrent_delete(file_key):
+        # A release that held the blob row lock deletes the object before reserve() returns
+        reserved.append(file_key)
+        svc.s3_client.delete_object(Bucket="bucket", Key=file_key)
+
+    try:
+        for data, name in ((b"same bytes", "a.png"), (large, "b.mp4")):
+            first, _ = await svc.upload_stream("r1", ChunkedStream(data), name)
+            second, _ = await svc.upload_stream("r2", ChunkedStream(data), name, reserve=reserve_after_concurrent_delete)
+
+            assert second == first and reserved[-1] == first
+            assert svc.s3_client.get_object(Bucket="bucket", Key=first)["Body"].read() == data
+    finally:
+        svc.close()
+
+
+@pytest.mark.asyncio
+async def test_upload_stream_aborts_multipart_on_error(moto_server):
+    from fastapi import HTTPException
+    import app.r2_service as r2_mod
+
+    svc = R2Service()
+    real_upload_part = svc.s3_client.upload_part
+
+    def failing_upload_part(**kwargs):
+        if kwargs["PartNumber"] == 2:
+            raise RuntimeError("connection reset")
+        return real_upload_part(**kwargs)
+
+    svc.s3_client.upload_part = failing_upload_part
+    data = b"x" * (r2_mod.R2_MULTIPART_PART_SIZE * 3)
+    try:
+        with pytest.raises(HTTPException) as exc:
+            await svc.upload_stream("req1", ChunkedStream(data), "big.bin")
+        assert exc.value.status_code == 500
+
+        with pytest.raises(HTTPException) as exc:
+            await svc.upload_stream("req1", ChunkedStream(data), "big.bin", max_size=len(data) - 1)
+        assert exc.value.status_code == 413
+
+        assert not svc.s3_client.list_multipart_uploads(Bucket="bucket").get("Uploads")
+        assert svc.s3_client.list_objects_v2(Bucket="bucket")["KeyCount"] == 0
+    finally:
+        svc.close()
+
+
+def test_delete_files_batches_and_reports_per_key_errors(monkeypatch):
+    import app.r2_service as r2_mod
+
+    calls = []
+
+    class BatchClient(DummyS3Client):
+        def delete_objects(self, Bucket, Delete):
+            keys = [o["Key"] for o in Delete["Objects"]]
+            calls.append(keys)
+            errors = [{"Key": k, "Code": "AccessDenied", "Message": "nope"} for k in keys if k.endswith("-denied")]
+            errors += [{"Key": k, "Code": "NoSuchKey", "Message": "gone"} for k in keys if k.endswith("-gone")]
+            return {"Errors": errors}
+
+    monkeypatch.setattr(r2_mod.boto3, "client", lambda *args, **kwargs: BatchClient())
+    svc = R2Service()
+
+    keys = [f"k{i}" for i in range(2500)] + ["x-denied", "y-gone"]
+    result = asyncio.get_event_loop().run_until_complete(svc.delete_files(keys))
+    svc.close()
+
+    assert [len(c) for c in calls] == [1000, 1000, 502]
+    assert result["errors"] == [{"file_key": "x-denied", "code": "AccessDenied", "message": "nope"}]
+    assert len(result["deleted"]) == 2501
+    assert "y-gone" in result["deleted"]
@@ -1,13 +1,15 @@
 import io
 import uuid
+from collections import Counter
+
 import pytest
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from httpx import AsyncClient
 from httpx import ASGITransport
 
 from main import app as fastapi_app
 from app.routers.request_assets import router as request_assets_router
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.r2_service import get_r2_service
 
 
@@ -15,8 +17,45 @@ class FakeDB:
     def __init__(self):
         self.requests = {}
         self.request_assets = {}
+        self.upload_intents = {}
+        self.fail_executemany = False
+        # References held by uploads whose asset rows do not exist yet
+        self.reserved = Counter()
+
+    def transaction(self):
+        class _Transaction:
+            async def __aenter__(self):
+                pass
+
+            async def __aexit__(self, *exc):
+                pass
+
+        return _Transaction()
+
+    async def executemany(self, query: str, args_list):
+        if self.fail_executemany:
+            raise RuntimeError("connection lost")
+        for args in args_list:
+            await self.execute(query, *args)
 
     async def fetchrow(self, query: str, *args):
+        if "WITH intent AS" in query:
+            request_asset_id, now = args
+            intent = self.upload_intents.pop(request_asset_id, None)
+            if not intent:
+                return None
+            asset = {
+                "request_asset_id": request_asset_id,
+                "request_id": intent["request_id"],
+                "file_key": intent["file_key"],
+                "created_at": now,
+                "updated_at": now,
+            }
+            self.request_assets[request_asset_id] = asset
+            return asset.copy()
+        if "FROM request_asset_upload_intents WHERE request_asset_id = $1" in query:
+            intent = self.upload_intents.get(args[0])
+            return intent.copy() if intent else None
         if "FROM requests WHERE request_id = $1" in query:
             request_id = args[0]
             return {"request_id": request_id} if request_id in self.requests else None
@@ -26,7 +65,20 @@ class FakeDB:
             return asset.copy() if asset else None
         return None
 
+    def ref_count(self, file_key):
+        # Stands in for blobs.ref_count, which a trigger maintains in Postgres
+        return sum(a["file_key"] == file_key for a in self.request_assets.values()) + self.reserved[file_key]
+
     async def fetch(self, query: str, *args):
+        if query.startswith("SELECT file_key FROM blobs"):
+            assert "FOR UPDATE" in query
+            return [{"file_key": k} for k in args[0] if self.ref_count(k) <= 0]
+        if query.startswith("DELETE FROM request_assets"):
+            if "request_asset_id = ANY" in query:
+                doomed = [i for i in args[0] if i in self.request_assets]
+            else:
+                doomed = [i for i, a in self.request_assets.items() if a["request_id"] == args[0]]
+            return [self.request_assets.pop(i) for i in doomed]
         if "FROM request_assets WHERE request_id = $1" in query:
             request_id = args[0]
             assets = [a for a in self.request_assets.values() if a["request_id"] == request_id]
@@ -37,6 +89,28 @@ class FakeDB:
         return []
 
     async def execute(self, query: str, *args):
+        if query.strip().startswith("INSERT INTO blobs"):
+            self.reserved[args[0]] += 1
+            return "INSERT 0 1"
+        if query.strip().startswith("UPDATE blobs"):
+            self.reserved.subtract(args[0])
+            return f"UPDATE {len(set(args[0]))}"
+        if query.startswith("DELETE FROM blobs"):
+            return f"DELETE {len(args[0])}"
+        if query.startswith("DELETE FROM requests"):
+            return "DELETE 1" if self.requests.pop(args[0], None) else "DELETE 0"
+        if query.strip().startswith("INSERT INTO request_asset_upload_intents"):
+            request_asset_id, request_id, file_key, content_type, size_bytes, expires_at, created_at = args
+            self.upload_intents[request_asset_id] = {
+                "request_asset_id": request_asset_id,
+                "request_id": request_id,
+                "file_key": file_key,
+                "content_type": content_type,
+                "size_bytes": size_bytes,
+                "expires_at": expires_at,
+                "created_at": created_at,
+            }
+            return "INSERT 0 1"
         if query.strip().startswith("INSERT INTO request_assets"):
             request_asset_id, request_id, file_key, created_at, updated_at = args
             self.request_assets[request_asset_id] = {
@@ -69,6 +143,8 @@ class FakeR2Service:
     def __init__(self):
         self.uploaded = []
         self.deleted = []
+        # file_key -> head_object metadata for objects uploaded directly by clients
+        self.objects = {}
 
     async def upload_file(self, request_id: str, file_content: bytes, filename: str) -> str:
         file_id = str(uuid.uuid4())
@@ -85,10 +161,36 @@ class FakeR2Service:
         })
         return file_key
 
+    async def upload_stream(self, request_id: str, stream, filename: str, reserve=None):
+        file_content = await stream.read()
+        if not file_content:
+            raise HTTPException(status_code=400, detail="Empty file provided")
+        file_key = await self.upload_file(request_id, file_content, filename)
+        if reserve is not None:
+            await reserve(file_key)
+        return file_key, len(file_content)
+
     async def delete_file(self, file_key: str) -> bool:
         self.deleted.append(file_key)
         return True
 
+    async def delete_files(self, file_keys):
+        self.deleted.extend(file_keys)
+        return {"deleted": list(file_keys), "errors": []}
+
+    async def head_file(self, file_key: str):
+        return self.objects.get(file_key)
+
+    def get_presigned_upload_url(self, file_key: str, content_type: str, content_length: int, expiration: int = 900) -> str:
+        return f"https://r2.example/bucket/{file_key}?upload=1&expires={expiration}"
+
+    def _generate_file_key(self, request_id: str, filename: str) -> str:
+        ext = "." + filename.split(".")[-1] if "." in filename else ""
+        return f"request-assets/{request_id}/{uuid.uuid4()}{ext}"
+
+    def _get_content_type(self, filename: str) -> str:
+        return "image/png" if filename.endswith(".png") else "application/octet-stream"
+
     def get_signed_url(self, file_key: str, expiration: int = 3600) -> str:
         base = self.public_url_base.rstrip("/")
         return f"{base}/{file_key}?signed=1&expires={expiration}"
@@ -129,6 +231,7 @@ def app_overridden():
         return fake_r2
 
     fastapi_app.dependency_overrides[get_db] = override_get_db
+    fastapi_app.dependency_overrides[get_read_db] = override_get_db
     fastapi_app.dependency_overrides[get_r2_service] = override_get_r2_service
 
     try:
@@ -235,3 +338,263 @@ async def test_delete_request_asset_calls_r2(app_overridden):
     assert any(d == file_key for d in fake_r2.deleted)
     assert asset_id not in fake_db.request_assets
 
+
+@pytest.mark.asyncio
+async def test_delete_keeps_blob_until_last_reference_is_gone(app_overridden):
+    app, fake_db, fake_r2, request_id = app_overridden
+
+    file_key = "request-assets/blobs/abc123.png"
+    for asset_id in ("a1", "a2"):
+        fake_db.request_assets[asset_id] = {
+            "request_asset_id": asset_id, "request_id": request_id, "file_key": file_key,
+            "created_at": None, "updated_at": None,
+        }
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        first = await client.delete("/request-assets/a1")
+        assert first.status_code == 200
+        assert fake_r2.deleted == []
+
+        last = await client.delete("/request-assets/a2")
+        assert last.status_code == 200
+        assert fake_r2.deleted == [file_key]
+
+
+
+@pytest.mark.asyncio
+async def test_upload_reusing_a_blob_keeps_it_through_a_concurrent_delete(app_overridden):
+    from app.blobs import release_blobs
+
+    app, fake_db, fake_r2, request_id = app_overridden
+    file_key = "request-assets/blobs/abc123.png"
+    fake_db.request_assets["a1"] = {
+        "request_asset_id": "a1", "request_id": request_id, "file_key": file_key,
+        "created_at": None, "updated_at": None,
+    }
+
+    async def upload_stream(request_id, stream, filename, reserve=None):
+        await reserve(file_key)
+        # The last other asset is deleted after the upload found the object already stored
+        del fake_db.request_assets["a1"]
+        await release_blobs(fake_db, fake_r2, [file_key])
+        return file_key, 3
+
+    fake_r2.upload_stream = upload_stream
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.post(
+            "/request-assets/upload",
+            files={"file": ("a.png", io.BytesIO(b"png"), "image/png")},
+            data={"request_id": request_id},
+        )
+
+    assert resp.status_code == 200
+    assert fake_r2.deleted == []
+    assert fake_db.ref_count(file_key) == 1 and not +fake_db.reserved
+
+
+@pytest.mark.asyncio
+async def test_delete_request_asset_invalidates_signed_url_cache(app_overridden):
+    from app.signed_url_cache import signed_url_cache
+
+    app, fake_db, fake_r2, request_id = app_overridden
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        upload = await client.post(
+            "/request-assets/upload",
+            files={"file": ("a.png", io.BytesIO(b"png"), "image/png")},
+            data={"request_id": request_id},
+        )
+        asset_id = upload.json()["request_asset_id"]
+        file_key = fake_r2.uploaded[-1]["file_key"]
+        assert signed_url_cache.stats()["entries"] >= 1
+
+        resp = await client.delete(f"/request-assets/{asset_id}")
+
+    assert resp.status_code == 200
+    assert file_key not in signed_url_cache._expirations_by_key
+
+
+@pytest.mark.asyncio
+async def test_direct_upload_intent_and_complete(app_overridden):
+    app, fake_db, fake_r2, request_id = app_overridden
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.post(
+            "/request-assets/upload-intent",
+            json={"request_id": request_id, "filename": "photo.png", "size": 1234},
+        )
+        assert resp.status_code == 200
+        intent = resp.json()
+        assert intent["method"] == "PUT"
+        assert intent["headers"] == {"Content-Type": "image/png", "Content-Length": "1234"}
+        assert intent["file_key"].startswith(f"request-assets/{request_id}/")
+        asset_id = intent["request_asset_id"]
+
+        # Completing before the object exists is rejected
+        early = await client.post(f"/request-assets/{asset_id}/complete")
+        assert early.status_code == 409
+
+        fake_r2.objects[intent["file_key"]] = {"ContentLength": 1234, "ContentType": "image/png"}
+        done = await client.post(f"/request-assets/{asset_id}/complete")
+
+    assert done.status_code == 200
+    assert done.json()["request_asset_id"] == asset_id
+    assert fake_db.request_assets[asset_id]["file_key"] == intent["file_key"]
+    assert asset_id not in fake_db.upload_intents
+
+
+@pytest.mark.asyncio
+async def test_complete_rejects_mismatched_upload(app_overridden):
+    app, fake_db, fake_r2, request_id = app_overridden
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        intent = (await client.post(
+            "/request-assets/upload-intent",
+            json={"request_id": request_id, "filename": "photo.png", "size": 10},
+        )).json()
+        fake_r2.objects[intent["file_key"]] = {"ContentLength": 99999, "ContentType": "image/png"}
+        resp = await client.post(f"/request-assets/{intent['request_asset_id']}/complete")
+
+    assert resp.status_code == 400
+    assert intent["file_key"] in fake_r2.deleted
+    assert intent["request_asset_id"] not in fake_db.request_assets
+
+
+@pytest.mark.asyncio
+async def test_expired_intent_sweep_deletes_objects_in_one_batch(monkeypatch):
+    import app.database as database
+    import app.upload_intents as upload_intents
+
+    expired = [{"file_key": f"request-assets/r1/{i}.png"} for i in range(3)]
+
+    class SweepConn:
+        async def fetch(self, query, *args):
+            assert query.startswith("DELETE FROM request_asset_upload_intents")
+            return expired
+
+    class SweepPool:
+        def acquire(self):
+            class _Acquire:
+                async def __aenter__(self):
+                    return SweepConn()
+
+                async def __aexit__(self, *exc):
+                    pass
+
+            return _Acquire()
+
+    class BatchOnlyR2(FakeR2Service):
+        async def delete_file(self, file_key):
+            raise AssertionError("expired uploads should be deleted with delete_files")
+
+    r2 = BatchOnlyR2()
+    monkeypatch.setattr(database, "_pool", SweepPool())
+    monkeypatch.setattr(upload_intents, "init_r2_service", lambda: r2)
+
+    await upload_intents.expire_upload_intents()
+
+    assert r2.deleted == [row["file_key"] for row in expired]
+
+
+@pytest.mark.asyncio
+async def test_upload_batch_reports_per_file_results(app_overridden):
+    app, fake_db, fake_r2, request_id = app_overridden
+
+    files = [
+        ("files", ("a.png", io.BytesIO(b"aaa"), "image/png")),
+        ("files", ("empty.png", io.BytesIO(b""), "image/png")),
+        ("files", ("b.png", io.BytesIO(b"bbbb"), "image/png")),
+    ]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.post("/request-assets/upload-batch", files=files, data={"request_id": request_id})
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert (body["uploaded"], body["failed"]) == (2, 1)
+    assert [r["status"] for r in body["results"]] == ["uploaded", "failed", "uploaded"]
+    assert body["results"][1]["error"] == "Empty file provided"
+    assert len(fake_db.request_assets) == 2
+    assert {r["asset"]["request_asset_id"] for r in body["results"] if r["asset"]} == set(fake_db.request_assets)
+
+
+@pytest.mark.asyncio
+async def test_upload_batch_cleans_up_objects_when_insert_fails(app_overridden):
+    app, fake_db, fake_r2, request_id = app_overridden
+    fake_db.fail_executemany = True
+
+    files = [
+        ("files", ("a.png", io.BytesIO(b"aaa"), "image/png")),
+        ("files", ("b.png", io.BytesIO(b"bbb"), "image/png")),
+    ]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.post("/request-assets/upload-batch", files=files, data={"request_id": request_id})
+
+    assert resp.status_code == 200
+    assert resp.json()["failed"] == 2
+    assert sorted(fake_r2.deleted) == sorted(u["file_key"] for u in fake_r2.uploaded)
+
+
+def _seed_assets(fake_db, request_id, count):
+    ids = []
+    for i in range(count):
+        asset_id = str(uuid.uuid4())
+        fake_db.request_assets[asset_id] = {
+            "request_asset_id": asset_id,
+            "request_id": request_id,
+            "file_key": f"request-assets/{request_id}/{asset_id}.png",
+            "created_at": None,
+            "updated_at": None,
+        }
+        ids.append(asset_id)
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_by_request_id(app_overridden):
+    app, fake_db, fake_r2, request_id = app_overridden
+    ids = _seed_assets(fake_db, request_id, 3)
+    other = _seed_assets(fake_db, "other-request", 1)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.post("/request-assets/bulk-delete", json={"request_id": request_id})
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["deleted"] == 3 and body["storage_deleted"] == 3
+    assert sorted(body["request_asset_ids"]) == sorted(ids)
+    assert list(fake_db.request_assets) == other
+    assert len(fake_r2.deleted) == 3
+
+
+@pytest.mark.asyncio
+async def test_delete_request_releases_blobs_of_its_assets(app_overridden):
+    app, fake_db, fake_r2, request_id = app_overridden
+    _seed_assets(fake_db, request_id, 2)
+    shared_key = next(iter(fake_db.request_assets.values()))["file_key"]
+    # Another request's asset shares the first blob, which must stay
+    fake_db.request_assets["other-asset"] = {"request_asset_id": "other-asset", "request_id": "other-request",
+                                             "file_key": shared_key, "created_at": None, "updated_at": None}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.delete(f"/requests/{request_id}")
+        missing = await client.delete(f"/requests/{request_id}")
+
+    assert resp.status_code == 200 and missing.status_code == 404
+    assert request_id not in fake_db.requests
+    assert list(fake_db.request_assets) == ["other-asset"]
+    assert len(fake_r2.deleted) == 1 and shared_key not in fake_r2.deleted
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_requires_exactly_one_selector(app_overridden):
+    app, _, _, request_id = app_overridden
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        neither = await client.post("/request-assets/bulk-delete", json={})
+        both = await client.post(
+            "/request-assets/bulk-delete",
+            json={"request_id": request_id, "request_asset_ids": ["x"]},
+        )
+
+    assert neither.status_code == 400
+    assert both.status_code == 400
@@ -5,7 +5,7 @@ import pytest
 from httpx import AsyncClient, ASGITransport
 
 from main import app as fastapi_app
-from app.database import get_db
+from app.database import get_db, get_read_db
 
 
 REQUIRED_ENV_VARS = [
@@ -35,7 +35,20 @@ class FakeDB:
             return asset.copy() if asset else None
         return None
 
+    def transaction(self):
+        class _Transaction:
+            async def __aenter__(self):
+                pass
+
+            async def __aexit__(self, *exc):
+                pass
+
+        return _Transaction()
+
     async def fetch(self, query: str, *args):
+        if query.startswith("SELECT file_key FROM blobs"):
+            referenced = {a["file_key"] for a in self.request_assets.values()}
+            return [{"file_key": k} for k in args[0] if k not in referenced]
         return []
 
     async def execute(self, query: str, *args):
@@ -74,6 +87,7 @@ async def test_real_r2_upload_and_delete():
     # clear any previous overrides and set only DB
     fastapi_app.dependency_overrides.clear()
     fastapi_app.dependency_overrides[get_db] = override_get_db
+    fastapi_app.dependency_overrides[get_read_db] = override_get_db
 
     try:
         file_bytes = b"integration test file"
@@ -50,7 +50,7 @@ async def test_prod_upload_and_cleanup_real_services():
         # Fetch asset list for this request and validate presigned URL from list
         list_resp = await client.get("/request-assets/", params={"request_id": created_request_id})
         assert list_resp.status_code == 200
-        assets = list_resp.json()
+        assets = list_resp.json()["items"]
         assert isinstance(assets, list)
         assert len(assets) >= 1
         print(assets)
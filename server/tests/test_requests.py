@@ -0,0 +1,219 @@
+from datetime import datetime
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from main import app as fastapi_app
+from app.database import get_db, get_read_db
+from app.r2_service import get_r2_service
+from app.routers.requests import SEARCH_CANDIDATE_LIMIT
+
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+
+class FullRequestDB:
+    """Serves the fixed set of queries behind GET /requests/{id}/full and counts them"""
+
+    def __init__(self):
+        self.queries = []
+        self.request = {"request_id": "req-1", "shopify_user_id": "u1", "query": "desk lamp",
+                        "created_at": NOW, "updated_at": NOW}
+        self.assets = [{"request_asset_id": "a1", "request_id": "req-1", "file_key": "request-assets/req-1/a1.png",
+                        "created_at": NOW, "updated_at": NOW}]
+        self.tags = [{"tag_value": "home", "request_id": "req-1", "created_at": NOW, "updated_at": NOW}]
+        self.carts = [
+            {"cart_id": f"c{i}", "request_id": "req-1", "shopify_user_id": f"u{i}", "created_at": NOW, "updated_at": NOW}
+            for i in range(3)
+        ]
+        self.cart_products = [
+            {"cart_id": "c0", "product_id": "p1", "shopify_product_id": "sp1", "shopify_variant_id": "sv1"},
+            {"cart_id": "c0", "product_id": "p2", "shopify_product_id": "sp2", "shopify_variant_id": "sv2"},
+            {"cart_id": "c2", "product_id": "p1", "shopify_product_id": "sp1", "shopify_variant_id": "sv1"},
+        ]
+
+    async def fetchrow(self, query, *args):
+        self.queries.append(query)
+        if "FROM requests WHERE request_id = $1" in query:
+            return self.request if args[0] == "req-1" else None
+        return None
+
+    async def fetch(self, query, *args):
+        self.queries.append(query)
+        if "FROM request_assets" in query:
+            return self.assets
+        if "FROM request_tags" in query:
+            return self.tags
+        if "FROM carts_products" in query:
+            return [r for r in self.cart_products if r["cart_id"] in args[0]]
+        if "FROM carts" in query:
+            return self.carts
+        return []
+
+
+class SigningR2:
+    def get_signed_url(self, file_key, expiration=3600):
+        return f"https://cdn.test/{file_key}?expires={expiration}"
+
+
+@pytest.fixture
+def full_app():
+    db = FullRequestDB()
+
+    async def override_get_db():
+        yield db
+
+    fastapi_app.dependency_overrides[get_db] = override_get_db
+    fastapi_app.dependency_overrides[get_read_db] = override_get_db
+    fastapi_app.dependency_overrides[get_r2_service] = lambda: SigningR2()
+    try:
+        yield fastapi_app, db
+    finally:
+        fastapi_app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_full_request_loads_everything_in_fixed_queries(full_app):
+    app, db = full_app
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.get("/requests/req-1/full")
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["request_id"] == "req-1"
+    assert body["assets"][0]["url"].startswith("https://cdn.test/request-assets/req-1/a1.png")
+    assert [t["tag_value"] for t in body["tags"]] == ["home"]
+    assert [len(c["products"]) for c in body["carts"]] == [2, 0, 1]
+    # request, assets, tags, carts, cart products: independent of cart count
+    assert len(db.queries) == 5
+
+
+@pytest.mark.asyncio
+async def test_full_request_include_limits_sections(full_app):
+    app, db = full_app
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.get("/requests/req-1/full", params={"include": "tags"})
+        assert len(db.queries) == 2
+        bad = await client.get("/requests/req-1/full", params={"include": "tags,bogus"})
+        missing = await client.get("/requests/nope/full")
+
+    assert resp.status_code == 200
+    assert set(resp.json()) == {"request_id", "shopify_user_id", "query", "created_at", "updated_at", "tags"}
+    assert bad.status_code == 400
+    assert missing.status_code == 404
+
+
+class CapturingDB:
+    def __init__(self, rows=None):
+        self.calls = []
+        self.validator_calls = []
+        self.rows = rows or []
+
+    async def fetch(self, query, *args):
+        self.calls.append((query, args))
+        return self.rows
+
+    async def fetchval(self, query, *args):
+        self.validator_calls.append((query, args))
+        return None
+
+
+@pytest.fixture
+def capturing_app():
+    db = CapturingDB()
+
+    async def override_get_db():
+        yield db
+
+    fastapi_app.dependency_overrides[get_db] = override_get_db
+    fastapi_app.dependency_overrides[get_read_db] = override_get_db
+    try:
+        yield fastapi_app, db
+    finally:
+        fastapi_app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_list_requests_by_tags_requires_all_by_default(capturing_app):
+    app, db = capturing_app
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.get("/requests/", params=[("tag", "shoes"), ("tag", "red"), ("tag", "red")])
+
+    assert resp.status_code == 200
+    query, args = db.calls[0]
+    assert "GROUP BY request_id HAVING count(*) = $2" in query
+    assert args[:2] == (["red", "shoes"], 2)
+    assert query.endswith("ORDER BY created_at DESC, request_id DESC LIMIT $3")
+
+
+@pytest.mark.asyncio
+async def test_list_requests_by_tags_any(capturing_app):
+    app, db = capturing_app
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.get("/requests/", params=[("tag", "shoes"), ("tag", "red"), ("tag_match", "any")])
+        bad = await client.get("/requests/", params=[("tag", "shoes"), ("tag_match", "some")])
+
+    assert resp.status_code == 200
+    query, args = db.calls[0]
+    assert "HAVING" not in query
+    assert "tag_value = ANY($1::varchar[])" in query
+    assert bad.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_tag_counts_reads_counter_table(capturing_app):
+    app, db = capturing_app
+    db.rows = [{"tag_value": "shoes", "request_count": 42}, {"tag_value": "red", "request_count": 7}]
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.get("/request-tags/counts", params={"limit": 2})
+
+    assert resp.status_code == 200
+    assert resp.json() == [{"tag_value": "shoes", "request_count": 42}, {"tag_value": "red", "request_count": 7}]
+    query, args = db.calls[0]
+    assert "FROM request_tag_counts" in query and args == (2,)
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_prefix_matches_and_pages_by_rank(capturing_app):
+    app, db = capturing_app
+    db.rows = [
+        {"request_id": f"req-{i}", "shopify_user_id": "u1", "query": "red running shoes",
+         "created_at": NOW, "updated_at": NOW, "rank": 0.5 - i / 10}
+        for i in range(3)
+    ]
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.get("/requests/search", params={"q": "Red Shoe!", "limit": 2})
+        query, args = db.calls[0]
+        next_page = await client.get("/requests/search", params={"q": "red shoe", "cursor": resp.json()["next_cursor"]})
+
+    assert resp.status_code == 200
+    assert [hit["request_id"] for hit in resp.json()["items"]] == ["req-0", "req-1"]
+    assert resp.json()["items"][0]["rank"] == 0.5
+    assert "query_tsv @@ tsq" in query and "query_tsv," not in query.split("FROM")[0]
+    assert "WHERE query_tsv @@ tsq\n                ORDER BY created_at DESC, request_id DESC\n                LIMIT $2" in query
+    assert args == ("red & shoe:*", SEARCH_CANDIDATE_LIMIT, 3)
+    assert query.endswith("ORDER BY rank DESC, created_at DESC, request_id DESC LIMIT $3")
+
+    assert next_page.status_code == 200
+    query, args = db.calls[1]
+    assert "(rank, created_at, request_id) < ($3::real, $4, $5)" in query
+    assert args == ("red & shoe:*", SEARCH_CANDIDATE_LIMIT, 0.4, NOW, "req-1", 51)
+
+
+@pytest.mark.asyncio
+async def test_search_rejects_queries_without_words_and_disabled_fuzzy(capturing_app):
+    app, db = capturing_app
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        no_words = await client.get("/requests/search", params={"q": "!!!"})
+        fuzzy = await client.get("/requests/search", params={"q": "shoes", "fuzzy": "true"})
+
+    assert no_words.status_code == 400
+    assert fuzzy.status_code == 400
+    assert db.calls == []
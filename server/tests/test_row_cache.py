@@ -0,0 +1,233 @@
+import asyncio
+import os
+import uuid
+
+import asyncpg
+import pytest
+
+import app.cache_invalidation as cache_invalidation
+from app.cache_invalidation import CACHE_INVALIDATION_CHANNEL, CacheInvalidationListener
+from app.row_cache import RowCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def enabled_cache(**kwargs) -> RowCache:
+    cache = RowCache(**{"max_entries": 10, "ttl": 60, **kwargs})
+    cache.set_enabled(True)
+    return cache
+
+
+def loader(rows, calls):
+    async def load(key):
+        calls.append(key)
+        return rows.get(key)
+    return load
+
+
+@pytest.mark.asyncio
+async def test_read_through_with_ttl_and_lru_bound():
+    clock = FakeClock()
+    cache = enabled_cache(max_entries=2, ttl=30, clock=clock)
+    rows = {k: {"product_id": k} for k in ("a", "b", "c")}
+    calls = []
+    load = loader(rows, calls)
+
+    assert await cache.get_or_load("a", load) == {"product_id": "a"}
+    assert await cache.get_or_load("a", load) == {"product_id": "a"}
+    assert calls == ["a"]
+
+    await cache.get_or_load("b", load)
+    await cache.get_or_load("c", load)  # evicts "a"
+    await cache.get_or_load("a", load)
+    assert calls == ["a", "b", "c", "a"]
+    assert cache.stats()["evictions"] == 2
+
+    clock.now = 31
+    await cache.get_or_load("a", load)
+    assert calls[-1] == "a" and len(calls) == 5
+
+
+@pytest.mark.asyncio
+async def test_disabled_cache_and_missing_rows_always_load():
+    calls = []
+    cache = RowCache(max_entries=10, ttl=60)
+    load = loader({"a": {"product_id": "a"}}, calls)
+
+    await cache.get_or_load("a", load)
+    await cache.get_or_load("a", load)
+    assert calls == ["a", "a"]
+
+    cache.set_enabled(True)
+    assert await cache.get_or_load("missing", load) is None
+    assert await cache.get_or_load("missing", load) is None
+    assert calls.count("missing") == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidation_during_load_is_not_overwritten_by_stale_row():
+    cache = enabled_cache()
+    loading = asyncio.Event()
+    release = asyncio.Event()
+    calls = []
+
+    async def slow_load(key):
+        calls.append(key)
+        loading.set()
+        await release.wait()
+        return {"product_id": key, "version": 1}
+
+    task = asyncio.create_task(cache.get_or_load("a", slow_load))
+    await loading.wait()
+    cache.invalidate("a")  # a write committed while the old row was in flight
+    release.set()
+    await task
+
+    await cache.get_or_load("a", slow_load)
+    assert calls == ["a", "a"]
+
+
+class FakeNotifyBus:
+    """Stands in for Postgres: every LISTEN connection receives every NOTIFY"""
+
+    def __init__(self):
+        self.listeners = []
+
+    async def connect(self, database_url):
+        return FakeListenConn(self)
+
+    def notify(self, channel, payload):
+        for conn, listen_channel, callback in self.listeners:
+            if listen_channel == channel:
+                callback(conn, 1234, channel, payload)
+
+
+class FakeListenConn:
+    def __init__(self, bus):
+        self.bus = bus
+        self.closed = False
+        self.terminated = False
+
+    def add_termination_listener(self, callback):
+        pass
+
+    async def add_listener(self, channel, callback):
+        self.bus.listeners.append((self, channel, callback))
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self, timeout=None):
+        self.closed = True
+
+    def terminate(self):
+        self.terminated = True
+
+
+@pytest.mark.asyncio
+async def test_write_in_one_worker_invalidates_other_workers(monkeypatch):
+    bus = FakeNotifyBus()
+    monkeypatch.setattr(cache_invalidation.asyncpg, "connect", bus.connect)
+
+    workers = []
+    for _ in range(2):
+        cache = RowCache(max_entries=10, ttl=600)
+        listener = CacheInvalidationListener({"products": cache}, database_url="postgresql://fake")
+        workers.append((cache, listener, asyncio.create_task(listener.run())))
+    while not all(listener.connected for _, listener, _ in workers):
+        await asyncio.sleep(0)
+
+    db = {"p1": {"product_id": "p1", "shopify_product_id": "old"}}
+    for cache, _, _ in workers:
+        assert (await cache.get_or_load("p1", loader(db, [])))["shopify_product_id"] == "old"
+
+    # Worker 0 writes; the products trigger publishes the change to every listener
+    db["p1"] = {"product_id": "p1", "shopify_product_id": "new"}
+    bus.notify(CACHE_INVALIDATION_CHANNEL, "products:p1")
+
+    cache, listener, _ = workers[1]
+    assert (await cache.get_or_load("p1", loader(db, [])))["shopify_product_id"] == "new"
+    assert listener.stats()["notifications"] == 1
+
+    for _, _, task in workers:
+        task.cancel()
+    await asyncio.gather(*(task for _, _, task in workers), return_exceptions=True)
+    assert not any(cache.enabled for cache, _, _ in workers)
+
+
+@pytest.mark.asyncio
+async def test_listener_retries_when_listen_setup_fails(monkeypatch):
+    bus = FakeNotifyBus()
+    conns = []
+
+    class FlakyListenConn(FakeListenConn):
+        async def add_listener(self, channel, callback):
+            if len(conns) == 1:
+                raise asyncpg.InterfaceError("connection was closed in the middle of operation")
+            await super().add_listener(channel, callback)
+
+    async def connect(database_url):
+        conns.append(FlakyListenConn(bus))
+        return conns[-1]
+
+    monkeypatch.setattr(cache_invalidation.asyncpg, "connect", connect)
+    monkeypatch.setattr(cache_invalidation, "CACHE_LISTENER_RETRY_INTERVAL", 0)
+    cache = RowCache(max_entries=10, ttl=600)
+    listener = CacheInvalidationListener({"products": cache}, database_url="postgresql://fake")
+    task = asyncio.create_task(listener.run())
+    try:
+        for _ in range(100):
+            if listener.connected:
+                break
+            await asyncio.sleep(0)
+        assert listener.connected and cache.enabled
+        assert len(conns) == 2
+        assert conns[0].closed and not conns[1].closed
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.integration
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="requires TEST_DATABASE_URL (migrated database)")
+@pytest.mark.asyncio
+async def test_notify_trigger_invalidates_across_connections():
+    database_url = os.environ["TEST_DATABASE_URL"]
+    caches = [RowCache(max_entries=10, ttl=600) for _ in range(2)]
+    listeners = [CacheInvalidationListener({"products": c}, database_url=database_url) for c in caches]
+    tasks = [asyncio.create_task(listener.run()) for listener in listeners]
+    writer = await asyncpg.connect(database_url)
+    product_id = str(uuid.uuid4())
+    try:
+        while not all(listener.connected for listener in listeners):
+            await asyncio.sleep(0.01)
+        await writer.execute(
+            "INSERT INTO products (product_id, shopify_product_id, shopify_variant_id) VALUES ($1, 'sp', 'sv')",
+            product_id
+        )
+
+        async def load(key):
+            row = await writer.fetchrow("SELECT * FROM products WHERE product_id = $1", key)
+            return dict(row) if row else None
+
+        for cache in caches:
+            await cache.get_or_load(product_id, load)
+        await writer.execute("UPDATE products SET shopify_product_id = 'sp2' WHERE product_id = $1", product_id)
+
+        for _ in range(100):
+            if all(cache.stats()["entries"] == 0 for cache in caches):
+                break
+            await asyncio.sleep(0.02)
+        assert all(cache.stats()["entries"] == 0 for cache in caches)
+    finally:
+        await writer.execute("DELETE FROM products WHERE product_id = $1", product_id)
+        await writer.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,69 @@
+from app.signed_url_cache import SignedUrlCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Signer:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, file_key, expiration):
+        self.calls += 1
+        return f"https://cdn.test/{file_key}?expires={expiration}&v={self.calls}"
+
+
+def test_hits_until_lifetime_drops_below_threshold():
+    clock, sign = Clock(), Signer()
+    cache = SignedUrlCache(max_entries=10, min_remaining=0.5, clock=clock)
+
+    first = cache.get_or_sign("a.png", 3600, sign)
+    clock.now += 1700
+    assert cache.get_or_sign("a.png", 3600, sign) == first
+
+    # Less than half the lifetime left: re-sign ahead of expiry
+    clock.now += 200
+    refreshed = cache.get_or_sign("a.png", 3600, sign)
+    assert refreshed != first
+    assert sign.calls == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_expiration_is_part_of_the_key():
+    cache, sign = SignedUrlCache(clock=Clock()), Signer()
+    cache.get_or_sign("a.png", 3600, sign)
+    cache.get_or_sign("a.png", 60, sign)
+    assert sign.calls == 2
+
+
+def test_evicts_least_recently_used():
+    cache, sign = SignedUrlCache(max_entries=2, clock=Clock()), Signer()
+    cache.get_or_sign("a", 3600, sign)
+    cache.get_or_sign("b", 3600, sign)
+    cache.get_or_sign("a", 3600, sign)
+    cache.get_or_sign("c", 3600, sign)
+
+    assert cache.stats()["evictions"] == 1
+    calls = sign.calls
+    cache.get_or_sign("a", 3600, sign)
+    assert sign.calls == calls
+    cache.get_or_sign("b", 3600, sign)
+    assert sign.calls == calls + 1
+
+
+def test_invalidate_drops_every_expiration_for_key():
+    cache, sign = SignedUrlCache(clock=Clock()), Signer()
+    cache.get_or_sign("a", 3600, sign)
+    cache.get_or_sign("a", 60, sign)
+    cache.get_or_sign("b", 3600, sign)
+
+    cache.invalidate("a")
+    assert cache.stats()["entries"] == 1
+    cache.get_or_sign("a", 3600, sign)
+    assert sign.calls == 4
@@ -0,0 +1,127 @@
+import json
+from datetime import datetime
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+import app.database as database
+from main import app as fastapi_app
+from app.database import get_db, get_read_db
+
+
+class FakeStreamingConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.cursor_calls = []
+        self.in_transaction = False
+        self.released = False
+
+    def transaction(self, readonly=False):
+        conn = self
+
+        class _Transaction:
+            async def __aenter__(self):
+                conn.in_transaction = True
+
+            async def __aexit__(self, *exc):
+                conn.in_transaction = False
+
+        return _Transaction()
+
+    def cursor(self, query, *args, prefetch=None):
+        assert self.in_transaction, "server-side cursors require a transaction"
+        assert not self.released, "the export's connection was released before it finished"
+        self.cursor_calls.append((query, args, prefetch))
+
+        async def rows():
+            for row in self.rows:
+                yield row
+
+        return rows()
+
+
+class ExportPool:
+    """Hands the export its connection and records when it is returned"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.acquired = 0
+
+    def acquire(self):
+        pool = self
+
+        class _Acquire:
+            async def __aenter__(self):
+                pool.acquired += 1
+                pool.conn.released = False
+                return pool.conn
+
+            async def __aexit__(self, *exc):
+                pool.conn.released = True
+
+        return _Acquire()
+
+
+@pytest.fixture
+def streaming_app(monkeypatch):
+    now = datetime(2024, 5, 1, 12, 0, 0)
+    rows = [
+        {"request_id": f"req-{i}", "shopify_user_id": "u", "query": f"q{i}", "created_at": now, "updated_at": now}
+        for i in range(3)
+    ]
+    conn = FakeStreamingConnection(rows)
+    pool = ExportPool(conn)
+    monkeypatch.setattr(database, "_pool", pool)
+
+    async def override_get_db():
+        # The route's connection is gone by the time the body streams
+        yield None
+
+    fastapi_app.dependency_overrides[get_db] = override_get_db
+    fastapi_app.dependency_overrides[get_read_db] = override_get_db
+    try:
+        yield fastapi_app, conn, pool
+    finally:
+        fastapi_app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_stream_query_param_returns_ndjson(streaming_app):
+    app, conn, pool = streaming_app
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.get("/requests/", params={"stream": "true"})
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = resp.text.strip().split("\n")
+    assert [json.loads(line)["request_id"] for line in lines] == ["req-0", "req-1", "req-2"]
+    query, _, _ = conn.cursor_calls[0]
+    assert query == (
+        "SELECT request_id, shopify_user_id, query, created_at, updated_at FROM requests "
+        "ORDER BY created_at DESC, request_id DESC"
+    )
+
+
+@pytest.mark.asyncio
+async def test_accept_header_selects_streaming(streaming_app):
+    app, conn, pool = streaming_app
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.get("/requests/", headers={"Accept": "application/x-ndjson"})
+
+    assert resp.status_code == 200
+    assert len(resp.text.strip().split("\n")) == 3
+    assert len(conn.cursor_calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_export_returns_its_own_connection_after_streaming(streaming_app):
+    app, conn, pool = streaming_app
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.get("/requests/", params={"stream": "true"})
+
+    assert resp.status_code == 200
+    assert pool.acquired == 1
+    assert conn.released and not conn.in_transaction
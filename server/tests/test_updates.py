@@ -0,0 +1,226 @@
+from datetime import datetime
+
+import asyncpg
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from main import app as fastapi_app
+from app.database import get_db, get_read_db
+from app.etags import if_match_versions, row_etag
+from app.r2_service import get_r2_service
+from app.signed_url_cache import signed_url_cache
+
+
+VERSION = datetime(2024, 5, 1, 12, 0, 0, 123456)
+
+
+class UpdateDB:
+    """Answers every fetchrow with a canned row and records the statements"""
+
+    def __init__(self, row=None, error=None, unreferenced=()):
+        self.row = row
+        self.error = error
+        self.calls = []
+        # Blobs whose ref_count the trigger has brought down to zero
+        self.unreferenced = set(unreferenced)
+
+    async def fetchrow(self, query, *args):
+        self.calls.append((query, args))
+        if self.error:
+            raise self.error
+        return self.row
+
+    async def fetch(self, query, *args):
+        self.calls.append((query, args))
+        return [{"file_key": key} for key in args[0] if key in self.unreferenced]
+
+    async def execute(self, query, *args):
+        self.calls.append((query, args))
+        return "DELETE 1"
+
+    def transaction(self):
+        class _Transaction:
+            async def __aenter__(self):
+                pass
+
+            async def __aexit__(self, *exc):
+                pass
+
+        return _Transaction()
+
+
+@pytest.fixture
+def update_app():
+    holder = {}
+
+    async def override_get_db():
+        yield holder["db"]
+
+    class R2:
+        def __init__(self):
+            self.deleted = []
+
+        def get_signed_url(self, file_key, expiration=3600):
+            return f"https://cdn.test/{file_key}"
+
+        async def delete_files(self, file_keys):
+            self.deleted.extend(file_keys)
+            return {"deleted": list(file_keys), "errors": []}
+
+    holder["r2"] = R2()
+    fastapi_app.dependency_overrides[get_db] = override_get_db
+    fastapi_app.dependency_overrides[get_read_db] = override_get_db
+    fastapi_app.dependency_overrides[get_r2_service] = lambda: holder["r2"]
+    try:
+        yield fastapi_app, holder
+    finally:
+        fastapi_app.dependency_overrides.clear()
+
+
+def request_row(**overrides):
+    row = {"request_id": "req-1", "shopify_user_id": "u1", "query": "lamp",
+           "created_at": VERSION, "updated_at": VERSION}
+    row.update(overrides)
+    return row
+
+
+def test_row_etag_round_trips_through_if_match():
+    tag = row_etag(VERSION)
+    assert if_match_versions(f'W/"abc", {tag}, "zz"') == [VERSION]
+
+
+@pytest.mark.asyncio
+async def test_update_is_a_single_update_returning(update_app):
+    app, holder = update_app
+    holder["db"] = db = UpdateDB(request_row(query="desk lamp"))
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.put("/requests/req-1", json={"query": "desk lamp"})
+
+    assert resp.status_code == 200
+    assert resp.json()["query"] == "desk lamp"
+    assert resp.headers["etag"] == row_etag(VERSION)
+    assert len(db.calls) == 1
+    query, args = db.calls[0]
+    assert query.startswith("UPDATE requests SET query = $2, updated_at = $3 WHERE request_id = $1 RETURNING")
+    assert args[:2] == ("req-1", "desk lamp")
+
+
+@pytest.mark.asyncio
+async def test_update_missing_row_is_404(update_app):
+    app, holder = update_app
+    holder["db"] = UpdateDB(None)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.put("/carts/nope", json={"shopify_user_id": "u2"})
+
+    assert resp.status_code == 404
+    assert resp.json()["detail"] == "Cart not found"
+
+
+@pytest.mark.asyncio
+async def test_if_match_checks_version_in_the_same_statement(update_app):
+    app, holder = update_app
+    holder["db"] = db = UpdateDB({**request_row(), "row_exists": True})
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.put("/requests/req-1", json={"query": "lamp"}, headers={"If-Match": row_etag(VERSION)})
+
+    assert resp.status_code == 200
+    assert "row_exists" not in resp.json()
+    query, args = db.calls[0]
+    assert len(db.calls) == 1
+    assert "WITH updated AS (UPDATE requests SET" in query
+    assert "updated_at = ANY($4::timestamp[])" in query
+    assert args[-1] == [VERSION]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("row_exists, status", [(True, 412), (False, 404)])
+async def test_if_match_distinguishes_stale_version_from_missing_row(update_app, row_exists, status):
+    app, holder = update_app
+    empty = {key: None for key in request_row()}
+    holder["db"] = UpdateDB({**empty, "row_exists": row_exists})
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.put("/requests/req-1", json={"query": "lamp"}, headers={"If-Match": '"1"'})
+
+    assert resp.status_code == status
+
+
+@pytest.mark.asyncio
+async def test_empty_update_still_honours_if_match(update_app):
+    app, holder = update_app
+    holder["db"] = db = UpdateDB(request_row())
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        stale = await client.put("/requests/req-1", json={}, headers={"If-Match": '"1"'})
+        fresh = await client.put("/requests/req-1", json={}, headers={"If-Match": row_etag(VERSION)})
+
+    assert stale.status_code == 412
+    assert fresh.status_code == 200
+    assert all(query.startswith("SELECT") for query, _ in db.calls)
+
+
+@pytest.mark.asyncio
+async def test_product_update_has_no_version_column(update_app):
+    app, holder = update_app
+    holder["db"] = db = UpdateDB({"product_id": "p1", "shopify_product_id": "sp2", "shopify_variant_id": "sv1"})
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.put("/products/p1", json={"shopify_product_id": "sp2"}, headers={"If-Match": '"1"'})
+
+    assert resp.status_code == 200
+    query, args = db.calls[0]
+    assert query == "UPDATE products SET shopify_product_id = $2 WHERE product_id = $1 RETURNING *"
+    assert args == ("p1", "sp2")
+
+
+@pytest.mark.asyncio
+async def test_asset_update_invalidates_replaced_file_key(update_app):
+    app, holder = update_app
+    holder["db"] = UpdateDB({
+        "request_asset_id": "a1", "request_id": "req-1", "file_key": "new.png",
+        "created_at": VERSION, "updated_at": VERSION, "previous_file_key": "old.png",
+    })
+    signed_url_cache.clear()
+    signed_url_cache.get_or_sign("old.png", 3600, lambda key, exp: f"https://cdn.test/{key}")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.put("/request-assets/a1", json={"file_key": "new.png"})
+
+    assert resp.status_code == 200
+    assert resp.json()["url"] == "https://cdn.test/new.png"
+    assert signed_url_cache.stats()["entries"] == 1  # only the new key remains
+    # Another asset may still use old.png, so it stays in storage
+    assert holder["r2"].deleted == []
+    signed_url_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_asset_update_deletes_old_blob_once_unreferenced(update_app):
+    app, holder = update_app
+    holder["db"] = UpdateDB({
+        "request_asset_id": "a1", "request_id": "req-1", "file_key": "new.png",
+        "created_at": VERSION, "updated_at": VERSION, "previous_file_key": "old.png",
+        "previous_variant_file_keys": ["old_w320.webp"],
+    }, unreferenced={"old.png"})
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.put("/request-assets/a1", json={"file_key": "new.png"})
+
+    assert resp.status_code == 200
+    assert holder["r2"].deleted == ["old.png", "old_w320.webp"]
+    assert ("DELETE FROM blobs WHERE file_key = ANY($1::varchar[])", (["old.png"],)) in holder["db"].calls
+
+
+@pytest.mark.asyncio
+async def test_asset_update_to_unknown_request_is_404(update_app):
+    app, holder = update_app
+    holder["db"] = UpdateDB(error=asyncpg.ForeignKeyViolationError("fk"))
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.put("/request-assets/a1", json={"request_id": "missing"})
+
+    assert resp.status_code == 404
+    assert resp.json()["detail"] == "Request not found"